@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Cache codec benchmark
+Encode time, decode time and on-disk size of every cache codec on a
+synthetic channel list shaped like all-channels.json.
+Run it on the receiver itself and set cache_codec/cache_codec_level
+to the fastest option that fits the cache budget.
+
+Usage: python benchmarks/bench_cache_codec.py [channels] [rounds]
+"""
+from __future__ import print_function
+import sys
+import time
+import types
+import random
+from os.path import abspath, dirname, join
+
+PLUGIN_DIR = join(dirname(dirname(abspath(__file__))),
+                  "usr", "lib", "enigma2", "python", "Plugins", "Extensions", "TVGarden")
+
+# utils/ as a bare package: the plugin __init__ needs enigma2
+_utils = types.ModuleType("tvgarden_utils")
+_utils.__path__ = [join(PLUGIN_DIR, "utils")]
+sys.modules["tvgarden_utils"] = _utils
+from tvgarden_utils import cache_codec  # noqa: E402
+
+CANDIDATES = [
+    ("json", None),
+    ("gzip", 1),
+    ("gzip", 6),
+    ("gzip", 9),
+    ("zlib", 1),
+    ("zlib", 6),
+    ("marshal", None),
+    ("pickle", None),
+]
+
+
+def make_channels(count):
+    """Channel dicts with the fields and value shapes of the real lists"""
+    rnd = random.Random(42)
+    languages = ["en", "it", "es", "de", "fr", "ar", "pt", "tr"]
+    countries = ["us", "it", "es", "de", "fr", "eg", "br", "tr", "gb", "in"]
+    channels = []
+    for i in range(count):
+        nanoid = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz0123456789") for n in range(9))
+        channels.append({
+            "nanoid": nanoid,
+            "name": "Channel %d %s" % (i, nanoid[:4].upper()),
+            "iptv_urls": ["http://stream%d.example.com/live/%s/index.m3u8" % (i % 97, nanoid)],
+            "youtube_urls": [] if i % 7 else ["https://www.youtube.com/watch?v=%s" % nanoid],
+            "language": rnd.choice(languages),
+            "country": rnd.choice(countries),
+            "isGeoBlocked": i % 11 == 0,
+        })
+    return channels
+
+
+def bench(codec, data, rounds):
+    best_encode = best_decode = None
+    payload = None
+    for i in range(rounds):
+        start = time.time()
+        payload, raw_size = codec.encode(data)
+        elapsed = time.time() - start
+        best_encode = elapsed if best_encode is None else min(best_encode, elapsed)
+
+        start = time.time()
+        decoded, raw_size = codec.decode(payload)
+        elapsed = time.time() - start
+        best_decode = elapsed if best_decode is None else min(best_decode, elapsed)
+    assert decoded == data
+    return best_encode, best_decode, len(payload)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    data = make_channels(count)
+
+    print("Python %s, %d channels, best of %d" % (sys.version.split()[0], count, rounds))
+    print("%-10s %10s %10s %10s" % ("codec", "encode ms", "decode ms", "size KB"))
+    results = []
+    for name, level in CANDIDATES:
+        codec = cache_codec.get_codec(name, level)
+        label = name if level is None else "%s-%d" % (name, level)
+        encode, decode, size = bench(codec, data, rounds)
+        results.append((decode, label))
+        print("%-10s %10.1f %10.1f %10.1f" % (label, encode * 1000.0, decode * 1000.0, size / 1024.0))
+
+    results.sort()
+    print("fastest load: %s" % results[0][1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - HTTP pool benchmark
+Per-request latency of urlopen (new TCP + TLS handshake every time)
+versus the keep-alive ConnectionPool, against a local HTTPS stand-in
+for raw.githubusercontent.com.
+
+Usage: python benchmarks/bench_http_pool.py [requests] [payload_kb]
+Needs the openssl command line tool to create a throwaway certificate.
+"""
+from __future__ import print_function
+import ssl
+import sys
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import subprocess
+from os.path import abspath, dirname, join
+
+if sys.version_info[0] == 3:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.request import urlopen
+    from importlib.machinery import SourceFileLoader
+
+    def load_source(name, path):
+        return SourceFileLoader(name, path).load_module()
+else:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urllib2 import urlopen
+    from imp import load_source
+
+PLUGIN_DIR = join(dirname(dirname(abspath(__file__))),
+                  "usr", "lib", "enigma2", "python", "Plugins", "Extensions", "TVGarden")
+http_client = load_source("tvgarden_http_client", join(PLUGIN_DIR, "utils", "http_client.py"))
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive sockets without close_notify are expected
+        pass
+
+
+def make_handler(payload):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            BaseHTTPRequestHandler.setup(self)
+            # Headers and body are separate writes: avoid Nagle/delayed-ACK stalls
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def make_certificate(workdir):
+    cert = join(workdir, "cert.pem")
+    key = join(workdir, "key.pem")
+    subprocess.check_call(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    return cert, key
+
+
+def start_server(payload, cert, key):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(payload))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER if hasattr(ssl, "PROTOCOL_TLS_SERVER") else ssl.PROTOCOL_SSLv23)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def client_context():
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def bench_urlopen(url, count, context):
+    start = time.time()
+    for i in range(count):
+        response = urlopen(url, timeout=10, context=context)
+        try:
+            response.read()
+        finally:
+            response.close()
+    return (time.time() - start) / count
+
+
+def bench_pool(url, count, context):
+    pool = http_client.ConnectionPool(ssl_context=context)
+    start = time.time()
+    for i in range(count):
+        response = pool.request(url, timeout=10)
+        try:
+            response.read()
+        finally:
+            response.close()
+    elapsed = (time.time() - start) / count
+    stats = pool.get_stats()
+    pool.close_all()
+    return elapsed, stats
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payload_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    payload = b"[" + b",".join([b'{"name": "Channel", "nanoid": "abcdef"}'] * (payload_kb * 25)) + b"]"
+
+    workdir = tempfile.mkdtemp(prefix="tvgarden_bench_")
+    try:
+        cert, key = make_certificate(workdir)
+        server = start_server(payload, cert, key)
+        url = "https://127.0.0.1:%d/channels/raw/countries/it.json" % server.server_address[1]
+        context = client_context()
+
+        # Warm up both paths once
+        bench_urlopen(url, 3, context)
+        bench_pool(url, 3, context)
+
+        plain = bench_urlopen(url, count, context)
+        pooled, stats = bench_pool(url, count, context)
+
+        print("requests:        %d x %d bytes" % (count, len(payload)))
+        print("urlopen:         %.2f ms/request" % (plain * 1000.0))
+        print("keep-alive pool: %.2f ms/request (%d connections for %d requests)" % (
+            pooled * 1000.0, stats['connections'], stats['requests']))
+        print("saved:           %.2f ms/request (%.1fx)" % (
+            (plain - pooled) * 1000.0, plain / pooled if pooled else 0))
+        server.shutdown()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Streaming JSON benchmark
+Time and peak memory of reading a channel list shaped like
+all-channels.json from a file (standing in for the socket), plain and
+gzip: read() + loads() against the streaming parser.
+Peak memory needs tracemalloc (Python 3); Python 2 shows times only.
+
+Usage: python benchmarks/bench_json_stream.py [channels]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import gzip
+import tempfile
+from json import loads
+from os.path import abspath, dirname, join
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path.insert(0, dirname(abspath(__file__)))
+from bench_cache_codec import cache_codec, make_channels  # noqa: E402
+from tvgarden_utils.json_stream import load_stream  # noqa: E402
+
+
+def read_all(path, opener):
+    with opener(path, 'rb') as f:
+        return loads(f.read().decode('utf-8'))
+
+
+def read_stream(path, opener):
+    with opener(path, 'rb') as f:
+        return load_stream(f.read)
+
+
+def measure(func, *args):
+    """(data, seconds, peak bytes); tracing slows allocations, so it runs separately"""
+    start = time.time()
+    data = func(*args)
+    elapsed = time.time() - start
+    peak = 0
+    if tracemalloc:
+        del data
+        tracemalloc.start()
+        data = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return data, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    channels = make_channels(count)
+    folder = tempfile.mkdtemp()
+    plain = join(folder, "all-channels.json")
+    packed = join(folder, "all-channels.json.gz")
+    with open(plain, 'wb') as f:
+        cache_codec.get_codec("json").dump(channels, f)
+    with open(packed, 'wb') as f:
+        cache_codec.get_codec("gzip", 6).dump(channels, f)
+
+    print("Python %s, %d channels, %.1f KB JSON" % (
+        sys.version.split()[0], count, os.path.getsize(plain) / 1024.0))
+    print("%-14s %10s %10s" % ("reader", "ms", "peak KB"))
+    try:
+        for label, path, opener in (("json", plain, open), ("gzip", packed, gzip.open)):
+            for mode, func in (("read+loads", read_all), ("stream", read_stream)):
+                data, elapsed, peak = measure(func, path, opener)
+                assert data == channels
+                del data
+                print("%-14s %10.1f %10s" % (
+                    "%s %s" % (label, mode), elapsed * 1000.0,
+                    "%.1f" % (peak / 1024.0) if tracemalloc else "-"))
+    finally:
+        for path in (plain, packed):
+            os.remove(path)
+        os.rmdir(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Test helpers
+utils/ modules without plugin imports load as a bare package; the rest
+need enigma2 (run the suite on a receiver or with its Python modules).
+"""
+from __future__ import print_function
+import sys
+import types
+import unittest
+import importlib
+from os.path import abspath, dirname, join
+
+ROOT = dirname(dirname(abspath(__file__)))
+PYTHON_DIR = join(ROOT, "usr", "lib", "enigma2", "python")
+PLUGIN_DIR = join(PYTHON_DIR, "Plugins", "Extensions", "TVGarden")
+
+
+def import_utils(name):
+    """Import utils/<name>.py through a bare package (no enigma2 needed)"""
+    if "tvgarden_utils" not in sys.modules:
+        package = types.ModuleType("tvgarden_utils")
+        package.__path__ = [join(PLUGIN_DIR, "utils")]
+        sys.modules["tvgarden_utils"] = package
+    return importlib.import_module("tvgarden_utils.%s" % name)
+
+
+def import_plugin(name):
+    """Import Plugins.Extensions.TVGarden.<name>; the test is skipped without enigma2"""
+    try:
+        import enigma  # noqa: F401
+    except ImportError:
+        raise unittest.SkipTest("enigma2 is not available")
+    if PYTHON_DIR not in sys.path:
+        sys.path.insert(0, PYTHON_DIR)
+    return importlib.import_module("Plugins.Extensions.TVGarden.%s" % name)
+
+
+class LocalServer:
+    """
+    HTTP/1.1 stand-in on 127.0.0.1 (keep-alive). handler(request) returns
+    (status, headers dict, body bytes); request has path and headers.
+    """
+
+    def __init__(self, handler):
+        import threading
+        try:
+            from http.server import HTTPServer, BaseHTTPRequestHandler
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+            from SocketServer import ThreadingMixIn
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                status, headers, body = handler(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d/" % self.httpd.server_address[1]
+        thread = threading.Thread(target=self.httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def gzip_bytes(data):
+    import gzip
+    from io import BytesIO
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Cache codecs: small entries parsed in one go, big ones streamed"""
+from __future__ import print_function
+import unittest
+from io import BytesIO
+
+from .support import import_utils
+
+cache_codec = import_utils("cache_codec")
+
+CHANNELS = [{"nanoid": "c%04d" % n, "name": u"Canal %d è" % n, "iptv_urls": ["http://x/%d.m3u8" % n]}
+            for n in range(300)]
+
+
+class LoadStrategyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.load_stream = cache_codec.load_stream
+        self.streamed = []
+
+        def load_stream(read):
+            self.streamed.append(True)
+            return self.load_stream(read)
+        cache_codec.load_stream = load_stream
+
+    def tearDown(self):
+        cache_codec.load_stream = self.load_stream
+
+    def roundtrip(self, name, raw_size=None):
+        codec = cache_codec.get_codec(name, 6)
+        buf = BytesIO()
+        written = codec.dump(CHANNELS, buf)
+        buf.seek(0)
+        data, size = codec.load(buf, written if raw_size == 'known' else raw_size)
+        self.assertEqual(data, CHANNELS)
+        self.assertEqual(size, written)
+
+    def test_small_entry_single_loads(self):
+        for name in ("json", "gzip", "zlib"):
+            self.roundtrip(name, 'known')
+        self.assertEqual(self.streamed, [])
+
+    def test_unknown_or_big_entry_streamed(self):
+        for name in ("json", "gzip", "zlib"):
+            self.roundtrip(name)
+            self.roundtrip(name, cache_codec.STREAM_MIN_SIZE)
+        self.assertEqual(len(self.streamed), 6)
+
+    def test_object_codecs_ignore_raw_size(self):
+        for name in ("marshal", "pickle"):
+            self.roundtrip(name, 'known')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""CacheManager downloads: compressed bodies stored as received"""
+from __future__ import print_function
+import os
+import hashlib
+import unittest
+from json import dumps
+
+from .support import import_plugin, LocalServer, gzip_bytes
+
+cache = import_plugin("utils.cache")
+http_client = import_plugin("utils.http_client")
+get_config = import_plugin("utils.config").get_config
+
+# A JSON object several read chunks long, even gzipped (shas do not compress)
+DOCUMENT = {"tree": [{"path": "channels/raw/countries/c%04d.json" % n,
+                      "sha": hashlib.sha1(str(n).encode('ascii')).hexdigest()}
+                     for n in range(4000)]}
+PLAIN = dumps(DOCUMENT).encode('utf-8')
+GZIPPED = gzip_bytes(PLAIN)
+
+
+class CompressedDictBodyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(self.respond)
+        self.get_repo_path = cache.get_repo_path
+        base = self.server.url
+        cache.get_repo_path = lambda url: url[len(base):] if url and url.startswith(base) else None
+        self.codec = get_config().get("cache_codec")
+        get_config().config["cache_codec"] = "gzip"
+        self.manager = cache.CacheManager()
+        self.manager.clear_all()
+
+    def tearDown(self):
+        get_config().config["cache_codec"] = self.codec
+        cache.get_repo_path = self.get_repo_path
+        self.server.close()
+
+    def respond(self, request):
+        if "gzip" in (request.headers.get("Accept-Encoding") or ""):
+            return 200, {"Content-Encoding": "gzip"}, GZIPPED
+        return 200, {}, PLAIN
+
+    def test_gzip_dict_larger_than_chunk(self):
+        self.assertTrue(len(PLAIN) > 3 * http_client.READ_CHUNK)
+        url = self.server.url + "channels/raw/countries_metadata.json"
+        reused = http_client.get_pool().get_stats().get('reused', 0)
+
+        self.assertEqual(self.manager.fetch_url(url, force_refresh=True), DOCUMENT)
+        cache._writer.flush()
+        key = self.manager._get_cache_key(url)
+        with open(self.manager._get_cache_path(key), 'rb') as f:
+            self.assertEqual(f.read(), GZIPPED)
+        entry = self.manager.manifest.get(key)
+        blob = ("blob %d\0" % len(PLAIN)).encode('ascii') + PLAIN
+        self.assertEqual(entry.get("sha"), hashlib.sha1(blob).hexdigest())
+        self.assertFalse([f for f in os.listdir(self.manager.cache_dir) if f.endswith(cache.DOWNLOAD_SUFFIX)])
+
+        # The body was read to the end: the connection went back to the pool
+        self.manager.fetch_url(url, force_refresh=True)
+        self.assertTrue(http_client.get_pool().get_stats().get('reused', 0) > reused)
+
+        cache._memory.clear()
+        self.assertEqual(self.manager._get_cached(key), DOCUMENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""CacheManager: a listed entry whose file is gone or damaged is downloaded again"""
+from __future__ import print_function
+import unittest
+from json import dumps
+from os import remove
+
+from .support import import_plugin, LocalServer
+
+cache = import_plugin("utils.cache")
+
+DOCUMENT = {"countries": [{"code": "it", "name": "Italy"}]}
+ETAG = '"v1"'
+
+
+class MissingEntryFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conditional = []
+        self.server = LocalServer(self.respond)
+        self.get_repo_path = cache.get_repo_path
+        cache.get_repo_path = lambda url: None
+        self.manager = cache.CacheManager()
+        self.manager.clear_all()
+        self.url = self.server.url + "countries_metadata.json"
+        self.key = self.manager._get_cache_key(self.url)
+        self.assertEqual(self.manager.fetch_url(self.url), DOCUMENT)
+        cache._writer.flush()
+
+    def tearDown(self):
+        cache.get_repo_path = self.get_repo_path
+        self.server.close()
+
+    def respond(self, request):
+        self.conditional.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == ETAG:
+            return 304, {"ETag": ETAG}, b""
+        return 200, {"ETag": ETAG}, dumps(DOCUMENT).encode('utf-8')
+
+    def test_deleted_file_is_fetched_again(self):
+        remove(self.manager._get_cache_path(self.key))
+        cache._memory.clear()
+
+        self.assertEqual(self.manager.fetch_url(self.url), DOCUMENT)
+        # A full download: a 304 would confirm a body that is gone
+        self.assertEqual(self.conditional, [None, None])
+        cache._writer.flush()
+        self.assertEqual(self.manager._get_cached(self.key), DOCUMENT)
+
+    def test_damaged_file_is_fetched_again(self):
+        with open(self.manager._get_cache_path(self.key), 'wb') as f:
+            f.write(b"not a cache entry")
+        cache._memory.clear()
+
+        self.assertEqual(self.manager.fetch_url(self.url), DOCUMENT)
+        self.assertEqual(self.conditional, [None, None])
+
+    def test_missing_file_drops_entry(self):
+        remove(self.manager._get_cache_path(self.key))
+        cache._memory.clear()
+
+        self.assertEqual(self.manager._get_cached(self.key), None)
+        self.assertFalse(self.key in self.manager.manifest)
+        self.assertEqual(self.manager._get_validators(self.key), None)
+
+    def test_expired_entry_revalidates_with_file(self):
+        cache._memory.clear()
+        self.assertEqual(self.manager.fetch_url(self.url, ttl=0), DOCUMENT)
+        self.assertEqual(self.conditional, [None, ETAG])
+
+
+if __name__ == '__main__':
+    unittest.main()
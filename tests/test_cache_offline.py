@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""CacheManager offline mode: cached data is served while the circuit is open"""
+from __future__ import print_function
+import unittest
+from json import dumps
+
+from .support import import_plugin, LocalServer
+
+cache = import_plugin("utils.cache")
+http_client = import_plugin("utils.http_client")
+
+DOCUMENT = {"countries": [{"code": "it", "name": "Italy"}]}
+
+
+class OfflineFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(self.respond)
+        self.host = http_client.get_host(self.server.url)
+        self.get_repo_path = cache.get_repo_path
+        # Not a repository file: no remote tree sync
+        cache.get_repo_path = lambda url: None
+        self.manager = cache.CacheManager()
+        self.manager.clear_all()
+
+    def tearDown(self):
+        cache.get_repo_path = self.get_repo_path
+        http_client.get_breaker().success(self.host)
+        http_client.get_failures().clear()
+        self.server.close()
+
+    def respond(self, request):
+        return 200, {}, dumps(DOCUMENT).encode('utf-8')
+
+    def go_offline(self):
+        """Stop the server and trip the breaker of its host with real failures"""
+        self.server.close()
+        http_client.get_pool().close_all()
+        for n in range(http_client.get_breaker().threshold):
+            self.assertRaises(IOError, http_client.open_url, self.server.url + "probe%d.json" % n)
+        self.assertTrue(http_client.is_offline(self.server.url))
+
+    def test_expired_entry_served_while_open(self):
+        url = self.server.url + "countries_metadata.json"
+        self.assertEqual(self.manager.fetch_url(url), DOCUMENT)
+        cache._writer.flush()
+        self.go_offline()
+
+        # Expired (ttl=0), yet valid while the host is known to be down
+        key = self.manager._get_cache_key(url)
+        self.assertTrue(self.manager._is_cache_valid(key, 0))
+        self.assertEqual(self.manager.fetch_url(url, ttl=0), DOCUMENT)
+        self.assertEqual(len(self.server.requests), 1)
+        # No request was tried for the cached URL
+        self.assertFalse(url in http_client.get_failures()._failed)
+
+    def test_uncached_url_fails_fast(self):
+        self.go_offline()
+        url = self.server.url + "categories/news.json"
+        self.assertRaises(http_client.CircuitOpen, self.manager.fetch_url, url)
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
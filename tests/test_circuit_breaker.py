@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Per-host circuit breaker: closed, open, half-open probe, closed"""
+from __future__ import print_function
+import unittest
+
+from .support import import_utils
+
+http_client = import_utils("http_client")
+
+HOST = "raw.githubusercontent.com"
+
+
+class FakeClock(object):
+    """Stands in for the time module in http_client"""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.time = http_client.time
+        http_client.time = self.clock
+        self.breaker = http_client.CircuitBreaker(threshold=3, cooldown=60, cooldown_max=600)
+
+    def tearDown(self):
+        http_client.time = self.time
+
+    def trip(self):
+        for n in range(3):
+            self.breaker.check(HOST)
+            self.breaker.failure(HOST)
+
+    def test_opens_after_threshold(self):
+        for n in range(2):
+            self.breaker.failure(HOST)
+        self.breaker.check(HOST)
+        self.assertFalse(self.breaker.is_open(HOST))
+
+        self.breaker.failure(HOST)
+        self.assertTrue(self.breaker.is_open(HOST))
+        self.assertRaises(http_client.CircuitOpen, self.breaker.check, HOST)
+        self.assertEqual(self.breaker.get_open_hosts(), [HOST])
+        # Other hosts are not affected
+        self.breaker.check("example.com")
+        self.assertEqual(self.breaker.get_stats()['opened'], 1)
+
+    def test_success_resets_count(self):
+        for n in range(2):
+            self.breaker.failure(HOST)
+        self.breaker.success(HOST)
+        for n in range(2):
+            self.breaker.failure(HOST)
+        self.assertFalse(self.breaker.is_open(HOST))
+
+    def test_half_open_probe_closes(self):
+        self.trip()
+        self.clock.now += 59
+        self.assertRaises(http_client.CircuitOpen, self.breaker.check, HOST)
+
+        # Cool-down over: one probe goes out, the others still wait
+        self.clock.now += 1
+        self.assertFalse(self.breaker.is_open(HOST))
+        self.breaker.check(HOST)
+        self.assertTrue(self.breaker.is_open(HOST))
+        self.assertRaises(http_client.CircuitOpen, self.breaker.check, HOST)
+
+        self.breaker.success(HOST)
+        self.assertFalse(self.breaker.is_open(HOST))
+        self.breaker.check(HOST)
+        self.assertEqual(self.breaker.get_open_hosts(), [])
+        stats = self.breaker.get_stats()
+        self.assertEqual((stats['opened'], stats['closed'], stats['probes']), (1, 1, 1))
+
+    def test_failed_probe_doubles_cooldown(self):
+        self.trip()
+        for cooldown in (60, 120, 240, 480, 600, 600):
+            self.clock.now += cooldown - 1
+            self.assertRaises(http_client.CircuitOpen, self.breaker.check, HOST)
+            self.clock.now += 1
+            self.breaker.check(HOST)
+            self.breaker.failure(HOST)
+        self.assertTrue(self.breaker.is_open(HOST))
+
+    def test_lost_probe_is_retried(self):
+        # A probe that never reports back does not keep the circuit open forever
+        self.trip()
+        self.clock.now += 60
+        self.breaker.check(HOST)
+        self.clock.now += 60
+        self.breaker.check(HOST)
+        self.assertEqual(self.breaker.get_stats()['probes'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Channel delta engine and incremental ChannelIndex.apply()"""
+from __future__ import print_function
+import copy
+import unittest
+
+from .support import import_plugin
+
+delta = import_plugin("utils.delta")
+index = import_plugin("utils.index")
+
+
+def channel(nanoid, name, country, categories, url=None):
+    return {
+        'nanoid': nanoid,
+        'name': name,
+        'country': country,
+        'categories': categories,
+        'iptv_urls': [url or "http://example.com/%s.m3u8" % nanoid],
+    }
+
+
+def snapshot():
+    return [
+        channel("a1", "Rai News", "it", ["news"]),
+        channel("b2", "Rai Sport", "it", ["sports"]),
+        channel("c3", "France 24", "fr", ["news"]),
+        channel("d4", "Arte", "fr", ["culture", "movies"]),
+    ]
+
+
+def ids(channels):
+    return [c['nanoid'] for c in channels]
+
+
+class DiffChannelsTest(unittest.TestCase):
+
+    def test_classifies_records(self):
+        old = snapshot()
+        new = copy.deepcopy(old)
+        new[0]['iptv_urls'] = ["http://example.com/a1-hd.m3u8"]
+        new[1]['name'] = "Rai Sport HD"
+        del new[2]
+        new.append(channel("e5", "Euronews", "fr", ["news"]))
+
+        changes = delta.diff_channels(old, new)
+        self.assertEqual(ids(changes.added), ["e5"])
+        self.assertEqual(ids(changes.removed), ["c3"])
+        self.assertEqual([(o['nanoid'], n['nanoid']) for o, n in changes.url_changed], [("a1", "a1")])
+        self.assertEqual([(o['name'], n['name']) for o, n in changes.updated], [("Rai Sport", "Rai Sport HD")])
+        self.assertEqual(changes.get_url_map(),
+                         {"http://example.com/a1.m3u8": "http://example.com/a1-hd.m3u8"})
+        self.assertFalse(changes.full)
+        self.assertEqual(len(changes), 4)
+
+    def test_unchanged_records_keep_identity(self):
+        old = snapshot()
+        new = copy.deepcopy(old)
+        new[1]['name'] = "Rai Sport HD"
+
+        changes = delta.diff_channels(old, new)
+        self.assertEqual([(o['nanoid'], n['nanoid']) for o, n in changes.updated], [("b2", "b2")])
+        self.assertTrue(new[0] is old[0])
+        self.assertTrue(new[2] is old[2])
+        self.assertTrue(new[3] is old[3])
+        self.assertFalse(new[1] is old[1])
+
+    def test_identical_lists(self):
+        old = snapshot()
+        changes = delta.diff_channels(old, copy.deepcopy(old))
+        self.assertTrue(changes.is_empty())
+
+    def test_missing_nanoid_is_full(self):
+        old = snapshot()
+        new = copy.deepcopy(old)
+        del new[0]['nanoid']
+        changes = delta.diff_channels(old, new)
+        self.assertTrue(changes.full)
+        self.assertFalse(changes.is_empty())
+
+
+class IndexApplyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old = snapshot()
+        self.index = index.ChannelIndex(self.old)
+        # Search text is kept up to date once it has been built
+        self.assertEqual(ids(self.index.search("rai")), ["a1", "b2"])
+
+    def apply(self, new):
+        changes = delta.diff_channels(self.old, new)
+        self.index.apply(changes)
+        self.assertTrue(self.index.source is new)
+        return changes
+
+    def test_added_record(self):
+        arte = self.index.get_country("fr")[1]
+        new = copy.deepcopy(self.old)
+        new.append(channel("e5", "Euronews", "fr", ["news"]))
+        self.apply(new)
+
+        self.assertEqual(ids(self.index.get_country("fr")), ["c3", "d4", "e5"])
+        self.assertEqual(ids(self.index.get_category("news")), ["a1", "c3", "e5"])
+        self.assertEqual(ids(self.index.search("euronews")), ["e5"])
+        self.assertTrue(self.index.get_channel("e5") is new[4])
+        # Unchanged records are the same objects in the index and the new list
+        self.assertTrue(self.index.get_country("fr")[1] is arte)
+        self.assertTrue(new[3] is arte)
+
+    def test_removed_record(self):
+        new = copy.deepcopy(self.old)
+        del new[3]
+        self.apply(new)
+
+        self.assertEqual(ids(self.index.get_country("fr")), ["c3"])
+        self.assertEqual(self.index.get_category("culture"), [])
+        self.assertFalse("culture" in self.index.by_category)
+        self.assertEqual(self.index.get_channel("d4"), None)
+        self.assertEqual(self.index.search("arte"), [])
+
+    def test_changed_record(self):
+        new = copy.deepcopy(self.old)
+        new[1]['name'] = "Rai Sport HD"
+        new[1]['categories'] = ["sports", "news"]
+        new[2]['country'] = "mc"
+        self.apply(new)
+
+        self.assertEqual(ids(self.index.get_category("news")), ["a1", "b2", "c3"])
+        self.assertEqual(ids(self.index.get_category("sports")), ["b2"])
+        self.assertTrue(self.index.get_category("sports")[0] is new[1])
+        self.assertEqual(ids(self.index.get_country("fr")), ["d4"])
+        self.assertEqual(ids(self.index.get_country("mc")), ["c3"])
+        self.assertEqual(ids(self.index.search("sport hd")), ["b2"])
+        self.assertTrue(self.index.get_channel("b2") is new[1])
+        # Buckets not touched by the change are the same objects
+        self.assertTrue(self.index.get_country("it")[0] is self.old[0])
+
+    def test_matches_full_rebuild(self):
+        new = copy.deepcopy(self.old)
+        new[0]['iptv_urls'] = ["http://example.com/a1-hd.m3u8"]
+        new[1]['country'] = "sm"
+        del new[2]
+        new.append(channel("e5", "Euronews", "fr", ["news"]))
+        self.apply(new)
+
+        rebuilt = index.ChannelIndex(new)
+        for table in ('by_country', 'by_category', 'by_language'):
+            expected = dict((k, ids(v)) for k, v in getattr(rebuilt, table).items())
+            actual = dict((k, ids(v)) for k, v in getattr(self.index, table).items())
+            self.assertEqual(actual, expected)
+        self.assertEqual(ids(self.index.search("e")), ids(rebuilt.search("e")))
+
+    def test_full_change_rebuilds(self):
+        new = copy.deepcopy(self.old)
+        del new[0]['nanoid']
+        changes = self.apply(new)
+        self.assertTrue(changes.full)
+        self.assertEqual(ids(self.index.get_country("fr")), ["c3", "d4"])
+        self.assertEqual(len(self.index.search("rai")), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Flag pack install: one download, each callback notified once"""
+from __future__ import print_function
+import shutil
+import tempfile
+import threading
+import unittest
+from os import makedirs
+from os.path import join
+
+from .support import import_plugin
+
+flag_store = import_plugin("utils.flag_store")
+persistent_cache = import_plugin("utils.persistent_cache")
+
+
+class Screen(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def on_flags_installed(self, ok):
+        self.calls.append(ok)
+
+
+class InstallAsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_flags_")
+        self.store = flag_store.FlagStore(self.dir, "h120")
+        self.release = threading.Event()
+        self.installs = []
+        self.done = threading.Event()
+
+        def install():
+            self.installs.append(1)
+            self.release.wait(5)
+            return True
+        self.store.install = install
+
+    def tearDown(self):
+        self.release.set()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_callback_once_per_install(self):
+        screen = Screen()
+        other = Screen()
+        # Selection changes while the pack downloads
+        for n in range(5):
+            self.store.install_async(screen.on_flags_installed)
+        self.store.install_async(other.on_flags_installed)
+        self.store.install_async(lambda ok: self.done.set())
+        self.release.set()
+        self.assertTrue(self.done.wait(5))
+
+        self.assertEqual(self.installs, [1])
+        self.assertEqual(screen.calls, [True])
+        self.assertEqual(other.calls, [True])
+
+        # A later install notifies again
+        self.done.clear()
+        self.store.install_async(screen.on_flags_installed)
+        self.store.install_async(lambda ok: self.done.set())
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(screen.calls, [True, True])
+
+
+class PersistentPackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_flags_")
+        self.tier = persistent_cache.PersistentTier(join(self.dir, "tier"), write_interval=3600)
+        makedirs(join(self.tier.base_dir, flag_store.FLAG_DIR, "h120"))
+        with open(join(self.tier.base_dir, flag_store.FLAG_DIR, "h120", "it.png"), 'wb') as f:
+            f.write(b"\x89PNG")
+        self.get_tier = flag_store.get_persistent_tier
+        flag_store.get_persistent_tier = lambda: self.tier
+        self.store = flag_store.FlagStore(join(self.dir, "hot", flag_store.FLAG_DIR), "h120")
+
+    def tearDown(self):
+        flag_store.get_persistent_tier = self.get_tier
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_restored_from_tier_without_download(self):
+        self.store.url = "http://127.0.0.1:1/unreachable.zip"
+        self.assertTrue(self.store.install())
+        self.assertTrue(self.store.path("IT").startswith(self.store.folder))
+        self.assertEqual(self.store.path("fr"), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
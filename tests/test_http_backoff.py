@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Negative cache: failing URLs back off exponentially"""
+from __future__ import print_function
+import unittest
+
+from .support import import_utils, LocalServer
+
+http_client = import_utils("http_client")
+
+
+class FakeClock(object):
+    """Stands in for the time module in http_client"""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+class FailureCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.time = http_client.time
+        http_client.time = self.clock
+        self.failures = http_client.FailureCache(base=30, max_window=3600)
+
+    def tearDown(self):
+        http_client.time = self.time
+
+    def test_skipped_inside_window(self):
+        url = "http://example.invalid/a.json"
+        self.failures.check(url)
+        self.failures.failure(url, IOError("refused"))
+
+        self.assertRaises(http_client.KnownBadURL, self.failures.check, url)
+        self.clock.now += 29
+        self.assertRaises(http_client.KnownBadURL, self.failures.check, url)
+        # Other URLs are not affected
+        self.failures.check("http://example.invalid/b.json")
+
+        self.clock.now += 1
+        self.failures.check(url)
+        stats = self.failures.get_stats()
+        self.assertEqual(stats['short_circuits'], 2)
+        self.assertEqual(stats['retries'], 1)
+
+    def test_window_grows(self):
+        url = "http://example.invalid/a.json"
+        for window in (30, 60, 120, 240):
+            self.failures.failure(url, IOError("timeout"))
+            self.clock.now += window - 1
+            self.assertRaises(http_client.KnownBadURL, self.failures.check, url)
+            self.clock.now += 1
+            self.failures.check(url)
+
+    def test_window_capped(self):
+        url = "http://example.invalid/a.json"
+        for n in range(12):
+            self.failures.failure(url, IOError("timeout"))
+        self.clock.now += 3600
+        self.failures.check(url)
+        self.assertEqual(self.failures.get_stats()['given_up'], 1)
+
+    def test_success_clears(self):
+        url = "http://example.invalid/a.json"
+        for n in range(3):
+            self.failures.failure(url, IOError("timeout"))
+        self.clock.now += 120
+        self.failures.check(url)
+        self.failures.success(url)
+        self.assertEqual(self.failures.get_stats()['recovered'], 1)
+
+        # Back to the first window after the next failure
+        self.failures.failure(url, IOError("timeout"))
+        self.clock.now += 30
+        self.failures.check(url)
+        self.assertEqual(self.failures.get_stats()['known_bad'], 0)
+
+
+class OpenURLBackoffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.status = 404
+        self.server = LocalServer(self.respond)
+        http_client.get_failures().clear()
+
+    def tearDown(self):
+        http_client.get_failures().clear()
+        self.server.close()
+
+    def respond(self, request):
+        return self.status, {}, b"{}"
+
+    def test_no_request_while_backing_off(self):
+        url = self.server.url + "missing.json"
+        self.assertRaises(http_client.HTTPError, http_client.open_url, url)
+        self.assertRaises(http_client.KnownBadURL, http_client.open_url, url)
+        self.assertEqual(len(self.server.requests), 1)
+        # An HTTP error is not a network failure: the host stays online
+        self.assertFalse(http_client.is_offline(url))
+
+    def test_success_clears_failure(self):
+        url = self.server.url + "flaky.json"
+        self.assertRaises(http_client.HTTPError, http_client.open_url, url)
+        http_client.get_failures()._failed[url]['until'] = 0
+
+        self.status = 200
+        response = http_client.open_url(url)
+        self.assertEqual(response.read(), b"{}")
+        response.close()
+        http_client.open_url(url).close()
+        self.assertEqual(len(self.server.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
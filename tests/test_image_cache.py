@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Image cache: access times off the main loop, renditions per skin size"""
+from __future__ import print_function
+import shutil
+import tempfile
+import unittest
+from os import listdir
+from os.path import join
+
+from .support import import_plugin, LocalServer
+
+image_cache = import_plugin("utils.image_cache")
+
+
+class AccessTimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_images_")
+        self.server = LocalServer(lambda request: (200, {}, b"\x89PNG" + request.path.encode('ascii')))
+        self.get_tier = image_cache.get_persistent_tier
+        image_cache.get_persistent_tier = lambda: None
+        self.cache = image_cache.ImageCache(join(self.dir, "images"))
+        self.url = self.server.url + "a.png"
+        self.cache.get(self.url, 'flag')
+
+    def tearDown(self):
+        image_cache.get_persistent_tier = self.get_tier
+        self.server.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_lookup_keeps_access_in_memory(self):
+        appends = self.cache.index.get_stats()['appends']
+        key = self.cache._key(self.url)
+        self.cache._accessed[key] = 0
+        for n in range(5):
+            self.assertTrue(self.cache.lookup(self.url, 'flag'))
+        self.assertEqual(self.cache.index.get_stats()['appends'], appends)
+
+        # Written in one append, then only when newer
+        self.assertEqual(self.cache.flush_access(), 1)
+        self.assertEqual(self.cache.index.get_stats()['appends'], appends + 1)
+        self.assertEqual(self.cache.index.get(key)['accessed'], self.cache._accessed[key])
+        self.assertEqual(self.cache.flush_access(), 0)
+
+    def test_worker_flush_is_throttled(self):
+        self.cache.lookup(self.url, 'flag')
+        self.cache._accessed[self.cache._key(self.url)] += 1
+        self.assertEqual(self.cache.flush_access(force=False), 0)
+        self.cache._access_flushed -= image_cache.ACCESS_FLUSH_INTERVAL
+        self.assertEqual(self.cache.flush_access(force=False), 1)
+
+
+class RenditionTest(unittest.TestCase):
+    """Scaling is faked: the index bookkeeping is tested, not PIL"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_images_")
+        self.server = LocalServer(lambda request: (200, {}, b"\x89PNG source"))
+        self.saved = (image_cache.get_persistent_tier, image_cache.get_thumb_size,
+                      image_cache._scale_image, image_cache.Image)
+        self.size = (80, 50)
+        self.scaled = []
+        image_cache.get_persistent_tier = lambda: None
+        image_cache.get_thumb_size = lambda kind: self.size
+        image_cache._scale_image = self.scale
+        image_cache.Image = object()
+        self.cache = image_cache.ImageCache(join(self.dir, "images"))
+        self.url = self.server.url + "logo.png"
+
+    def tearDown(self):
+        (image_cache.get_persistent_tier, image_cache.get_thumb_size,
+         image_cache._scale_image, image_cache.Image) = self.saved
+        self.server.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def scale(self, path, size):
+        self.assertEqual(self.read(path), b"\x89PNG source")
+        self.scaled.append(size)
+        return b"\x89PNG " + ("%dx%d" % size).encode('ascii')
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_rendition_per_skin_size(self):
+        self.assertEqual(self.read(self.cache.get(self.url)), b"\x89PNG 80x50")
+        self.assertEqual(self.read(self.cache.lookup(self.url)), b"\x89PNG 80x50")
+
+        # Skin change: scaled from the source, not from the small rendition
+        self.size = (120, 90)
+        self.assertEqual(self.cache.lookup(self.url), None)
+        self.assertFalse(self.cache.is_fresh(self.url))
+        self.assertEqual(self.read(self.cache.get(self.url)), b"\x89PNG 120x90")
+        self.assertEqual(len(self.server.requests), 1)
+
+        # Back: the first rendition is still there
+        self.size = (80, 50)
+        self.assertEqual(self.read(self.cache.lookup(self.url)), b"\x89PNG 80x50")
+        self.assertEqual(self.scaled, [(80, 50), (120, 90)])
+
+        entry = self.cache.index.get(self.cache._key(self.url))
+        self.assertEqual(sorted(entry['renditions']), ["120x90", "80x50"])
+        self.assertEqual(self.read(join(self.cache.base_dir, entry['file'])), b"\x89PNG source")
+        sizes = [len(self.read(join(self.cache.base_dir, name))) for name, size in self.cache._files(entry)]
+        self.assertEqual(self.cache._totals(), (1, sum(sizes)))
+
+    def test_source_that_fits_is_shown(self):
+        image_cache._scale_image = lambda path, size: None
+        path = self.cache.get(self.url)
+        self.assertEqual(self.read(path), b"\x89PNG source")
+        self.assertEqual(self.cache.lookup(self.url), path)
+
+    def test_new_source_drops_old_renditions(self):
+        self.cache.get(self.url)
+        self.size = (120, 90)
+        self.cache.get(self.url)
+        self.assertEqual(len(listdir(self.cache.base_dir)), 4)
+
+        self.cache.store(self.url, b"\x89PNG source")
+        self.assertEqual(self.cache.lookup(self.url), None)
+        self.cache.store(self.url, b"\x89PNG newer")
+        self.assertEqual(sorted(listdir(self.cache.base_dir)),
+                         sorted([image_cache.INDEX_FILE,
+                                 self.cache.index.get(self.cache._key(self.url))['file']]))
+
+
+if __name__ == '__main__':
+    unittest.main()
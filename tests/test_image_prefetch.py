@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Logo prefetch: low priority, capped, filtered off the main loop"""
+from __future__ import print_function
+import time
+import threading
+import unittest
+
+from .support import import_plugin, LocalServer
+
+image_cache = import_plugin("utils.image_cache")
+
+
+class PrefetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.server = LocalServer(self.respond)
+        self.cache = image_cache.get_image_cache()
+        self.cache.clear()
+        self.prefetcher = image_cache.Prefetcher()
+
+    def tearDown(self):
+        self.server.close()
+
+    def respond(self, request):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.5 if "foreground" in request.path else 0.05)
+        with self.lock:
+            self.active -= 1
+        return 200, {}, b"\x89PNG" + request.path.encode('ascii')
+
+    def items(self, prefix, count):
+        return [(self.server.url + "%s%d.png" % (prefix, n), 'logo') for n in range(count)]
+
+    def wait_idle(self, timeout=5):
+        deadline = time.time() + timeout
+        while self.prefetcher.get_stats()['running'] and time.time() < deadline:
+            time.sleep(0.02)
+
+    def test_schedule_does_not_touch_the_cache(self):
+        original = image_cache.get_image_cache
+        calls = []
+
+        def counting():
+            calls.append(threading.current_thread())
+            return original()
+        image_cache.get_image_cache = counting
+        try:
+            self.prefetcher.schedule(self.items("row", 4) + [(None, 'logo')])
+            self.assertFalse([t for t in calls if t is threading.current_thread()])
+            self.wait_idle()
+        finally:
+            image_cache.get_image_cache = original
+        self.assertEqual(self.prefetcher.get_stats()['fetched'], 4)
+
+        # Cached ones are skipped by the workers, without a request
+        requests = len(self.server.requests)
+        self.prefetcher.schedule(self.items("row", 4))
+        self.wait_idle()
+        self.assertEqual(len(self.server.requests), requests)
+        self.assertEqual(self.prefetcher.get_stats()['cached'], 4)
+
+    def test_yields_to_foreground_and_caps_workers(self):
+        original = image_cache.get_prefetcher
+        image_cache.get_prefetcher = lambda: self.prefetcher
+        try:
+            loader = image_cache.ImageLoader()
+            loader.request(self.server.url + "foreground.png", 'logo', lambda path: None)
+            time.sleep(0.1)
+            self.prefetcher.schedule(self.items("near", 8))
+            time.sleep(0.2)
+            self.assertEqual(self.server.requests, ["/foreground.png"])
+            self.wait_idle()
+        finally:
+            image_cache.get_prefetcher = original
+        self.assertEqual(self.prefetcher.get_stats()['fetched'], 8)
+        self.assertTrue(self.peak <= 2)
+
+    def test_cancel_drops_only_own_queue(self):
+        parent = object()
+        child = object()
+        self.prefetcher.foreground_started()
+        try:
+            self.prefetcher.schedule(self.items("parent", 6), owner=parent)
+            # A screen closing that did not queue them leaves them alone
+            self.prefetcher.cancel(owner=child)
+            self.assertEqual(self.prefetcher.get_stats()['queued'], 6)
+            self.prefetcher.cancel(owner=parent)
+            self.assertEqual(self.prefetcher.get_stats()['queued'], 0)
+
+            self.prefetcher.schedule(self.items("child", 3), owner=child)
+            self.prefetcher.cancel()
+            self.assertEqual(self.prefetcher.get_stats()['queued'], 0)
+        finally:
+            self.prefetcher.foreground_done()
+        self.wait_idle()
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
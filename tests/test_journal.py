@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Append-only JournalStore: replay, deletes, torn records, compaction"""
+from __future__ import print_function
+import shutil
+import tempfile
+import unittest
+from json import dump
+from os.path import join, exists
+
+from .support import import_plugin
+
+journal = import_plugin("utils.journal")
+
+
+class JournalStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_journal_")
+        self.path = join(self.dir, "memory_cache.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def reopen(self):
+        return journal.JournalStore(self.path)
+
+    def lines(self):
+        with open(self.path, 'r') as f:
+            return [line for line in f.read().split("\n") if line]
+
+    def test_replay_after_reopen(self):
+        store = self.reopen()
+        store["countries"] = [{"code": "it"}]
+        store.update({"categories": ["news"], "categories_time": 12.5})
+        self.assertEqual(len(self.lines()), 3)
+
+        store = self.reopen()
+        self.assertEqual(store.get("countries"), [{"code": "it"}])
+        self.assertEqual(store["categories"], ["news"])
+        self.assertEqual(store.get("categories_time"), 12.5)
+        self.assertEqual(len(store), 3)
+
+    def test_last_write_wins(self):
+        store = self.reopen()
+        for n in range(5):
+            store["countries_time"] = n
+        self.assertEqual(len(self.lines()), 5)
+        self.assertEqual(self.reopen().get("countries_time"), 4)
+
+    def test_deletes(self):
+        store = self.reopen()
+        store.update({"a": 1, "b": 2, "c": 3})
+        self.assertEqual(store.pop("a"), 1)
+        self.assertEqual(store.pop("a", "gone"), "gone")
+        store.remove(["b", "missing"])
+
+        store = self.reopen()
+        self.assertFalse("a" in store)
+        self.assertFalse("b" in store)
+        self.assertEqual(store.items(), [("c", 3)])
+        # Set again after a delete
+        store["a"] = 10
+        self.assertEqual(self.reopen().get("a"), 10)
+
+    def test_truncated_trailing_record(self):
+        store = self.reopen()
+        store.update({"a": 1})
+        store["b"] = {"list": [1, 2, 3]}
+        with open(self.path, 'r') as f:
+            data = f.read()
+        # Power loss in the middle of the last append
+        with open(self.path, 'w') as f:
+            f.write(data[:-8])
+
+        store = self.reopen()
+        self.assertEqual(store.items(), [("a", 1)])
+        # The torn line was dropped from the file: appends start on a clean line
+        self.assertEqual(self.lines(), ['["a", 1]'])
+        store["c"] = 3
+        self.assertEqual(sorted(self.reopen().items()), [("a", 1), ("c", 3)])
+
+    def test_compaction_keeps_live_keys(self):
+        store = self.reopen()
+        store.update({"keep": "yes", "drop": "no"})
+        for n in range(journal.COMPACT_MIN_RECORDS):
+            store["counter"] = n
+        store.pop("drop")
+
+        self.assertTrue(store.get_stats()['compactions'] >= 1)
+        self.assertTrue(len(self.lines()) < journal.COMPACT_MIN_RECORDS)
+        store.compact()
+        self.assertEqual(sorted(self.lines()), ['["counter", %d]' % (journal.COMPACT_MIN_RECORDS - 1),
+                                                '["keep", "yes"]'])
+        self.assertFalse(exists(self.path + ".tmp"))
+
+        store = self.reopen()
+        self.assertEqual(sorted(store.items()),
+                         [("counter", journal.COMPACT_MIN_RECORDS - 1), ("keep", "yes")])
+        self.assertEqual(store.get_stats()['records'], 2)
+
+    def test_clear(self):
+        store = self.reopen()
+        store.update({"a": 1, "b": 2})
+        store.clear()
+        self.assertEqual(self.lines(), [])
+        self.assertEqual(len(self.reopen()), 0)
+
+    def test_import_legacy_json(self):
+        legacy = join(self.dir, "memory_cache.json")
+        with open(legacy, 'w') as f:
+            dump({"countries": ["it"], "countries_time": 1.0}, f)
+        store = journal.get_journal(self.path, legacy)
+        self.assertFalse(exists(legacy))
+        self.assertEqual(store.get("countries"), ["it"])
+        self.assertEqual(self.reopen().get("countries_time"), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Streaming JSON parser and CountingReader"""
+from __future__ import print_function
+import gzip
+import hashlib
+import unittest
+from io import BytesIO
+from json import dumps
+
+from .support import import_utils
+
+json_stream = import_utils("json_stream")
+
+
+def make_document(size):
+    """A JSON object (not an array) of at least size bytes"""
+    # Each entry takes about 100 bytes
+    tree = [{"path": "channels/raw/countries/c%05d.json" % n, "sha": "%040x" % n}
+            for n in range(size // 90)]
+    document = {"tree": tree, "truncated": False}
+    raw = dumps(document).encode('utf-8')
+    assert len(raw) >= size
+    return document, raw
+
+
+class CountingReaderTest(unittest.TestCase):
+
+    def test_read_all_after_peek(self):
+        document, raw = make_document(4 * json_stream.CHUNK_SIZE)
+        digest = hashlib.sha1()
+        reader = json_stream.CountingReader(BytesIO(raw).read, digest)
+        head = reader.peek(json_stream.CHUNK_SIZE)
+        self.assertEqual(head, raw[:json_stream.CHUNK_SIZE])
+        self.assertEqual(reader.read(), raw)
+        self.assertEqual(reader.size, len(raw))
+        self.assertEqual(digest.hexdigest(), hashlib.sha1(raw).hexdigest())
+
+    def test_read_all_after_peek_gzip(self):
+        document, raw = make_document(4 * json_stream.CHUNK_SIZE)
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+            f.write(raw)
+        buf.seek(0)
+        with gzip.GzipFile(fileobj=buf, mode='rb') as f:
+            reader = json_stream.CountingReader(f.read)
+            reader.peek(json_stream.CHUNK_SIZE)
+            self.assertEqual(reader.read(), raw)
+        self.assertEqual(buf.tell(), len(buf.getvalue()))
+
+    def test_read_chunks_after_peek(self):
+        raw = b"x" * (json_stream.CHUNK_SIZE + 10)
+        reader = json_stream.CountingReader(BytesIO(raw).read)
+        head = reader.peek(json_stream.CHUNK_SIZE)
+        self.assertEqual(reader.read(100), head)
+        self.assertEqual(reader.read(100), b"x" * 10)
+        self.assertEqual(reader.read(100), b"")
+
+
+class JSONStreamTest(unittest.TestCase):
+
+    def test_array_small_chunks(self):
+        data = [{"a": 1, "b": [2.5, "x"]}, 12345, "s", None, {"a": -1e3}]
+        raw = dumps(data).encode('utf-8')
+        for chunk_size in (1, 2, 3, 7, 64):
+            self.assertEqual(json_stream.load_stream(BytesIO(raw).read, chunk_size), data)
+
+    def test_object_larger_than_chunk(self):
+        document, raw = make_document(3 * json_stream.CHUNK_SIZE)
+        self.assertEqual(json_stream.load_stream(BytesIO(raw).read), document)
+
+    def test_extra_data(self):
+        self.assertRaises(ValueError, json_stream.load_stream, BytesIO(b"[1, 2] 3").read)
+
+
+if __name__ == "__main__":
+    unittest.main()
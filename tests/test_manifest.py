@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Cache manifest: batched saves"""
+from __future__ import print_function
+import shutil
+import tempfile
+import unittest
+from os.path import join, getmtime
+from os import utime
+
+from .support import import_plugin
+
+manifest = import_plugin("utils.manifest")
+
+
+class ManifestSaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_manifest_")
+        self.manifest = manifest.CacheManifest(self.dir)
+        self.path = join(self.dir, manifest.MANIFEST_FILE)
+        self.manifest.record("a", 10, "http://example.com/a.json")
+        self.manifest.record("b", 20, "http://example.com/b.json")
+        # Far in the past: any save changes the mtime
+        utime(self.path, (1000, 1000))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def reload(self):
+        return manifest.CacheManifest(self.dir)
+
+    def test_unsaved_updates_wait_for_flush(self):
+        self.manifest.touch_fetched("a", save=False)
+        self.manifest.set_size("b", 25, codec="zlib", save=False)
+        self.manifest.expire(["a"], save=False)
+        self.manifest.touch_fetched_many(["b"], save=False)
+        self.assertEqual(getmtime(self.path), 1000)
+        self.assertEqual(self.reload().get("b")['size'], 20)
+
+        self.assertTrue(self.manifest.flush())
+        self.assertNotEqual(getmtime(self.path), 1000)
+        entries = self.reload()
+        self.assertEqual(entries.get("a")['fetched'], 0)
+        self.assertEqual((entries.get("b")['size'], entries.get("b")['codec']), (25, "zlib"))
+
+    def test_default_saves_at_once(self):
+        self.manifest.set_size("a", 15)
+        self.assertEqual(self.reload().get("a")['size'], 15)
+
+    def test_missing_entry(self):
+        self.assertFalse(self.manifest.touch_fetched("missing", save=False))
+        self.assertFalse(self.manifest.set_size("missing", 1, save=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
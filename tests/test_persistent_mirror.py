@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Persistent tier mirrors of tmpfs folders (images, flags): throttled copies"""
+from __future__ import print_function
+import shutil
+import tempfile
+import unittest
+from os import listdir, makedirs, remove
+from os.path import join, exists
+
+from .support import import_plugin, LocalServer
+
+persistent_cache = import_plugin("utils.persistent_cache")
+image_cache = import_plugin("utils.image_cache")
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class MirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_tier_")
+        self.hot = join(self.dir, "hot")
+        self.tier = persistent_cache.PersistentTier(join(self.dir, "tier"), write_interval=3600)
+        self.mirror = join(self.tier.base_dir, "images")
+        makedirs(self.hot)
+        makedirs(self.tier.base_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def files(self, folder):
+        return sorted(f for f in listdir(folder) if f != persistent_cache.MIRROR_STAMP)
+
+    def test_store_is_throttled(self):
+        write(join(self.hot, "a.png"), b"a")
+        write(join(self.hot, "index.journal"), b"live")
+        extra = []
+
+        def write_index(folder):
+            extra.append(folder)
+            write(join(folder, "index.journal"), b"snapshot")
+        self.assertTrue(self.tier.store_dir("images", self.hot, skip=("index.journal",), write_extra=write_index))
+        self.assertEqual(self.files(self.mirror), ["a.png", "index.journal"])
+        with open(join(self.mirror, "index.journal"), 'rb') as f:
+            self.assertEqual(f.read(), b"snapshot")
+
+        # Within write_interval nothing is written, even from a new process
+        write(join(self.hot, "b.png"), b"b")
+        self.assertFalse(self.tier.store_dir("images", self.hot, skip=("index.journal",), write_extra=write_index))
+        tier = persistent_cache.PersistentTier(self.tier.base_dir, write_interval=3600)
+        self.assertFalse(tier.store_dir("images", self.hot))
+        self.assertEqual(self.files(self.mirror), ["a.png", "index.journal"])
+        self.assertEqual(len(extra), 1)
+        self.assertEqual(self.tier.get_stats()['throttled'], 1)
+
+    def test_store_copies_new_and_drops_gone(self):
+        self.tier.write_interval = 0
+        write(join(self.hot, "a.png"), b"a")
+        self.tier.store_dir("images", self.hot)
+        remove(join(self.hot, "a.png"))
+        write(join(self.hot, "b.png"), b"b")
+        write(join(self.hot, "c.png.tmp"), b"partial")
+        self.tier.store_dir("images", self.hot)
+        self.assertEqual(self.files(self.mirror), ["b.png"])
+
+    def test_restore(self):
+        write(join(self.hot, "a.png"), b"a")
+        self.tier.store_dir("images", self.hot)
+        target = join(self.dir, "after_reboot")
+        self.assertEqual(self.tier.restore_dir("images", target), 1)
+        self.assertEqual(self.files(target), ["a.png"])
+        self.assertEqual(self.tier.restore_dir("images", target), 0)
+        self.assertEqual(self.tier.restore_dir("flags/h120", join(self.dir, "none")), 0)
+
+        self.tier.remove_dir("images")
+        self.assertFalse(exists(self.mirror))
+
+
+class ImageCacheMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="tvgarden_images_")
+        self.server = LocalServer(lambda request: (200, {}, b"\x89PNG" + request.path.encode('ascii')))
+        self.tier = persistent_cache.PersistentTier(join(self.dir, "tier"), write_interval=3600)
+        makedirs(self.tier.base_dir)
+        self.get_tier = image_cache.get_persistent_tier
+        image_cache.get_persistent_tier = lambda: self.tier
+        self.cache = image_cache.ImageCache(join(self.dir, "hot"))
+
+    def tearDown(self):
+        image_cache.get_persistent_tier = self.get_tier
+        self.server.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_images_stay_on_tmpfs(self):
+        first = self.cache.get(self.server.url + "a.png", 'flag')
+        self.assertTrue(first.startswith(self.cache.base_dir))
+        mirror = join(self.tier.base_dir, image_cache.IMAGE_DIR)
+        self.assertEqual(len([f for f in listdir(mirror) if f.endswith(".png")]), 1)
+        self.assertTrue(exists(join(mirror, image_cache.INDEX_FILE)))
+
+        # Later downloads wait for the next mirror copy
+        self.cache.get(self.server.url + "b.png", 'flag')
+        self.assertEqual(len([f for f in listdir(mirror) if f.endswith(".png")]), 1)
+
+        restored = join(self.dir, "restored")
+        self.tier.restore_dir(image_cache.IMAGE_DIR, restored)
+        cache = image_cache.ImageCache(restored)
+        self.assertTrue(cache.lookup(self.server.url + "a.png", 'flag'))
+
+        self.cache.clear()
+        self.assertFalse(exists(mirror))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Remote sync: one repository tree request decides which cached files changed"""
+from __future__ import print_function
+import time
+import hashlib
+import unittest
+from json import dumps
+
+from .support import import_plugin, LocalServer
+
+cache = import_plugin("utils.cache")
+http_client = import_plugin("utils.http_client")
+
+UNCHANGED = "channels/raw/countries/aa.json"
+CHANGED = "channels/raw/countries/bb.json"
+
+
+def blob_sha(data):
+    return hashlib.sha1(("blob %d\0" % len(data)).encode('ascii') + data).hexdigest()
+
+
+class RemoteSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.files = {
+            UNCHANGED: dumps([{"name": "A", "nanoid": "a"}]).encode('utf-8'),
+            CHANGED: dumps([{"name": "B", "nanoid": "b"}]).encode('utf-8'),
+        }
+        self.tree_delay = 0
+        self.server = LocalServer(self.respond)
+        base = self.server.url
+        self.patched = {'get_repo_path': cache.get_repo_path, 'get_repo_tree_url': cache.get_repo_tree_url}
+        cache.get_repo_path = lambda url: url[len(base):] if url and url.startswith(base) else None
+        cache.get_repo_tree_url = lambda: base + "tree"
+        self.manager = cache.CacheManager()
+        self.manager.clear_all()
+        cache._sync_state.update({'loaded': True, 'last': 0, 'attempt': 0, 'validators': None, 'shas': None})
+
+    def tearDown(self):
+        for name, value in self.patched.items():
+            setattr(cache, name, value)
+        self.server.close()
+
+    def respond(self, request):
+        path = request.path.lstrip("/")
+        if path == "tree":
+            time.sleep(self.tree_delay)
+            return 200, {"Content-Type": "application/json"}, self.tree()
+        return 200, {}, self.files[path]
+
+    def tree(self):
+        """A recursive tree several read chunks long, like the real one"""
+        items = [{"path": path, "type": "blob", "sha": blob_sha(data)} for path, data in self.files.items()]
+        for n in range(3000):
+            items.append({"path": "channels/raw/other/f%04d.json" % n, "type": "blob",
+                          "sha": hashlib.sha1(str(n).encode('ascii')).hexdigest()})
+        tree = dumps({"sha": "0" * 40, "tree": items, "truncated": False}).encode('utf-8')
+        self.assertTrue(len(tree) > 3 * http_client.READ_CHUNK)
+        return tree
+
+    def fetch_all(self):
+        keys = {}
+        for path in self.files:
+            url = self.server.url + path
+            self.manager.fetch_url(url, force_refresh=True)
+            keys[path] = self.manager._get_cache_key(url)
+        cache._writer.flush()
+        return keys
+
+    def test_sync_touches_unchanged_and_expires_changed(self):
+        keys = self.fetch_all()
+        self.files[CHANGED] = dumps([{"name": "B2", "nanoid": "b"}]).encode('utf-8')
+        self.manager.manifest.expire(list(keys.values()))
+
+        self.assertEqual(self.manager.sync_with_remote(), (1, 1))
+        self.assertTrue(self.manager.manifest.get_age(keys[UNCHANGED]) < 60)
+        self.assertTrue(self.manager._is_cache_valid(keys[UNCHANGED]))
+        self.assertFalse(self.manager._is_cache_valid(keys[CHANGED]))
+
+    def test_expired_lookup_does_not_wait_for_tree(self):
+        keys = self.fetch_all()
+        self.manager.manifest.expire(list(keys.values()))
+        self.tree_delay = 1.0
+
+        start = time.time()
+        self.assertFalse(self.manager._is_cache_valid(keys[UNCHANGED]))
+        self.assertTrue(time.time() - start < 0.5)
+
+        # The background sync makes the entry fresh once the tree arrived
+        deadline = time.time() + 10
+        while not cache._sync_state['last'] and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.1)
+        self.assertTrue(self.manager._is_cache_valid(keys[UNCHANGED]))
+        self.assertEqual(self.server.requests.count("/tree"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Cache warm-up: failed downloads are counted"""
+from __future__ import print_function
+import threading
+import unittest
+from json import dumps
+
+from .support import import_plugin, LocalServer
+
+cache = import_plugin("utils.cache")
+http_client = import_plugin("utils.http_client")
+warmup = import_plugin("utils.warmup")
+
+
+class WarmupFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(self.respond)
+        self.saved = (cache.get_country_url, cache.get_category_url, cache.get_repo_path)
+        cache.get_country_url = lambda code: self.server.url + "countries/%s.json" % code
+        cache.get_category_url = lambda cat_id: self.server.url + "categories/%s.json" % cat_id
+        cache.get_repo_path = lambda url: None
+        http_client.get_failures().clear()
+        self.manager = cache.CacheManager()
+        self.manager.clear_all()
+        self.done = threading.Event()
+        self.result = None
+
+    def tearDown(self):
+        cache.get_country_url, cache.get_category_url, cache.get_repo_path = self.saved
+        http_client.get_failures().clear()
+        self.server.close()
+
+    def respond(self, request):
+        if "missing" in request.path:
+            return 404, {}, b"Not Found"
+        return 200, {}, dumps([{"nanoid": "a1", "name": "Rai News"}]).encode('utf-8')
+
+    def finished(self, done, failed, cancelled):
+        self.result = (done, failed, cancelled)
+        self.done.set()
+
+    def test_failures_are_counted(self):
+        job = warmup.CacheWarmup(on_done=self.finished, max_workers=2)
+        job.cache = self.manager
+        job._start_pool([('country', 'it'), ('country', 'missing'),
+                         ('category', 'news'), ('category', 'missing')])
+        self.assertTrue(self.done.wait(10))
+        self.assertEqual(self.result, (4, 2, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Write-behind queue: cancel without waiting for the running job"""
+from __future__ import print_function
+import threading
+import unittest
+
+from .support import import_plugin
+
+tasks = import_plugin("utils.tasks")
+
+
+class WriteBehindCancelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = tasks.WriteBehindQueue(name="TestWriter")
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.written = []
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.flush(5)
+
+    def write(self, value):
+        self.started.set()
+        self.release.wait(5)
+        self.written.append(value)
+
+    def test_cancel_busy_key_without_wait(self):
+        self.queue.submit("a", 1, self.write)
+        self.assertTrue(self.started.wait(5))
+        self.queue.submit("a", 2, self.written.append)
+
+        # The worker is busy with "a": nothing is dropped, no waiting
+        self.assertFalse(self.queue.cancel("a", wait=False))
+        self.assertEqual(self.queue.get_pending("a"), 2)
+        self.assertTrue(self.queue.cancel("b", wait=False))
+
+        self.release.set()
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.written, [1, 2])
+
+    def test_cancel_queued_key_without_wait(self):
+        self.queue.submit("a", 1, self.write)
+        self.assertTrue(self.started.wait(5))
+        self.queue.submit("b", 2, self.written.append)
+
+        self.assertTrue(self.queue.cancel("b", wait=False))
+        self.assertEqual(self.queue.get_pending("b"), None)
+        self.release.set()
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(self.written, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
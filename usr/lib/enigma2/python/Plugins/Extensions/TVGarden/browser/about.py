@@ -5,8 +5,6 @@ TV Garden Plugin - About Screen
 Shows plugin information, credits and version
 """
 from __future__ import print_function
-from os import listdir
-from os.path import exists, join, getsize
 from enigma import eTimer
 from Screens.Screen import Screen
 from Components.Sources.StaticText import StaticText
@@ -87,17 +85,10 @@ class TVGardenAbout(Screen):
 
             try:
                 # cache_size = cache.get_size()  # Numbers of file
-                cache_dir = cache.cache_dir
-
-                # Calculate total size
-                total_size = 0
-                if exists(cache_dir):
-                    for file in listdir(cache_dir):
-                        if file.endswith('.gz'):
-                            cache_files += 1
-                            file_path = join(cache_dir, file)
-                            if exists(file_path):
-                                total_size += getsize(file_path)
+                # Totals come from the cache manifest
+                info = cache.get_cache_info()
+                cache_files = info.get('total_files', 0)
+                total_size = int(info.get('total_size_kb', 0) * 1024)
 
                 # Format the size
                 if total_size > 0:
@@ -109,6 +100,14 @@ class TVGardenAbout(Screen):
                 else:
                     cache_info = "Empty"
 
+                if info.get('circuit', {}).get('open_hosts'):
+                    cache_info += ", offline mode"
+
+                failed = info.get('failed_urls', {})
+                if failed.get('known_bad'):
+                    cache_info += ", %d failing URLs (%d retries, %d given up)" % (
+                        failed['known_bad'], failed.get('retries', 0), failed.get('given_up', 0))
+
             except Exception as e:
                 log.debug("Could not get cache size: %s" % e, module="About")
                 cache_info = "Active"
@@ -13,6 +13,13 @@ from Components.MenuList import MenuList
 from Components.ActionMap import ActionMap
 
 from .. import _
+from ..utils.config import get_config
+from ..utils.image_cache import get_image_cache, get_prefetcher, ImageLoader
+
+
+# Quiet time after the last selection change before an image is fetched
+# (a held key scrolls past rows without loading their images)
+IMAGE_DEBOUNCE_MS = 150
 
 
 class BaseBrowser(Screen):
@@ -29,6 +36,14 @@ class BaseBrowser(Screen):
             self.timer.callback.append(self.on_timer)
         self.current_page = 0
         self.items_per_page = 10
+        self.is_closed = False
+        self.image_loader = None
+        self.image_timer = None
+        self._image_request = None
+        self._prefetch = None
+        # Tells the shared prefetcher which queue is ours
+        self._prefetch_owner = object()
+        self.onClose.append(self._mark_closed)
 
         self["menu"] = MenuList([])
         self["status"] = StaticText("")
@@ -42,6 +57,79 @@ class BaseBrowser(Screen):
             "right": self.right,
         }, -1)
 
+    def _mark_closed(self):
+        """Remember the screen is gone, late background callbacks check it"""
+        self.is_closed = True
+        self.cancel_image()
+        self.cancel_prefetch()
+
+    def request_image(self, url, kind, on_image):
+        """
+        Show the image of the current selection: at once when cached, else
+        fetched in the background once the selection rests IMAGE_DEBOUNCE_MS.
+        on_image(path or None) runs on the main loop for the latest request only.
+        """
+        self.cancel_image()
+        path = get_image_cache().lookup(url, kind)
+        if path:
+            on_image(path)
+            return
+
+        if self.image_loader is None:
+            self.image_loader = ImageLoader("TVGardenImages-%s" % self.__class__.__name__)
+        self._image_request = (url, kind, on_image)
+        self._start_image_timer()
+
+    def prefetch_images(self, items, index, key='logo', kind='logo'):
+        """
+        Warm the image cache with the rows around index: logo_prefetch_rows
+        each way (nearest first), then the rest of the page around it.
+        Queued once the selection rests, at low priority (see Prefetcher).
+        """
+        rows = get_config().get("logo_prefetch_rows", 10)
+        if rows <= 0 or not items:
+            return
+        order = []
+        for distance in range(1, max(rows, self.items_per_page) + 1):
+            for row in (index + distance, index - distance):
+                if 0 <= row < len(items) and (distance <= rows or abs(row - index) < self.items_per_page):
+                    order.append(row)
+        self._prefetch = [(items[row].get(key), kind) for row in order]
+        self._start_image_timer()
+
+    def _start_image_timer(self):
+        if self.image_timer is None:
+            self.image_timer = eTimer()
+            try:
+                self.image_timer_conn = self.image_timer.timeout.connect(self._start_image_request)
+            except AttributeError:
+                self.image_timer.callback.append(self._start_image_request)
+        self.image_timer.start(IMAGE_DEBOUNCE_MS, True)
+
+    def _start_image_request(self):
+        if self.is_closed:
+            return
+        if self._image_request is not None:
+            url, kind, on_image = self._image_request
+            self._image_request = None
+            self.image_loader.request(url, kind, on_image)
+        if self._prefetch is not None:
+            get_prefetcher().schedule(self._prefetch, owner=self._prefetch_owner)
+            self._prefetch = None
+
+    def cancel_image(self):
+        """Forget the pending and running image requests of this screen"""
+        self._image_request = None
+        if self.image_timer is not None:
+            self.image_timer.stop()
+        if self.image_loader is not None:
+            self.image_loader.cancel()
+
+    def cancel_prefetch(self):
+        """Drop the queued prefetch of this screen (other screens keep theirs)"""
+        self._prefetch = None
+        get_prefetcher().cancel(owner=self._prefetch_owner)
+
     def on_timer(self):
         """Timer callback for auto-refresh or updates"""
         pass
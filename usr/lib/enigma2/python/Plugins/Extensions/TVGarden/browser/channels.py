@@ -7,10 +7,8 @@ Based on TV Garden Project
 """
 from __future__ import print_function
 
-import tempfile
-from os import unlink
 from os.path import exists
-from sys import stderr, version_info
+from sys import stderr
 from enigma import ePicLoad, eServiceReference
 from Components.Sources.StaticText import StaticText
 from Components.Pixmap import Pixmap
@@ -19,11 +17,6 @@ from Screens.ChoiceBox import ChoiceBox
 from Screens.MessageBox import MessageBox
 from Components.ActionMap import ActionMap
 
-if version_info[0] == 3:
-    from urllib.request import urlopen
-else:
-    from urllib2 import urlopen
-
 
 try:
     from ..helpers import is_valid_stream_url, log
@@ -177,10 +170,8 @@ class ChannelsBrowser(BaseBrowser):
         """Load channels for current context (country or category)"""
         try:
             config = get_config()
-            max_channels = config.get("max_channels", 500)
 
             # Cache settings
-            cache_enabled = config.get("cache_enabled", True)
             force_refresh_browsing = config.get("force_refresh_browsing", False)
 
             channels = []
@@ -191,7 +182,8 @@ class ChannelsBrowser(BaseBrowser):
                     try:
                         channels = self.cache.get_country_channels(
                             self.country_code,
-                            force_refresh=force_refresh_browsing
+                            force_refresh=force_refresh_browsing,
+                            on_update=self.on_channels_refreshed
                         )
                     except TypeError:
                         # Method doesn't support force_refresh parameter
@@ -206,7 +198,8 @@ class ChannelsBrowser(BaseBrowser):
                     try:
                         channels = self.cache.get_category_channels(
                             self.category_id,
-                            force_refresh=force_refresh_browsing
+                            force_refresh=force_refresh_browsing,
+                            on_update=self.on_channels_refreshed
                         )
                     except TypeError:
                         # Method doesn't support force_refresh parameter
@@ -217,6 +210,35 @@ class ChannelsBrowser(BaseBrowser):
                 log.error("ERROR: No country_code or category_id!", module="Channels")
                 return
 
+            self.display_channels(channels)
+
+        except Exception as e:
+            log.error("load_channels failed: %s" % e, module="Channels")
+            import traceback
+            traceback.print_exc()
+            self["status"].setText(_("Error loading channels"))
+
+    def on_channels_refreshed(self, channels):
+        """Background refresh delivered fresh channels: re-render if still open"""
+        if self.is_closed or not channels:
+            return
+        log.info("Channels refreshed in background: %d" % len(channels), module="Channels")
+        current_index = self["menu"].getSelectedIndex() or 0
+        self.display_channels(channels)
+        if 0 <= current_index < len(self.menu_channels):
+            self["menu"].moveToIndex(current_index)
+            self.update_channel_selection(current_index)
+
+    def display_channels(self, channels):
+        """Filter channels and fill the menu"""
+        try:
+            config = get_config()
+            max_channels = config.get("max_channels", 500)
+
+            # Cache settings
+            cache_enabled = config.get("cache_enabled", True)
+            force_refresh_browsing = config.get("force_refresh_browsing", False)
+
             log.debug("Total channels received: %d" % len(channels), module="Channels")
             log.debug("Max channels limit: %d (0=all)" % max_channels, module="Channels")
             log.debug("Cache enabled: %s, Force refresh: %s" % (cache_enabled, force_refresh_browsing), module="Channels")
@@ -338,6 +360,7 @@ class ChannelsBrowser(BaseBrowser):
                     "stream_url": stream_url_to_use,
                     "logo": channel.get("logo") or channel.get("icon") or channel.get("image"),
                     "id": str(channel.get("nanoid", "ch_%d" % idx)),
+                    "nanoid": channel.get("nanoid", ""),
                     "description": str(channel.get("description", "")),
                     "group": str(channel.get("group", "")),
                     "language": str(channel.get("language", "")),
@@ -359,7 +382,8 @@ class ChannelsBrowser(BaseBrowser):
             else:
                 self["key_blue"].setText("")
 
-            self["menu"].onSelectionChanged.append(self.onSelectionChanged)
+            if self.onSelectionChanged not in self["menu"].onSelectionChanged:
+                self["menu"].onSelectionChanged.append(self.onSelectionChanged)
             if menu_items:
                 selected_idx = menu_items[0][1]
                 if 0 <= selected_idx < len(self.menu_channels):
@@ -404,7 +428,7 @@ class ChannelsBrowser(BaseBrowser):
             log.info("Cache status: enabled=%s, force_refresh=%s" % (cache_enabled, force_refresh_browsing), module="Channels")
 
         except Exception as e:
-            log.error("load_channels failed: %s" % e, module="Channels")
+            log.error("display_channels failed: %s" % e, module="Channels")
             import traceback
             traceback.print_exc()
             self["status"].setText(_("Error loading channels"))
@@ -420,10 +444,14 @@ class ChannelsBrowser(BaseBrowser):
             logo_url = self.current_channel.get('logo')
             if logo_url:
                 log.debug("Loading logo: %s..." % logo_url[:50], module="Channels")
-                self.download_logo(logo_url)
+                # Cached logos at once; downloads run in the background
+                self["logo"].hide()
+                self.request_image(logo_url, 'logo', self.on_logo)
             else:
                 log.debug("No logo available", module="Channels")
                 self["logo"].hide()
+            # Neighbouring logos, so scrolling finds them cached
+            self.prefetch_images(self.menu_channels, index)
         else:
             log.error("ERROR: Index %d out of range (0-%d)" % (index, len(self.menu_channels) - 1), module="Channels")
 
@@ -439,54 +467,23 @@ class ChannelsBrowser(BaseBrowser):
             self["logo"].hide()
             log.debug("No logo data, hiding", module="Channels")
 
-    def download_logo(self, url):
-        """Download and display channel logo"""
-        try:
-            try:
-                response = urlopen(url, timeout=5)
-                try:
-                    logo_data = response.read()
-                finally:
-                    response.close()
-            except Exception as e:
-                log.error("Error downloading logo: %s" % e, module="Channels")
-                self["logo"].hide()
-                return
-
-            try:
-                from os import close
-                temp_fd, temp_path = tempfile.mkstemp(suffix='.png')
-                close(temp_fd)
-                f = None
-                try:
-                    f = open(temp_path, 'wb')
-                    f.write(logo_data)
-                finally:
-                    if f:
-                        f.close()
-            except Exception as e:
-                log.error("Error creating temp file: %s" % e, module="Channels")
-                self["logo"].hide()
-                return
-
-            # Load with ePicLoad
-            self.picload.setPara((80, 50, 1, 1, False, 1, "#00000000"))
-
-            if exists('/var/lib/dpkg/info'):
-                # DreamOS
-                self.picload.startDecode(temp_path, 0, 0, False)
-            else:
-                # Python2 images
-                self.picload.startDecode(temp_path)
-
-            try:
-                unlink(temp_path)
-            except:
-                pass
+    def show_logo(self, logo_path):
+        """Decode a cached logo file (pre-scaled when PIL is there) into the logo widget"""
+        size = self["logo"].instance.size()
+        self.picload.setPara((size.width(), size.height(), 1, 1, False, 1, "#00000000"))
 
+        if exists('/var/lib/dpkg/info'):
+            # DreamOS
+            self.picload.startDecode(logo_path, 0, 0, False)
+        else:
+            # Python2 images
+            self.picload.startDecode(logo_path)
 
-        except Exception as e:
-            log.error("Error downloading logo: %s" % e, module="Channels")
+    def on_logo(self, logo_path):
+        """Image loader result for the selected channel"""
+        if logo_path:
+            self.show_logo(logo_path)
+        else:
             self["logo"].hide()
 
     def generate_country_bouquet(self, country_code, channels):
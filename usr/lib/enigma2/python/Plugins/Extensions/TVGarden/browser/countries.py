@@ -6,8 +6,6 @@ Browse 150+ countries with flags
 Based on TV Garden Project
 """
 from __future__ import print_function
-import tempfile
-from os import unlink
 from os.path import exists
 # from Components.Sources.StaticText import StaticText
 from Components.Label import Label
@@ -15,7 +13,6 @@ from enigma import eTimer, loadPNG  # ,ePicLoad
 from Components.Pixmap import Pixmap
 from Components.MenuList import MenuList
 from Components.ActionMap import ActionMap
-from sys import version_info
 
 from .. import _
 from .base import BaseBrowser
@@ -23,12 +20,7 @@ from .channels import ChannelsBrowser
 from ..helpers import log
 from ..utils.cache import CacheManager
 from ..utils.config import PluginConfig, get_config
-
-
-if version_info[0] == 3:
-    from urllib.request import urlopen, Request
-else:
-    from urllib2 import urlopen, Request
+from ..utils.flag_store import get_flag_store
 
 
 class CountriesBrowser(BaseBrowser):
@@ -66,7 +58,7 @@ class CountriesBrowser(BaseBrowser):
 
         self.countries = []
         self.selected_country = None
-        self.current_flag_path = None
+        self.flags = get_flag_store()
 
         log.info("Flags enabled using loadPNG method", module="Countries")
         self["menu"] = MenuList([], enableWrapAround=True)
@@ -109,23 +101,8 @@ class CountriesBrowser(BaseBrowser):
             finally:
                 self.timer = None
 
-        if hasattr(self, 'flag_timer') and self.flag_timer:
-            try:
-                self.flag_timer.callback = []
-                self.flag_timer.stop()
-            except Exception as e:
-                log.debug("Error stopping flag_timer: {}".format(e), module="Countries")
-            finally:
-                self.flag_timer = None
-
-        # Remove temporary flag file
-        if hasattr(self, 'current_flag_path') and self.current_flag_path:
-            if exists(self.current_flag_path):
-                try:
-                    unlink(self.current_flag_path)
-                except Exception as e:
-                    log.debug("Error deleting temp file: {}".format(e), module="Countries")
-            self.current_flag_path = None
+        # Drop flag downloads still running
+        self.cancel_image()
 
         # Remove picload callback
         if hasattr(self, 'picload_conn') and self.picload_conn:
@@ -167,13 +144,15 @@ class CountriesBrowser(BaseBrowser):
         try:
             # Get cache configuration
             config = get_config()
-            cache_enabled = config.get("cache_enabled", True)
             force_refresh_browsing = config.get("force_refresh_browsing", False)
 
             # Load metadata with cache config
             if hasattr(self.cache, 'get_countries_metadata'):
                 try:
-                    metadata = self.cache.get_countries_metadata(force_refresh=force_refresh_browsing)
+                    metadata = self.cache.get_countries_metadata(
+                        force_refresh=force_refresh_browsing,
+                        on_update=self.on_metadata_refreshed
+                    )
                 except TypeError:
                     # If the method does not support force_refresh
                     metadata = self.cache.get_countries_metadata()
@@ -181,6 +160,33 @@ class CountriesBrowser(BaseBrowser):
                 # Fallback
                 metadata = {}
 
+            self.display_countries(metadata)
+
+        except Exception as e:
+            self["status"].setText(_("Error loading countries"))
+            log.error("Error: %s" % e, module="Countries")
+            import traceback
+            traceback.print_exc()
+
+    def on_metadata_refreshed(self, metadata):
+        """Background refresh delivered fresh metadata: re-render if still open"""
+        if self.is_closed or not metadata:
+            return
+        log.info("Countries metadata refreshed in background", module="Countries")
+        selected_code = self.selected_country['code'] if self.selected_country else None
+        self.display_countries(metadata)
+        for idx, country in enumerate(self.countries):
+            if country['code'] == selected_code:
+                self["menu"].moveToIndex(idx)
+                break
+
+    def display_countries(self, metadata):
+        """Build the countries menu from metadata"""
+        try:
+            config = get_config()
+            cache_enabled = config.get("cache_enabled", True)
+            force_refresh_browsing = config.get("force_refresh_browsing", False)
+
             log.debug("Metadata received: %d countries" % len(metadata), module="Countries")
 
             self.countries = []
@@ -258,7 +264,7 @@ class CountriesBrowser(BaseBrowser):
     def load_initial_flag(self):
         """Load first flag after a short delay"""
         if self.countries:
-            self.update_country_selection(0)
+            self.update_country_selection(self["menu"].getSelectedIndex() or 0)
 
     def onSelectionChanged(self):
         """Called when menu selection changes"""
@@ -284,106 +290,58 @@ class CountriesBrowser(BaseBrowser):
             flag_url = "https://flagcdn.com/w80/%s.png" % flag_code
             log.debug("Flag URL: %s" % flag_url, module="Countries")
 
-            # Use a timer to prevent rapid consecutive loads
-            if hasattr(self, 'flag_timer'):
-                self.flag_timer.stop()
+            self.download_flag_safe(flag_url, flag_code)
 
-            self.flag_timer = eTimer()
-            try:
-                self.flag_timer.timeout.connect(
-                    lambda: self.download_flag_safe(flag_url, flag_code)
-                )
-            except AttributeError:
-                self.flag_timer.callback.append(
-                    lambda: self.download_flag_safe(flag_url, flag_code)
-                )
+    def download_flag_safe(self, url, country_code):
+        """
+        Show a flag from the local flag store (one archive, installed the
+        first time). While an install is backing off after a failure, the
+        flag is fetched alone through the image cache.
+        """
+        log.debug("Loading flag for: %s" % country_code, module="Countries")
+        self.cancel_image()
+        if self.flags.is_installed():
+            self.show_flag(self.flags.path(country_code), country_code)
+        elif self.flags.is_available():
+            # The previous country's flag would stay up until the install ends
+            self["flag"].hide()
+            self.flags.install_async(self.on_flags_installed)
+        else:
+            self.request_image(url, 'flag', lambda path: self.show_flag(path, country_code))
 
-            self.flag_timer.start(100, True)
+    def on_flags_installed(self, ok):
+        """Show the flag of the current selection once the install ended"""
+        if not self.is_closed and self.countries:
+            self.update_country_selection(self["menu"].getSelectedIndex() or 0)
 
-    def download_flag_safe(self, url, country_code):
+    def show_flag(self, flag_path, country_code):
         """Load flag using PROPER loadPNG pattern"""
-        try:
-            # Hide first
+        if not flag_path or not exists(flag_path):
+            log.warning("No data for flag %s" % country_code, module="Countries")
             self["flag"].hide()
-            
-            log.debug("Loading flag for: %s" % country_code, module="Countries")
-            
-            # Download flag
-            req = Request(url, headers={'User-Agent': 'TVGarden-Enigma2/1.0'})
-            response = None
-            flag_data = None
-            try:
-                response = urlopen(req, timeout=5)
-                if response.getcode() == 200:
-                    flag_data = response.read()
-                    log.debug("Downloaded %d bytes" % len(flag_data), module="Countries")
-                else:
-                    log.warning("HTTP %d for flag %s" % (response.getcode(), country_code), module="Countries")
-                    return
-            finally:
-                if response:
-                    response.close()
-
-            if not flag_data:
-                log.warning("No data for flag %s" % country_code, module="Countries")
-                return
-
-            # Save temporarily
-            import os
-            temp_fd, temp_path = tempfile.mkstemp(suffix='.png')
-            os.close(temp_fd)
-            
-            with open(temp_path, 'wb') as f:
-                f.write(flag_data)
-            
-            log.debug("Saved to temp file: %s" % temp_path, module="Countries")
-
-            # 1. Check if file exists
-            # 2. Encode for Python 2 if needed
-            # 3. Load with loadPNG
-            # 4. Set pixmap
-            # 5. Set scale
-            # 6. Show
-            
-            if exists(temp_path):
-                # Handle Python 2/3 encoding
-                if exists('/var/lib/dpkg/info'):
-                    png_path = temp_path.encode('utf-8')
-                else:
-                    png_path = temp_path
-                
-                try:
-                    pixmap = loadPNG(png_path)
-                    
-                    if pixmap:
-                        # Set to widget - CORRECT pattern
-                        self["flag"].instance.setPixmap(pixmap)
-                        self["flag"].instance.setScale(1)
-                        self["flag"].instance.show()
-                        log.info("✓ Flag displayed for %s" % country_code, module="Countries")
-                    else:
-                        log.warning("loadPNG returned None for %s" % country_code, module="Countries")
-                        
-                except ImportError as e:
-                    log.error("loadPNG not available: %s" % e, module="Countries")
-                except Exception as e:
-                    log.error("loadPNG error: %s" % e, module="Countries")
-                    import traceback
-                    traceback.print_exc()
-
-            # Cleanup
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-                
+            return
+
+        try:
+            # Handle Python 2/3 encoding
+            if exists('/var/lib/dpkg/info'):
+                png_path = flag_path.encode('utf-8')
+            else:
+                png_path = flag_path
+
+            pixmap = loadPNG(png_path)
+            if pixmap:
+                # Set to widget - CORRECT pattern
+                self["flag"].instance.setPixmap(pixmap)
+                self["flag"].instance.setScale(1)
+                self["flag"].instance.show()
+                log.info("✓ Flag displayed for %s" % country_code, module="Countries")
+            else:
+                log.warning("loadPNG returned None for %s" % country_code, module="Countries")
+
         except Exception as e:
             log.error("Flag error %s: %s" % (country_code, e), module="Countries")
             import traceback
             traceback.print_exc()
-        
-        # Hide if all failed
-        self["flag"].hide()
 
     # def download_flag_safe(self, url, country_code):
         # """Load flag using loadPNG (ACTIVE VERSION)"""
@@ -522,19 +480,8 @@ class CountriesBrowser(BaseBrowser):
 
         log.info("Opening channels for: {}".format(self.selected_country['code']), module="Countries")
 
-        # Cleanup before opening new screen
-        if self.current_flag_path and exists(self.current_flag_path):
-            try:
-                unlink(self.current_flag_path)
-            except:
-                pass
-
-        # Additional minor cleanup
-        if hasattr(self, 'flag_timer') and self.flag_timer:
-            try:
-                self.flag_timer.stop()
-            except:
-                pass
+        # No flag for this screen will be needed any more
+        self.cancel_image()
 
         self.session.open(
             ChannelsBrowser,
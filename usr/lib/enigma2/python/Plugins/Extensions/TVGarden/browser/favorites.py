@@ -116,6 +116,7 @@ class FavoritesBrowser(BaseBrowser):
                         'stream_url': stream_url,
                         'logo': channel.get('logo') or channel.get('icon'),
                         'id': channel.get('id', 'fav_%d' % idx),
+                        'nanoid': channel.get('nanoid', ''),
                         'description': channel.get('description', ''),
                         'group': channel.get('group', ''),
                         'language': channel.get('language', ''),
@@ -17,6 +17,7 @@ from Screens.VirtualKeyBoard import VirtualKeyBoard
 
 from .base import BaseBrowser
 from ..utils.cache import CacheManager
+from ..utils.index import get_index
 from ..helpers import is_valid_stream_url, log
 from ..utils.favorites import FavoritesManager
 from ..player.iptv_player import TVGardenPlayer
@@ -64,6 +65,7 @@ class SearchBrowser(BaseBrowser):
 
         self.search_query = ""
         self.all_channels = []
+        self.index = None
         self.filtered_channels = []
         self.menu_channels = []
 
@@ -110,10 +112,15 @@ class SearchBrowser(BaseBrowser):
 
             # 1. FIRST try using all-channels.json
             log.debug("Trying all-channels.json...", module="Search")
-            all_channels_data = self.cache.get_category_channels("all-channels", force_refresh=force_refresh_browsing)
+            all_channels_data = self.cache.get_category_channels(
+                "all-channels",
+                force_refresh=force_refresh_browsing,
+                on_update=self.on_channels_refreshed
+            )
 
             if all_channels_data:
                 self.all_channels = all_channels_data
+                self._set_index(all_channels_data)
                 log.info("Loaded %d from all-channels.json" % len(self.all_channels), module="Search")
             else:
                 # 2. FALLBACK: use dynamic categories
@@ -132,6 +139,8 @@ class SearchBrowser(BaseBrowser):
                         channels = self.cache.get_category_channels(cat_id, force_refresh=force_refresh_browsing)
                         if channels:
                             for channel in channels:
+                                # Cached lists are shared: tag a copy
+                                channel = dict(channel)
                                 channel['category'] = category['name']
                                 self.all_channels.append(channel)
                             log.debug("Added %d from %s" % (len(channels), cat_id), module="Search")
@@ -152,6 +161,23 @@ class SearchBrowser(BaseBrowser):
             log.error("ERROR: %s" % e, module="Search")
             self["status"].setText(_("Error loading channels"))
 
+    def _set_index(self, channels):
+        """Search through the channel index (kept up to date by the delta engine)"""
+        if get_config().get("use_channel_index", True):
+            self.index = get_index(channels)
+
+    def on_channels_refreshed(self, channels):
+        """Background refresh delivered fresh channels: swap them in if still open"""
+        if self.is_closed or not channels:
+            return
+        self.all_channels = channels
+        self._set_index(channels)
+        log.info("Channels refreshed in background: %d" % len(channels), module="Search")
+        if self.search_query:
+            self.perform_search()
+        else:
+            self["status"].setText(_("Press GREEN for keyboard... Ready - %d channels") % len(channels))
+
     def open_keyboard(self):
         """Open virtual keyboard"""
         self.session.openWithCallback(
@@ -209,9 +235,12 @@ class SearchBrowser(BaseBrowser):
         self.menu_channels = []
 
         try:
-            for channel in self.all_channels:
-                if self.match_channel(channel, query):
-                    self.search_results.append(channel)
+            if self.index is not None and self.index.source is self.all_channels:
+                self.search_results = self.index.search(query)
+            else:
+                for channel in self.all_channels:
+                    if self.match_channel(channel, query):
+                        self.search_results.append(channel)
         except Exception as e:
             log.error("Search error: %s" % e, module="Search")
 
@@ -313,6 +342,7 @@ class SearchBrowser(BaseBrowser):
                 'stream_url': stream_url,
                 'logo': channel.get('logo'),
                 'id': channel.get('nanoid', 'srch_%d' % idx),
+                'nanoid': channel.get('nanoid', ''),
                 'description': channel.get('description', ''),
                 'group': channel.get('group', ''),
                 'language': channel.get('language', ''),
@@ -382,6 +412,7 @@ class SearchBrowser(BaseBrowser):
             'stream_url': stream_url,
             'logo': channel.get('logo') or channel.get('icon'),
             'id': channel.get('nanoid', ''),
+            'nanoid': channel.get('nanoid', ''),
             'description': channel.get('description', ''),
             'group': channel.get('group', '') or channel.get('category', ''),
             'language': channel.get('language', ''),
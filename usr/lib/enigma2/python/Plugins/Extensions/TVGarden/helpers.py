@@ -169,6 +169,19 @@ def get_all_channels_url():
     return "https://raw.githubusercontent.com/Belfagor2005/tv-garden-channel-list/main/channels/raw/categories/all-channels.json"
 
 
+def get_repo_tree_url():
+    """Git tree of the channel-list repository (path + blob sha of every file)"""
+    return "https://api.github.com/repos/Belfagor2005/tv-garden-channel-list/git/trees/main?recursive=1"
+
+
+def get_repo_path(url):
+    """Path of a channel-list file inside the repository, None for other URLs"""
+    prefix = REPO_BASE + "/"
+    if url and url.startswith(prefix):
+        return url[len(prefix):]
+    return None
+
+
 def get_flag_url(country_code, size=80):
     """Get URL for country flag"""
     return "https://flagcdn.com/w%d/%s.png" % (size, country_code.lower())
@@ -127,7 +127,10 @@ from .browser.countries import CountriesBrowser
 from .browser.categories import CategoriesBrowser
 from .browser.favorites import FavoritesBrowser
 from .browser.search import SearchBrowser
-from .utils.cache import CacheManager
+from .utils.cache import CacheManager, flush_cache_writes
+from .utils.warmup import start_warmup, get_warmup
+from .utils.delta import add_change_listener
+from .utils.favorites import on_channel_changes
 from .utils.config import PluginConfig
 from .utils.update_manager import UpdateManager
 from .utils.updater import PluginUpdater
@@ -138,6 +141,9 @@ plugin_path = dirname(__file__)
 if plugin_path not in path:
     path.insert(0, plugin_path)
 
+# Favorites and exported bouquets follow all-channels.json updates
+add_change_listener(on_channel_changes)
+
 
 simple_log("START PLUGIN TVGARDEN BY LULULLA - TEST")
 
@@ -200,11 +206,14 @@ class TVGardenMain(Screen):
         self["status"] = StaticText("TV Garden %s | Ready" % PLUGIN_VERSION)
 
         self.cache = CacheManager()
+        self.is_closed = False
+        self.onClose.append(self._detach_warmup)
         self.menu_items = [
             (_("Browse by Country"), "countries", _("Browse channels by country")),
             (_("Browse by Category"), "categories", _("Browse channels by category")),
             (_("Favorites"), "favorites", _("Your favorite channels")),
             (_("Search"), "search", _("Search channels by name")),
+            (_("Download All Lists"), "warmup", _("Prefetch every list for fast browsing")),
             (_("Settings"), "settings", _("Plugin settings and configuration")),
             (_("Check for Updates"), "updates", _("Check for plugin updates")),
             (_("About"), "about", _("About TV Garden plugin"))
@@ -227,7 +236,7 @@ class TVGardenMain(Screen):
 
         test_url = get_metadata_url()
         try:
-            data = self.cache.fetch_url(test_url, force_refresh=False)
+            data = self.cache.fetch_url(test_url, force_refresh=False, kind='metadata')
             log.info("✓ Cache test OK: %s, %d items" % (type(data), len(data) if data else 0), module="Test")
             self.update_cache_status()
         except Exception as e:
@@ -248,6 +257,8 @@ class TVGardenMain(Screen):
                 self.session.open(FavoritesBrowser)
             elif action == "search":
                 self.open_search()
+            elif action == "warmup":
+                self.start_warmup()
             elif action == "settings":
                 self.open_settings()
             elif action == "updates":
@@ -255,6 +266,32 @@ class TVGardenMain(Screen):
             elif action == "about":
                 self.show_about()
 
+    def start_warmup(self):
+        """Prefetch all lists in background, progress in the status bar"""
+        self["status"].setText(_("Downloading lists..."))
+        start_warmup(on_progress=self.on_warmup_progress, on_done=self.on_warmup_done)
+
+    def on_warmup_progress(self, done, total):
+        if self.is_closed:
+            return
+        self["status"].setText(_("Downloading lists: %d/%d") % (done, total))
+
+    def on_warmup_done(self, done, failed, cancelled):
+        if self.is_closed:
+            return
+        if failed:
+            self["status"].setText(_("Lists downloaded: %d (%d failed)") % (done, failed))
+        else:
+            self["status"].setText(_("Lists downloaded: %d") % done)
+
+    def _detach_warmup(self):
+        """Keep the job running after the menu closes, without UI callbacks"""
+        self.is_closed = True
+        job = get_warmup()
+        if job is not None:
+            job.on_progress = None
+            job.on_done = None
+
     def open_search(self):
         """Open search screen"""
         self.session.open(SearchBrowser)
@@ -370,8 +407,9 @@ class TVGardenMain(Screen):
 
     def exit(self):
         """Exit plugin"""
-        self.cache.clear_all()
-        self.update_cache_status()
+        # Entries stay for the next session (size-bounded, LRU-evicted);
+        # finish queued writes so the persistent tier gets them
+        flush_cache_writes()
         self.close()
 
 
@@ -382,6 +420,22 @@ def menu(menuid, **kwargs):
     return []
 
 
+def sessionstart(reason, session=None, **kwargs):
+    """Optional cache warm-up at session start"""
+    if reason != 0:
+        return
+    try:
+        from .utils.config import get_config
+        if not get_config().get("warmup_on_start", False):
+            return
+        from twisted.internet import reactor
+        # Give the network time to come up
+        reactor.callLater(60, start_warmup)
+        log.info("Cache warm-up scheduled", module="Main")
+    except Exception as e:
+        log.error("Cannot schedule cache warm-up: %s" % e, module="Main")
+
+
 def main(session, **kwargs):
     try:
         return session.open(TVGardenMain)
@@ -447,4 +501,9 @@ def Plugins(**kwargs):
         fnc=main
     )
 
-    return [plugin_descriptor, extensions_descriptor]
+    sessionstart_descriptor = PluginDescriptor(
+        where=PluginDescriptor.WHERE_SESSIONSTART,
+        fnc=sessionstart
+    )
+
+    return [plugin_descriptor, extensions_descriptor, sessionstart_descriptor]
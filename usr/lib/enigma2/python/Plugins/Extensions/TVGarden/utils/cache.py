@@ -7,19 +7,36 @@ Based on TV Garden Project
 """
 from __future__ import print_function
 import time
+import atexit
 import hashlib
-import gzip
-from os.path import join, exists, getmtime, getsize
-from os import listdir, remove, makedirs
-from json import load, loads, dump, dumps
+import tempfile
+import threading
+from collections import OrderedDict
+from os.path import join, exists
+from os import listdir, remove, makedirs, rename, fdopen
+from json import load, loads, dump
 from sys import version_info
 
 from .config import get_config
+from .tasks import run_in_background, WriteBehindQueue
+from .http_client import (
+    open_url, read_body, get_content_encoding, get_failures, get_breaker, is_offline,
+    DecodedReader, KnownBadURL, ACCEPT_ENCODING, READ_CHUNK
+)
+from .manifest import get_manifest, flush_manifests
+from .persistent_cache import get_persistent_tier
+from .cache_codec import get_codec
+from .json_stream import load_stream, CountingReader
+from .index import get_index, apply_changes
+from .delta import diff_channels, publish_changes
+from .ttl import get_ttl
+from .journal import get_journal
+from .image_cache import get_image_cache, flush_image_cache
 
 if version_info[0] == 3:
-    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
 else:
-    from urllib2 import urlopen, Request
+    from urllib2 import HTTPError
 
 
 try:
@@ -29,6 +46,8 @@ try:
         get_category_url,
         get_categories_url,
         get_all_channels_url,
+        get_repo_tree_url,
+        get_repo_path,
         log
     )
 except ImportError as e:
@@ -52,6 +71,217 @@ except ImportError as e:
     def get_all_channels_url():
         return "https://raw.githubusercontent.com/Belfagor2005/tv-garden-channel-list/main/channels/raw/categories/all-channels.json"
 
+    def get_repo_tree_url():
+        return "https://api.github.com/repos/Belfagor2005/tv-garden-channel-list/git/trees/main?recursive=1"
+
+    def get_repo_path(url):
+        prefix = "https://raw.githubusercontent.com/Belfagor2005/tv-garden-channel-list/main/"
+        if url and url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+
+# Returned by _fetch_url_conditional when the server answers 304
+NOT_MODIFIED = object()
+
+# Background refreshes in progress, shared by all CacheManager instances
+# (cache_key -> callbacks waiting for the fresh data)
+_refresh_lock = threading.Lock()
+_refreshing = {}
+
+
+class _FlightCall:
+    """One in-flight call and its outcome"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls: one runs, the others wait and share its result or error"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, func):
+        """Run func() once for all concurrent callers of key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _FlightCall()
+                self._calls[key] = call
+                leader = True
+                self.stats['calls'] += 1
+            else:
+                leader = False
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            log.debug("Joining in-flight request: %s" % key, module="Cache")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+# Shared by all CacheManager instances
+_flight = SingleFlight()
+
+
+class MemoryLRU:
+    """
+    Parsed objects kept in RAM above the gzip disk cache.
+    Bounded by entry count (cache_size) and approximate size (JSON bytes).
+    Returned objects are shared: callers must not modify them.
+    """
+
+    def __init__(self, max_entries=500, max_bytes=8192 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (data, size)
+        self._bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def configure(self, max_entries, max_bytes):
+        """Apply new limits, evicting if needed"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries[key] = entry
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, data, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                # Larger than the whole budget: keep it on disk only
+                return False
+            self._entries[key] = (data, size)
+            self._bytes += size
+            self._evict()
+            return True
+
+    def resize(self, key, data, size):
+        """Set the real size of an entry added before it was serialised"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not data:
+                return False
+            self._bytes += size - entry[1]
+            self._entries[key] = (data, size)
+            self._evict()
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 self._bytes > self.max_bytes):
+            key, (data, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats['evictions'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['size_kb'] = self._bytes / 1024.0
+        return stats
+
+
+# Parsed-object tier shared by all CacheManager instances
+_memory = MemoryLRU()
+
+# Disk writes happen off the UI thread
+_writer = WriteBehindQueue("TVGardenCacheWriter")
+
+
+def flush_cache_writes(timeout=10.0):
+    """Wait for queued cache writes, save pending manifest changes and logo access times"""
+    done = _writer.flush(timeout)
+    flush_manifests()
+    flush_image_cache()
+    return done
+
+
+atexit.register(flush_cache_writes)
+
+JOURNAL_FILE = "memory_cache.journal"
+LEGACY_MEMORY_FILE = "memory_cache.json"
+
+# Compressed bodies kept as received (cache_key -> (data, path, codec, size, raw_size))
+# until _set_cached installs them as the entry file
+DOWNLOAD_SUFFIX = ".dl"
+DOWNLOAD_CODECS = {'gzip': 'gzip', 'x-gzip': 'gzip', 'deflate': 'zlib'}
+_download_lock = threading.Lock()
+_downloads = {}
+
+# Disk eviction statistics (since plugin start)
+_disk_lock = threading.Lock()
+_disk_stats = {'evictions': 0, 'evicted_kb': 0.0}
+
+# Last sync with the repository tree, shared by all CacheManager instances
+# ('last' successful sync, 'attempt' last try, tree validators, path -> blob sha)
+REMOTE_TREE_PREFIX = "channels/raw/"
+_sync_lock = threading.Lock()
+_sync_state = {'loaded': False, 'last': 0, 'attempt': 0, 'validators': None, 'shas': None}
+
+
+def git_blob_hasher(length):
+    """sha1 object for the git blob sha (as listed in the repository tree) of a length-byte file"""
+    return hashlib.sha1(("blob %d\0" % length).encode('ascii'))
+
+
+def _remove_quietly(path):
+    try:
+        remove(path)
+    except OSError:
+        pass
+
+
+def _drop_download(cache_key):
+    """Forget the kept body of cache_key, removing its file"""
+    with _download_lock:
+        download = _downloads.pop(cache_key, None)
+    if download is not None:
+        _remove_quietly(download[1])
+
 
 class CacheManager:
     """Smart cache manager with TTL support"""
@@ -68,80 +298,51 @@ class CacheManager:
         if not exists(self.cache_dir):
             makedirs(self.cache_dir)
 
-        files = listdir(self.cache_dir)
-        log.debug("Files in cache: %s" % files, module="Cache")
+        self.manifest = get_manifest(self.cache_dir)
+        log.debug("Entries in cache: %d" % self.manifest.get_totals()[0], module="Cache")
 
-        self.cache_data = {}
-        self._load_cache()
-        log.info("Initialized at %s" % self.cache_dir, module="Cache")
+        # Small key/value data (category listing), shared by all instances
+        self.cache_data = get_journal(join(self.cache_dir, JOURNAL_FILE),
+                                      join(self.cache_dir, LEGACY_MEMORY_FILE))
 
-    def _load_cache(self):
-        """Load memory cache from disk"""
-        try:
-            cache_file = join(self.cache_dir, "memory_cache.json")
-            if exists(cache_file):
-                with open(cache_file, 'r') as f:
-                    self.cache_data = load(f)
-                log.debug("Memory cache loaded from %s" % cache_file, module="Cache")
-                return True
-        except Exception as e:
-            log.error("Error loading memory cache: %s" % e, module="Cache")
-        return False
-
-    def _save_cache(self):
-        """Save memory cache to disk"""
-        try:
-            cache_file = join(self.cache_dir, "memory_cache.json")
-            f = None
-            try:
-                f = open(cache_file, 'w')
-                dump(self.cache_data, f)
-                log.debug("Memory cache saved to %s" % cache_file, module="Cache")
-                return True
-            finally:
-                if f:
-                    f.close()
-        except Exception as e:
-            log.error("Error saving memory cache: %s" % e, module="Cache")
-            return False
+        config = get_config()
+        _memory.configure(
+            config.get("cache_size", 500),
+            config.get("memory_cache_max_kb", 8192) * 1024
+        )
+        log.info("Initialized at %s" % self.cache_dir, module="Cache")
 
     def get_cache_info(self):
         """Get detailed cache information"""
         try:
-            files = []
-            try:
-                files = listdir(self.cache_dir)
-            except Exception as e:
-                log.error("Cannot list cache dir: %s" % str(e), module="Cache")
-                return {'error': str(e)}
-
-            # Filter real cache files (exclude logs)
-            cache_files = []
-            for f in files:
-                # Include .gz files and .json cache files (not logs)
-                if (f.endswith('.gz') or
-                        (f.endswith('.json') and f not in ['memory_cache.json', 'tvgarden.log'])):
-                    cache_files.append(f)
-
-            # Calculate total size
-            total_size = 0
-            for f in cache_files:
-                file_path = join(self.cache_dir, f)
-                try:
-                    total_size += getsize(file_path)
-                except:
-                    pass
+            # Answered from the manifest, no directory walk
+            total_files, total_size = self.manifest.get_totals()
+            cache_files = self.manifest.get_files(10)
 
             info = {
-                'total_files': len(cache_files),
-                'cache_files': cache_files[:10],
+                'total_files': total_files,
+                'cache_files': cache_files,
                 'total_size_kb': total_size / 1024.0,
                 'cache_dir': self.cache_dir,
-                'memory_entries': len(self.cache_data)
+                'memory_entries': len(self.cache_data),
+                'journal': self.cache_data.get_stats(),
+                'images': get_image_cache().get_stats(),
+                'coalesced_requests': _flight.stats['coalesced'],
+                'parsed': _memory.get_stats(),
+                'writes': _writer.get_stats(),
+                'evictions': _disk_stats['evictions'],
+                'evicted_kb': _disk_stats['evicted_kb'],
+                'last_sync': _sync_state['last'],
+                'failed_urls': get_failures().get_stats(),
+                'circuit': get_breaker().get_stats()
             }
 
+            tier = get_persistent_tier()
+            if tier is not None:
+                info['persistent'] = tier.get_stats()
+
             log.debug("Cache info: %d files, %.1fKB" % (
-                len(cache_files), total_size / 1024.0
+                total_files, total_size / 1024.0
             ), module="Cache")
             return info
 
@@ -154,70 +355,531 @@ class CacheManager:
         return hashlib.md5(url.encode()).hexdigest()
 
     def _get_cache_path(self, key):
-        """Get cache file path"""
+        """Get cache file path (name kept for all codecs, the manifest knows the format)"""
         return join(self.cache_dir, "%s.json.gz" % key)
 
-    def _is_cache_valid(self, cache_path, ttl=3600):
-        """Check if cache is still valid"""
-        if not exists(cache_path):
+    def _ensure_hot(self, cache_key):
+        """Make sure an entry is in the tmpfs tier, promoting it from the persistent tier"""
+        if cache_key in self.manifest:
+            return True
+        tier = get_persistent_tier()
+        if tier is None or not tier.has(cache_key):
+            return False
+        if not tier.promote(cache_key, self._get_cache_path(cache_key), self.manifest):
             return False
+        self._enforce_disk_limits(keep_key=cache_key)
+        return True
 
-        file_age = time.time() - getmtime(cache_path)
-        return file_age < ttl
+    def _persist(self, cache_key, url=None, validators=None):
+        """Copy an entry to the persistent tier (throttled there)"""
+        tier = get_persistent_tier()
+        if tier is not None:
+            entry = self.manifest.get(cache_key) or {}
+            tier.store(cache_key, self._get_cache_path(cache_key), url, validators,
+                       codec=entry.get('codec'), raw_size=entry.get('raw_size'))
+
+    def _get_validators(self, cache_key):
+        """
+        Get stored ETag/Last-Modified validators for a cache entry.
+        None without a body to keep: a 304 must not confirm a missing file.
+        """
+        self._ensure_hot(cache_key)
+        if not exists(self._get_cache_path(cache_key)) and _writer.get_pending(cache_key) is None:
+            return None
+        return self.manifest.get_validators(cache_key)
+
+    def _touch_cache(self, cache_key):
+        """Mark a cache entry as fresh again (revalidated)"""
+        touched = self.manifest.touch_fetched(cache_key, save=False)
+        if touched:
+            self._save_manifest_later()
+        return touched
+
+    def _save_manifest_later(self):
+        """
+        Save manifest changes from the write-behind worker (callers may run on
+        the main loop). A burst of changes coalesces into one save.
+        """
+        _writer.submit("manifest:%s" % self.cache_dir, self.manifest,
+                       lambda manifest: manifest.flush())
+
+    def _mark_access(self, cache_key):
+        """Record a read for LRU eviction"""
+        self.manifest.touch_access(cache_key)
+
+    def _enforce_disk_limits(self, keep_key=None):
+        """Evict least recently used entries until the disk cache fits its limits"""
+        config = get_config()
+        max_bytes = config.get("disk_cache_max_kb", 10240) * 1024
+        max_entries = config.get("disk_cache_max_entries", 200)
+
+        with _disk_lock:
+            count, total = self.manifest.get_totals()
+            if total <= max_bytes and count <= max_entries:
+                return 0
 
-    def _get_cached(self, cache_key):
-        """Get data from cache"""
-        cache_path = self._get_cache_path(cache_key)
-        if exists(cache_path):
+            evicted = 0
+            for key in self.manifest.keys_by_access():
+                if total <= max_bytes and count <= max_entries:
+                    break
+                if key == keep_key:
+                    continue
+                # Never wait for the worker here: its job may be waiting for _disk_lock
+                if not _writer.cancel(key, wait=False):
+                    continue
+                entry = self.manifest.get(key)
+                cache_path = self._get_cache_path(key)
+                try:
+                    if exists(cache_path):
+                        remove(cache_path)
+                except OSError as e:
+                    log.debug("Cannot evict %s: %s" % (key, e), module="Cache")
+                    continue
+                self.manifest.remove(key, save=False)
+                _memory.remove(key)
+                size = entry.get('size', 0) if entry else 0
+                total -= size
+                count -= 1
+                evicted += 1
+                _disk_stats['evictions'] += 1
+                _disk_stats['evicted_kb'] += size / 1024.0
+
+            if evicted:
+                self.manifest.save()
+
+        if evicted:
+            log.info("Evicted %d cache entries (now %d files, %.1fKB)" % (
+                evicted, count, total / 1024.0), module="Cache")
+        return evicted
+
+    def _is_cache_valid(self, cache_key, ttl=None):
+        """Check if cache is still valid (age from the manifest, TTL from the policy)"""
+        if ttl is None:
+            ttl = get_ttl(None, cache_key)
+        self._ensure_hot(cache_key)
+        age = self.manifest.get_age(cache_key)
+        if age is None:
+            return False
+        if age < ttl:
+            return True
+        # Offline (circuit open): serve whatever is stored, the UI stays instant
+        entry = self.manifest.get(cache_key)
+        if entry and entry.get('url') and is_offline(entry['url']):
+            log.debug("Offline, using expired %s" % cache_key, module="Cache")
+            return True
+        # Expired repository file: still valid if its sha matches the remote tree
+        return self._sync_if_due(cache_key)
+
+    def _get_sync_path(self):
+        return join(self.cache_dir, "remote_sync.json")
+
+    def _load_sync_state(self):
+        """Load the last tree sync from the cache dir (once per session)"""
+        with _sync_lock:
+            if _sync_state['loaded']:
+                return
+            _sync_state['loaded'] = True
             try:
-                with gzip.open(cache_path, 'rb') as f:
-                    compressed_data = f.read()
+                sync_file = self._get_sync_path()
+                if exists(sync_file):
+                    with open(sync_file, 'r') as f:
+                        saved = load(f)
+                    for name in ('last', 'validators', 'shas'):
+                        _sync_state[name] = saved.get(name)
+                    _sync_state['last'] = _sync_state['last'] or 0
+            except Exception as e:
+                log.debug("Cannot load sync state: %s" % e, module="Cache")
+
+    def _save_sync_state(self):
+        try:
+            sync_file = self._get_sync_path()
+            tmp_file = sync_file + ".tmp"
+            with _sync_lock:
+                state = {
+                    'last': _sync_state['last'],
+                    'validators': _sync_state['validators'],
+                    'shas': _sync_state['shas']
+                }
+            with open(tmp_file, 'w') as f:
+                dump(state, f)
+            rename(tmp_file, sync_file)
+        except Exception as e:
+            log.error("Error saving sync state: %s" % e, module="Cache")
+
+    def _fetch_remote_shas(self):
+        """Download the repository tree (conditional). Returns {path: sha} or None"""
+        self._load_sync_state()
+        with _sync_lock:
+            validators = _sync_state['validators'] if _sync_state['shas'] else None
+            _sync_state['attempt'] = time.time()
+        try:
+            tree, new_validators = self._fetch_url_conditional(get_repo_tree_url(), validators)
+        except Exception as e:
+            log.error("Remote sync failed: %s" % e, module="Cache")
+            return None
+
+        if tree is NOT_MODIFIED:
+            with _sync_lock:
+                shas = _sync_state['shas']
+        else:
+            if not isinstance(tree, dict) or not isinstance(tree.get('tree'), list):
+                log.error("Unexpected repository tree format", module="Cache")
+                return None
+            if tree.get('truncated'):
+                # Files missing from a truncated tree simply keep their TTL
+                log.info("Repository tree truncated, partial sync", module="Cache")
+            shas = {}
+            for item in tree['tree']:
+                if not isinstance(item, dict) or item.get('type') != 'blob':
+                    continue
+                path = item.get('path', '')
+                if path.startswith(REMOTE_TREE_PREFIX) and item.get('sha'):
+                    shas[path] = item['sha']
+            new_validators.pop('sha', None)
+
+        with _sync_lock:
+            _sync_state['shas'] = shas
+            _sync_state['validators'] = new_validators
+            _sync_state['last'] = time.time()
+        self._save_sync_state()
+        return shas
+
+    def sync_with_remote(self):
+        """
+        Check every cached repository file against the remote tree with one request.
+        Unchanged files become fresh again; changed ones are expired and
+        downloaded again on next access. Returns (fresh, changed) or None on failure.
+        """
+        def sync():
+            shas = self._fetch_remote_shas()
+            if shas is None:
+                return None
+
+            fresh = []
+            changed = []
+            for key, (url, sha) in self.manifest.get_urls().items():
+                remote_sha = shas.get(get_repo_path(url))
+                if not sha or not remote_sha:
+                    continue
+                if sha == remote_sha:
+                    fresh.append(key)
+                else:
+                    changed.append(key)
+
+            if fresh:
+                self.manifest.touch_fetched_many(fresh, save=False)
+            if changed:
+                self.manifest.expire(changed, save=False)
+                for key in changed:
+                    _memory.remove(key)
+            if fresh or changed:
+                self._save_manifest_later()
+            log.info("Remote sync: %d unchanged, %d changed" % (len(fresh), len(changed)), module="Cache")
+            return len(fresh), len(changed)
+
+        return _flight.do("sync", sync)
+
+    def _sync_if_due(self, cache_key):
+        """
+        Decide freshness of an expired repository file from the remote tree.
+        Only the shas in memory are read here (callers may run on the main
+        loop); the tree is refreshed in the background at most once per
+        cache_ttl. True if the entry is unchanged.
+        """
+        config = get_config()
+        if not config.get("remote_sync", True):
+            return False
+        entry = self.manifest.get(cache_key)
+        if not entry or not entry.get('sha') or get_repo_path(entry.get('url')) is None:
+            return False
 
-                json_str = compressed_data.decode('utf-8')
+        interval = config.get("cache_ttl", 3600)
+        self._load_sync_state()
+        now = time.time()
+        with _sync_lock:
+            due = now - _sync_state['attempt'] >= interval and now - _sync_state['last'] >= interval
+            if due:
+                # Claimed here: one background sync per interval
+                _sync_state['attempt'] = now
+        if due:
+            # Until it ends the entry counts as expired (stale-while-revalidate applies)
+            run_in_background(self.sync_with_remote, name="TVGardenSync")
+
+        with _sync_lock:
+            shas = _sync_state['shas']
+            if time.time() - _sync_state['last'] >= interval:
+                shas = None
+        if not shas or shas.get(get_repo_path(entry['url'])) != entry['sha']:
+            return False
+        self._touch_cache(cache_key)
+        return True
 
-                # Parse JSON
-                return loads(json_str)
+    def _get_cached(self, cache_key):
+        """Get data from cache (parsed copy in RAM first, then disk)"""
+        cache_path = self._get_cache_path(cache_key)
+        data = _memory.get(cache_key)
+        if data is None:
+            # Queued for the write-behind worker, not on disk yet
+            data = _writer.get_pending(cache_key)
+        if data is not None:
+            self._mark_access(cache_key)
+            return data
+
+        if exists(cache_path) or self._ensure_hot(cache_key):
+            try:
+                # Entries without a codec were written as gzip JSON; small
+                # ones (raw_size) are parsed in one go, big ones streamed
+                entry = self.manifest.get(cache_key) or {}
+                with open(cache_path, 'rb') as f:
+                    data, raw_size = get_codec(entry.get('codec')).load(f, entry.get('raw_size'))
+                if entry and entry.get('raw_size') is None:
+                    self.manifest.set_raw_size(cache_key, raw_size)
+                _memory.put(cache_key, data, raw_size)
+                self._mark_access(cache_key)
+                return data
 
             except Exception as e:
                 log.error("Error reading %s: %s" % (cache_key, e), module="Cache")
+        self._forget_entry(cache_key)
         return None
 
-    def _set_cached(self, cache_key, data):
-        """Save data to cache"""
-        cache_path = self._get_cache_path(cache_key)
-        try:
+    def _forget_entry(self, cache_key):
+        """Drop a listed entry whose file is missing or unreadable (downloaded again on next use)"""
+        if cache_key not in self.manifest:
+            return
+        log.info("Cache file of %s missing or damaged, dropping entry" % cache_key, module="Cache")
+        _remove_quietly(self._get_cache_path(cache_key))
+        self.manifest.remove(cache_key, save=False)
+        self._save_manifest_later()
+
+    def _set_cached(self, cache_key, data, url=None, validators=None):
+        """
+        Save data to cache. The entry is usable at once (memory + manifest);
+        serialising, compressing and writing happen in the write-behind worker.
+        A gzip/deflate body just downloaded for data becomes the entry file as is.
+        """
+        self.manifest.record(cache_key, 0, url, validators, save=False)
+        _memory.put(cache_key, data, 0)
+
+        download = self._take_download(cache_key, data)
+        if download is not None:
+            path, codec_name, size, raw_size = download
+            # An older queued write must not replace the newer file
+            _writer.cancel(cache_key)
             try:
-                text_type = unicode  # Python 2
-            except NameError:
-                text_type = str      # Python 3
+                rename(path, self._get_cache_path(cache_key))
+            except OSError as e:
+                log.error("Cannot store download of %s: %s" % (cache_key, e), module="Cache")
+                _remove_quietly(path)
+            else:
+                log.debug("Stored %s body of %s as received" % (codec_name, cache_key), module="Cache")
+                _writer.submit(
+                    cache_key, data,
+                    lambda value: self._finish_entry(cache_key, value, size, codec_name,
+                                                     raw_size, url, validators)
+                )
+                return True
 
-            json_str = dumps(data, ensure_ascii=False)
+        _writer.submit(
+            cache_key, data,
+            lambda value: self._write_entry(cache_key, value, url, validators)
+        )
+        return True
 
-            if isinstance(json_str, text_type):
-                json_str = json_str.encode('utf-8')
+    def _take_download(self, cache_key, data):
+        """(path, codec, size, raw_size) of the body kept for data if it can be stored as is"""
+        with _download_lock:
+            download = _downloads.pop(cache_key, None)
+        if download is None:
+            return None
+        fetched, path, codec_name, size, raw_size = download
+        if fetched is data and codec_name == self._get_codec().name:
+            return path, codec_name, size, raw_size
+        _remove_quietly(path)
+        return None
 
-            with gzip.open(cache_path, 'wb') as f:
-                f.write(json_str)
+    def _get_codec(self):
+        """On-disk codec for new entries (cache_codec/cache_codec_level)"""
+        config = get_config()
+        return get_codec(config.get("cache_codec", "gzip"), config.get("cache_codec_level", 6))
 
-            return True
+    def _write_entry(self, cache_key, data, url=None, validators=None):
+        """Write an entry to disk (worker thread): temp file + rename, never half-written"""
+        cache_path = self._get_cache_path(cache_key)
+        tmp_path = cache_path + ".tmp"
+        codec = self._get_codec()
+        try:
+            with open(tmp_path, 'wb') as f:
+                raw_size = codec.dump(data, f)
+                size = f.tell()
+            rename(tmp_path, cache_path)
 
         except Exception as e:
             log.error("Error saving %s: %s" % (cache_key, e), module="Cache")
+            if exists(tmp_path):
+                remove(tmp_path)
+            self.manifest.remove(cache_key)
+            return False
+
+        return self._finish_entry(cache_key, data, size, codec.name, raw_size, url, validators)
+
+    def _finish_entry(self, cache_key, data, size, codec_name, raw_size, url=None, validators=None):
+        """Account a written entry file (worker thread)"""
+        if cache_key not in self.manifest:
+            # Evicted or cleared while queued
+            _remove_quietly(self._get_cache_path(cache_key))
             return False
 
+        self.manifest.set_size(cache_key, size, codec_name, save=False, raw_size=raw_size)
+        _memory.resize(cache_key, data, raw_size)
+        self._enforce_disk_limits(keep_key=cache_key)
+        self._persist(cache_key, url, validators)
+        # Queued behind the writes still pending: one save for the whole burst
+        self._save_manifest_later()
+        return True
+
+    def _decode_payload(self, data):
+        """Decode a downloaded body (bytes) into JSON data"""
+        # DEBUG: show first part of the data
+        if len(data) > 0:
+            log.debug("First 100 chars: %s" % data[:100], module="Cache")
+
+        # Try to decode as JSON
+        try:
+            json_data = loads(data.decode('utf-8'))
+            log.debug(
+                "Successfully decoded JSON, type: %s" % type(json_data),
+                module="Cache"
+            )
+            return json_data
+        except Exception as json_error:
+            log.debug("JSON decode failed: %s" % json_error, module="Cache")
+            # Content-Encoding is already undone: not JSON, return the text
+            return data.decode('utf-8', errors='ignore')
+
+    def _read_body(self, response, url, cache_key=None):
+        """
+        Read and decode a response body; returns (data, sha).
+        gzip/deflate bodies are inflated chunk by chunk and JSON arrays are
+        parsed element by element while the socket is read, so the body is
+        never held in memory as a whole. With cache_key, a compressed body is
+        also kept on disk to become the entry file (see _set_cached).
+        sha is the git blob sha of the file, None when it cannot be known.
+        """
+        encoding = get_content_encoding(response)
+        length = None
+        if not encoding:
+            try:
+                length = int(response.info().get('Content-Length'))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        digest = git_blob_hasher(length) if length is not None else None
+        body = DecodedReader(response.read, encoding)
+        reader = CountingReader(body.read, digest)
+
+        tee_path = None
+        if encoding and cache_key:
+            fd, tee_path = tempfile.mkstemp(suffix=DOWNLOAD_SUFFIX, dir=self.cache_dir)
+            body.tee = fdopen(fd, 'wb')
+        try:
+            try:
+                head = reader.peek(READ_CHUNK)
+            except TypeError:
+                # Python 2: read() may return the HTTP status code
+                raise Exception("Invalid response type")
+
+            if head.lstrip(b"\xef\xbb\xbf \t\r\n")[:1] == b"[":
+                data = load_stream(reader.read)
+                log.debug("Streamed %d bytes (%s %d), %d items" % (
+                    reader.size, encoding or "identity", body.compressed_size or reader.size, len(data)
+                ), module="Cache")
+            else:
+                data = self._decode_payload(reader.read())
+        except Exception:
+            if tee_path:
+                body.tee.close()
+                _remove_quietly(tee_path)
+            raise
+
+        sha = None
+        if digest is not None and reader.size == length:
+            sha = digest.hexdigest()
+        if tee_path:
+            body.tee.close()
+            if get_repo_path(url) is not None:
+                # Only repository files are compared with the tree
+                sha = self._file_blob_sha(tee_path, encoding, reader.size)
+            codec_name = DOWNLOAD_CODECS.get(encoding)
+            if body.raw_deflate or codec_name is None:
+                _remove_quietly(tee_path)
+            else:
+                _drop_download(cache_key)
+                with _download_lock:
+                    _downloads[cache_key] = (data, tee_path, codec_name, body.compressed_size, reader.size)
+        return data, sha
+
+    def _file_blob_sha(self, path, encoding, size):
+        """Git blob sha of the decoded content of a compressed file (size bytes decoded)"""
+        digest = git_blob_hasher(size)
+        try:
+            with open(path, 'rb') as f:
+                body = DecodedReader(f.read, encoding)
+                while True:
+                    data = body.read(READ_CHUNK)
+                    if not data:
+                        break
+                    digest.update(data)
+        except (IOError, OSError) as e:
+            log.debug("Cannot hash %s: %s" % (path, e), module="Cache")
+            return None
+        return digest.hexdigest()
+
+    def _get_response_validators(self, response):
+        """Extract ETag/Last-Modified from a response"""
+        validators = {}
+        try:
+            headers = response.info()
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            if etag:
+                validators['etag'] = etag
+            if last_modified:
+                validators['last_modified'] = last_modified
+        except Exception as e:
+            log.debug("Cannot read response validators: %s" % e, module="Cache")
+        return validators
+
     def _fetch_url(self, url):
         """Fetch URL"""
+        return self._fetch_url_conditional(url)[0]
+
+    def _fetch_url_conditional(self, url, validators=None, cache_key=None):
+        """
+        Fetch URL, sending If-None-Match/If-Modified-Since when validators are given.
+        Returns (data, validators); data is NOT_MODIFIED on HTTP 304.
+        cache_key: entry the data will be saved to (compressed body kept for it).
+        """
         try:
-            headers = {'User-Agent': 'TVGarden-Enigma2/1.0'}
-            req = Request(url, headers=headers)
+            headers = {'User-Agent': 'TVGarden-Enigma2/1.0', 'Accept-Encoding': ACCEPT_ENCODING}
+            if validators:
+                if validators.get('etag'):
+                    headers['If-None-Match'] = validators['etag']
+                if validators.get('last_modified'):
+                    headers['If-Modified-Since'] = validators['last_modified']
             config = get_config()
             timeout = config.get("connection_timeout", 15)
 
-            log.debug("Fetching URL: %s (timeout: %ss)" % (url, timeout), module="Cache")
+            log.debug("Fetching URL: %s (timeout: %ss, conditional: %s)" % (url, timeout, bool(validators)), module="Cache")
 
             response = None
             try:
-                response = urlopen(req, timeout=timeout)
+                try:
+                    response = open_url(url, headers=headers, timeout=timeout)
+                except HTTPError as http_error:
+                    if http_error.code == 304:
+                        log.debug("HTTP 304 Not Modified: %s" % url, module="Cache")
+                        return NOT_MODIFIED, validators
+                    raise
 
                 # === CRITICAL FIX FOR PYTHON 2 ===
                 # 1. First, check HTTP status code
@@ -225,6 +887,10 @@ class CacheManager:
                     http_code = response.getcode()
                     log.debug("HTTP Status Code: %d" % http_code, module="Cache")
 
+                    if http_code == 304:
+                        log.debug("HTTP 304 Not Modified: %s" % url, module="Cache")
+                        return NOT_MODIFIED, validators
+
                     if http_code != 200:
                         log.error("HTTP Error %d for URL: %s" % (http_code, url), module="Cache")
                         # Try to read error body if available
@@ -236,60 +902,12 @@ class CacheManager:
                             pass
                         raise Exception("HTTP Error %d" % http_code)
 
-                # 2. Read response data
-                raw_data = response.read()
-                log.debug(
-                    "Raw data type: %s, length: %d"
-                    % (type(raw_data), len(raw_data) if raw_data else 0),
-                    module="Cache"
-                )
-
-                # 3. IF raw_data is int → THIS IS AN HTTP ERROR IN PYTHON 2
-                if isinstance(raw_data, int):
-                    http_code = raw_data
-                    log.error(
-                        "PYTHON 2 BUG: response.read() returned int %d for URL: %s"
-                        % (http_code, url),
-                        module="Cache"
-                    )
-                    raise Exception("HTTP Error %d (Python 2 bug)" % http_code)
-
-                # 4. Convert to bytes if needed
-                if isinstance(raw_data, str):  # Python 2 string
-                    raw_data = raw_data.encode('utf-8')
-
-                if not isinstance(raw_data, bytes):
-                    log.error(
-                        "Invalid data type: %s for URL: %s"
-                        % (type(raw_data), url),
-                        module="Cache"
-                    )
-                    raise Exception("Invalid response type")
-                # === END FIX ===
-
-                # raw_data is now guaranteed to be bytes
-                data = raw_data
-
-                # DEBUG: show first part of the data
-                if len(data) > 0:
-                    log.debug("First 100 chars: %s" % data[:100], module="Cache")
-
-                # Try to decode as JSON
-                try:
-                    json_data = loads(data.decode('utf-8'))
-                    log.debug(
-                        "Successfully decoded JSON, type: %s" % type(json_data),
-                        module="Cache"
-                    )
-                    return json_data
-                except Exception as json_error:
-                    log.debug("JSON decode failed: %s" % json_error, module="Cache")
-                    # Try gzip decompression
-                    try:
-                        return loads(gzip.decompress(data).decode('utf-8'))
-                    except:
-                        # Fallback: return decoded text
-                        return data.decode('utf-8', errors='ignore')
+                # 2. Read and parse the body as it arrives
+                data, sha = self._read_body(response, url, cache_key)
+                new_validators = self._get_response_validators(response)
+                if sha:
+                    new_validators['sha'] = sha
+                return data, new_validators
 
             finally:
                 if response:
@@ -299,36 +917,139 @@ class CacheManager:
             log.error("Error fetching %s: %s" % (url, str(e)), module="Cache")
             raise
 
-    def fetch_url(self, url, force_refresh=False, ttl=3600):
-        """Fetch URL with caching support"""
+    def _is_swr_enabled(self):
+        """Check if stale-while-revalidate is enabled"""
+        return get_config().get("stale_while_revalidate", True)
+
+    def _refresh_in_background(self, cache_key, task, on_refresh=None):
+        """
+        Run task() in a background thread to replace a stale entry.
+        task returns (data, changed); on_refresh(data) is delivered on the
+        main loop only when data actually changed. Callers asking while a
+        refresh of the same entry is running just add their callback.
+        """
+        with _refresh_lock:
+            if cache_key in _refreshing:
+                log.debug("Refresh already running for %s" % cache_key, module="Cache")
+                if on_refresh is not None:
+                    _refreshing[cache_key].append(on_refresh)
+                return False
+            _refreshing[cache_key] = [on_refresh] if on_refresh is not None else []
+
+        def refresh():
+            try:
+                return task()
+            except Exception:
+                with _refresh_lock:
+                    _refreshing.pop(cache_key, None)
+                raise
+
+        def done(outcome):
+            with _refresh_lock:
+                callbacks = _refreshing.pop(cache_key, [])
+            data, changed = outcome
+            if not changed:
+                log.debug("Background refresh: %s not modified" % cache_key, module="Cache")
+                return
+            log.debug("Background refresh: %s updated" % cache_key, module="Cache")
+            for callback in callbacks:
+                callback(data)
+
+        run_in_background(refresh, callback=done, name="TVGardenRefresh-%s" % cache_key)
+        return True
+
+    def _revalidate(self, url, cache_key, force_refresh=False):
+        """
+        Download or revalidate url into its cache entry.
+        Single-flight per URL: concurrent callers share one download and parse.
+        Returns (data, changed).
+        """
+        def download():
+            validators = None
+            if not force_refresh:
+                validators = self._get_validators(cache_key)
+
+            log.debug("Fetching FRESH data for: %s" % url, module="Cache")
+            result = self._download_entry(url, cache_key, validators)
+
+            if result is NOT_MODIFIED:
+                cached = self._get_cached(cache_key)
+                if cached is not None:
+                    return cached, False
+                # Cached copy unreadable: fall back to a full download
+                result = self._download_entry(url, cache_key)
+            return result, True
+
+        return _flight.do("url:%s" % url, download)
+
+    def _download_entry(self, url, cache_key, validators=None):
+        """Download URL into its cache entry (NOT_MODIFIED on 304)"""
+        result, new_validators = self._fetch_url_conditional(url, validators, cache_key)
+
+        if result is NOT_MODIFIED:
+            log.debug("Not modified, refreshing cache entry: %s" % cache_key, module="Cache")
+            self._touch_cache(cache_key)
+            return NOT_MODIFIED
+
+        # Cache the result
+        log.debug("Saving to cache: %s" % cache_key, module="Cache")
+        self._set_cached(cache_key, result, url, new_validators)
+        return result
+
+    def fetch_url(self, url, force_refresh=False, ttl=None, on_refresh=None, kind=None):
+        """
+        Fetch URL with caching support.
+        ttl defaults to the policy of the resource kind (see utils/ttl.py).
+        With on_refresh, an expired entry is returned at once (stale-while-revalidate)
+        and on_refresh(data) fires on the main loop if the background refresh changed it.
+        """
         cache_key = self._get_cache_key(url)
-        cache_path = self._get_cache_path(cache_key)
+        if ttl is None:
+            ttl = get_ttl(kind, cache_key)
 
         log.debug("Fetch URL: %s" % url, module="Cache")
         log.debug("Cache key: %s" % cache_key, module="Cache")
         log.debug("Force refresh: %s" % force_refresh, module="Cache")
 
-        if not force_refresh and self._is_cache_valid(cache_path, ttl):
-            try:
+        if not force_refresh and self._is_cache_valid(cache_key, ttl):
+            cached = self._get_cached(cache_key)
+            if cached is not None:
                 log.debug("Using CACHED data for: %s" % url, module="Cache")
-                return self._get_cached(cache_key)
-            except:
-                log.debug("Cache read failed, fetching fresh", module="Cache")
-                pass
+                return cached
+            log.debug("Cache read failed, fetching fresh", module="Cache")
+
+        if (on_refresh is not None and not force_refresh and
+                self._ensure_hot(cache_key) and self._is_swr_enabled()):
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                log.debug("Using STALE data for: %s, refreshing in background" % url, module="Cache")
+                self._refresh_in_background(
+                    cache_key,
+                    lambda: self._revalidate(url, cache_key),
+                    on_refresh
+                )
+                return cached
 
         try:
-            log.debug("Fetching FRESH data for: %s" % url, module="Cache")
-            result = self._fetch_url(url)
-
-            # Cache the result
-            log.debug("Saving to cache: %s" % cache_key, module="Cache")
-            self._set_cached(cache_key, result)
-
-            return result
+            # Revalidate an expired entry instead of downloading it again
+            return self._revalidate(url, cache_key, force_refresh)[0]
         except Exception as e:
             log.error("Error in fetch_url: %s" % e, module="Cache")
+            cached = self._get_stale(cache_key)
+            if cached is not None:
+                return cached
             raise
 
+    def _get_stale(self, cache_key):
+        """Expired copy of an entry, served when the refresh failed (None if there is none)"""
+        try:
+            cached = self._get_cached(cache_key)
+        except Exception:
+            return None
+        if cached is not None:
+            log.info("Serving expired %s, refresh failed" % cache_key, module="Cache")
+        return cached
+
     def _get_default_categories(self):
         """Default categories if GitHub API fails"""
         return [
@@ -348,16 +1069,18 @@ class CacheManager:
         """Get list of available categories from GitHub directory"""
         categories_url = get_categories_url()
         try:
-            # Use cache if it already exists
+            # Use cache if it already exists and has not expired
             cache_key = "available_categories"
-            if cache_key in self.cache_data:
+            fetched = self.cache_data.get("%s_time" % cache_key, 0)
+            if cache_key in self.cache_data and (time.time() - fetched < get_ttl('categories', cache_key) or
+                                                 is_offline(categories_url)):
                 return self.cache_data[cache_key]
 
             # Download file list from GitHub directory
             response = None
             try:
-                response = urlopen(categories_url, timeout=10)
-                data = load(response)
+                response = open_url(categories_url, headers={'Accept-Encoding': ACCEPT_ENCODING}, timeout=10)
+                data = loads(read_body(response).decode('utf-8'))
             finally:
                 if response:
                     response.close()
@@ -370,163 +1093,321 @@ class CacheManager:
                     name = category_id.replace('-', ' ').title()
                     categories.append({'id': category_id, 'name': name})
 
-            # Save to cache
-            self.cache_data[cache_key] = categories
-            self._save_cache()
+            # Save to cache (one journal append)
+            self.cache_data.update({cache_key: categories, "%s_time" % cache_key: time.time()})
 
             log.info("Found %d categories from GitHub" % len(categories), module="Cache")
             return categories
 
         except Exception as e:
             log.error("Error getting categories: %s" % e, module="Cache")
+            if self.cache_data.get("available_categories"):
+                return self.cache_data["available_categories"]
             # Fallback to hardcoded list
             return self._get_default_categories()
 
-    def get_country_channels(self, country_code, force_refresh=False):
-        """Get channels for specific country - WORKING VERSION"""
+    def get_channel_index(self, force_refresh=False, on_update=None):
+        """
+        Channel index built from all-channels.json (None if disabled or unavailable).
+        on_update(index) fires on the main loop when a background refresh changed it.
+        """
+        if not get_config().get("use_channel_index", True):
+            return None
+
+        on_refresh = None
+        if on_update is not None:
+            def on_refresh(channels):
+                if channels:
+                    on_update(get_index(channels))
+
+        channels = self.get_category_channels("all-channels", force_refresh, on_update=on_refresh)
+        if not channels:
+            return None
+        return get_index(channels)
+
+    def _get_indexed(self, lookup, force_refresh=False, on_update=None):
+        """
+        Serve a lookup from the channel index.
+        Returns None when the index cannot answer (caller falls back to the per-file download).
+        """
+        on_index_update = None
+        if on_update is not None:
+            def on_index_update(index):
+                channels = lookup(index)
+                if channels is not None:
+                    on_update(channels)
+
+        try:
+            index = self.get_channel_index(force_refresh, on_index_update)
+        except Exception as e:
+            log.error("Channel index unavailable: %s" % e, module="Cache")
+            return None
+        if index is None:
+            return None
+        return lookup(index)
+
+    def get_country_channels(self, country_code, force_refresh=False, on_update=None, strict=False):
+        """
+        Get channels for specific country - WORKING VERSION
+        Served from the channel index when it knows the country, else from countries/<code>.json.
+        on_update(channels) is called on the main loop when stale data was
+        served and the background refresh brings new channels.
+        strict: raise download errors instead of returning [] (warm-up).
+        """
+        channels = self._get_indexed(lambda index: index.get_country(country_code),
+                                     force_refresh, on_update)
+        if channels:
+            log.debug("Country %s from index: %d channels" % (country_code, len(channels)), module="Cache")
+            return channels
+
         try:
             url = get_country_url(country_code)
             log.debug("Fetching country %s (force_refresh=%s)" % (country_code, force_refresh), module="Cache")
 
+            on_refresh = None
+            if on_update is not None:
+                def on_refresh(fresh_result):
+                    on_update(self._extract_country_channels(fresh_result, country_code))
+
             # 1. Fetch the raw JSON data
-            raw_result = self.fetch_url(url, force_refresh)
+            raw_result = self.fetch_url(url, force_refresh, on_refresh=on_refresh, kind='country')
+
+            return self._extract_country_channels(raw_result, country_code)
 
-            # DEBUG: Show what we received
-            log.debug("RAW RESULT TYPE: %s" % type(raw_result), module="Cache")
+        except Exception as e:
+            log.error("ERROR in get_country_channels for %s: %s" % (country_code, str(e)), module="Cache")
+            if strict:
+                raise
+            if not isinstance(e, KnownBadURL):
+                import traceback
+                traceback.print_exc()
+            return []
+
+    def _extract_country_channels(self, raw_result, country_code):
+        """Extract the channel list from a country file"""
+        # DEBUG: Show what we received
+        log.debug("RAW RESULT TYPE: %s" % type(raw_result), module="Cache")
+
+        if raw_result is None:
+            log.error("NULL result for %s" % country_code, module="Cache")
+            return []
 
-            if raw_result is None:
-                log.error("NULL result for %s" % country_code, module="Cache")
+        # 2. CASE 1: Already a list of channels (old structure)
+        if isinstance(raw_result, list):
+            log.info("✓ Direct list: %d channels for %s" % (len(raw_result), country_code), module="Cache")
+            return raw_result
+
+        # 3. CASE 2: Dictionary (new structure)
+        if isinstance(raw_result, dict):
+            # Log all keys for debugging
+            dict_keys = list(raw_result.keys())
+            log.debug("Dict keys: %s" % dict_keys[:10], module="Cache")
+
+            # STRATEGY 1: Look for country code in keys (case insensitive)
+            country_code_upper = country_code.upper()
+            country_code_lower = country_code.lower()
+
+            country_data = None
+            found_key = None
+
+            # Try exact match first
+            if country_code_upper in raw_result:
+                country_data = raw_result[country_code_upper]
+                found_key = country_code_upper
+            elif country_code_lower in raw_result:
+                country_data = raw_result[country_code_lower]
+                found_key = country_code_lower
+            else:
+                # Try case-insensitive search
+                for key in dict_keys:
+                    if isinstance(key, str) and key.upper() == country_code_upper:
+                        country_data = raw_result[key]
+                        found_key = key
+                        break
+
+            if not country_data:
+                log.error("Country '%s' not found in keys: %s" % (country_code, dict_keys), module="Cache")
                 return []
 
-            # 2. CASE 1: Already a list of channels (old structure)
-            if isinstance(raw_result, list):
-                log.info("✓ Direct list: %d channels for %s" % (len(raw_result), country_code), module="Cache")
-                return raw_result
-
-            # 3. CASE 2: Dictionary (new structure)
-            if isinstance(raw_result, dict):
-                # Log all keys for debugging
-                dict_keys = list(raw_result.keys())
-                log.debug("Dict keys: %s" % dict_keys[:10], module="Cache")
-
-                # STRATEGY 1: Look for country code in keys (case insensitive)
-                country_code_upper = country_code.upper()
-                country_code_lower = country_code.lower()
-
-                country_data = None
-                found_key = None
-
-                # Try exact match first
-                if country_code_upper in raw_result:
-                    country_data = raw_result[country_code_upper]
-                    found_key = country_code_upper
-                elif country_code_lower in raw_result:
-                    country_data = raw_result[country_code_lower]
-                    found_key = country_code_lower
-                else:
-                    # Try case-insensitive search
-                    for key in dict_keys:
-                        if isinstance(key, str) and key.upper() == country_code_upper:
-                            country_data = raw_result[key]
-                            found_key = key
-                            break
-
-                if not country_data:
-                    log.error("Country '%s' not found in keys: %s" % (country_code, dict_keys), module="Cache")
-                    return []
-
-                log.debug("Found country data under key: '%s'" % found_key, module="Cache")
-                log.debug("Country data type: %s" % type(country_data), module="Cache")
-
-                # 3A: Country data is already a list of channels
-                if isinstance(country_data, list):
-                    log.info("✓ Country data is list: %d channels for %s" % (len(country_data), country_code), module="Cache")
-                    return country_data
-
-                # 3B: Country data is a dict, extract channels from it
-                if isinstance(country_data, dict):
-                    # Look for channels in common field names
-                    channel_fields = ['channels', 'items', 'streams', 'data']
-
-                    for field in channel_fields:
-                        if field in country_data:
-                            field_data = country_data[field]
-                            if isinstance(field_data, list):
-                                log.info("✓ Found %d channels in field '%s' for %s" %
-                                         (len(field_data), field, country_code), module="Cache")
-                                return field_data
-
-                    # No channels found in expected fields
-                    log.error("No 'channels' field found for %s. Available keys: %s" %
-                              (country_code, list(country_data.keys())), module="Cache")
-                    return []
-
-                # 3C: Unexpected type
-                log.error("Unexpected country data type for %s: %s" % (country_code, type(country_data)), module="Cache")
+            log.debug("Found country data under key: '%s'" % found_key, module="Cache")
+            log.debug("Country data type: %s" % type(country_data), module="Cache")
+
+            # 3A: Country data is already a list of channels
+            if isinstance(country_data, list):
+                log.info("✓ Country data is list: %d channels for %s" % (len(country_data), country_code), module="Cache")
+                return country_data
+
+            # 3B: Country data is a dict, extract channels from it
+            if isinstance(country_data, dict):
+                # Look for channels in common field names
+                channel_fields = ['channels', 'items', 'streams', 'data']
+
+                for field in channel_fields:
+                    if field in country_data:
+                        field_data = country_data[field]
+                        if isinstance(field_data, list):
+                            log.info("✓ Found %d channels in field '%s' for %s" %
+                                     (len(field_data), field, country_code), module="Cache")
+                            return field_data
+
+                # No channels found in expected fields
+                log.error("No 'channels' field found for %s. Available keys: %s" %
+                          (country_code, list(country_data.keys())), module="Cache")
                 return []
 
-            # 4. CASE 3: Unexpected type
-            log.error("Unexpected raw result type for %s: %s" % (country_code, type(raw_result)), module="Cache")
+            # 3C: Unexpected type
+            log.error("Unexpected country data type for %s: %s" % (country_code, type(country_data)), module="Cache")
             return []
 
-        except Exception as e:
-            log.error("ERROR in get_country_channels for %s: %s" % (country_code, str(e)), module="Cache")
-            import traceback
-            traceback.print_exc()
-            return []
+        # 4. CASE 3: Unexpected type
+        log.error("Unexpected raw result type for %s: %s" % (country_code, type(raw_result)), module="Cache")
+        return []
+
+    def get_category_channels(self, category_id, force_refresh=False, on_update=None, strict=False):
+        """
+        Get channels for a specific category
+        Served from the channel index when it knows the category, else from categories/<id>.json.
+        on_update(channels) is called on the main loop when stale data was
+        served and the background refresh brings new channels.
+        strict: raise download errors instead of returning [] (warm-up).
+        """
+        if category_id != "all-channels":
+            channels = self._get_indexed(lambda index: index.get_category(category_id),
+                                         force_refresh, on_update)
+            if channels:
+                log.debug("Category %s from index: %d channels" % (category_id, len(channels)), module="Cache")
+                return channels
 
-    def get_category_channels(self, category_id, force_refresh=False):
-        """Get channels for a specific category"""
         cache_key = "cat_%s" % category_id
 
         if not force_refresh:
-            cached_data = self._get_cached(cache_key)
-            if cached_data is not None:
-                log.debug("Using CACHED data for category: %s" % category_id, module="Cache")
-                return cached_data
+            if self._is_cache_valid(cache_key, get_ttl('category', cache_key)):
+                cached_data = self._get_cached(cache_key)
+                if cached_data is not None:
+                    log.debug("Using CACHED data for category: %s" % category_id, module="Cache")
+                    return cached_data
+            elif on_update is not None and self._is_swr_enabled():
+                cached_data = self._get_cached(cache_key)
+                if cached_data is not None:
+                    log.debug("Category %s is stale, refreshing in background" % category_id, module="Cache")
+                    self._refresh_in_background(
+                        cache_key,
+                        lambda: self._revalidate_category(category_id),
+                        on_update
+                    )
+                    return cached_data
 
         try:
-            url = get_category_url(category_id)
-            log.debug("Fetching FRESH data for category: %s" % category_id, module="Cache")
-            data = self._fetch_url(url)
-
-            # Process data
-            channels = []
-            if isinstance(data, list):
-                channels = data
-            elif isinstance(data, dict):
-                for key in ['channels', 'items', 'streams', 'list']:
-                    if key in data and isinstance(data[key], list):
-                        channels = data[key]
-                        break
-
-            log.debug("Extracted %d channels for %s" % (len(channels), category_id), module="Cache")
-
-            if channels:
-                self._set_cached(cache_key, channels)
-            return channels
+            return self._revalidate_category(category_id, force_refresh)[0]
 
         except Exception as e:
             log.error("Failed to get category %s: %s" % (category_id, e), module="Cache")
-            import traceback
-            traceback.print_exc()
+            if not isinstance(e, KnownBadURL):
+                import traceback
+                traceback.print_exc()
+            cached_data = self._get_stale(cache_key)
+            if cached_data is not None:
+                return cached_data
+            if strict:
+                raise
         return []
 
-    def get_countries_metadata(self, force_refresh=False):
-        """Get countries metadata"""
+    def _revalidate_category(self, category_id, force_refresh=False):
+        """
+        Download or revalidate a category file (single-flight per category).
+        Returns (channels, changed).
+        """
+        cache_key = "cat_%s" % category_id
+
+        def download():
+            validators = None
+            if not force_refresh:
+                validators = self._get_validators(cache_key)
+            channels = self._download_category(category_id, validators)
+            if channels is NOT_MODIFIED:
+                cached = self._get_cached(cache_key)
+                if cached is not None:
+                    return cached, False
+                channels = self._download_category(category_id)
+            return channels, True
+
+        return _flight.do("category:%s" % category_id, download)
+
+    def _download_category(self, category_id, validators=None):
+        """Download, extract and cache a category file (NOT_MODIFIED on 304)"""
+        cache_key = "cat_%s" % category_id
+        url = get_category_url(category_id)
+        log.debug("Fetching FRESH data for category: %s" % category_id, module="Cache")
+        data, new_validators = self._fetch_url_conditional(url, validators, cache_key)
+
+        if data is NOT_MODIFIED:
+            self._touch_cache(cache_key)
+            return NOT_MODIFIED
+
+        # Process data
+        channels = []
+        if isinstance(data, list):
+            channels = data
+        elif isinstance(data, dict):
+            for key in ['channels', 'items', 'streams', 'list']:
+                if key in data and isinstance(data[key], list):
+                    channels = data[key]
+                    break
+
+        log.debug("Extracted %d channels for %s" % (len(channels), category_id), module="Cache")
+
+        changes = None
+        if channels and category_id == "all-channels":
+            changes = self._diff_snapshot(cache_key, channels)
+        if channels:
+            self._set_cached(cache_key, channels, url, new_validators)
+        else:
+            _drop_download(cache_key)
+        if changes is not None:
+            # Index and listeners follow the change set instead of rebuilding
+            apply_changes(changes)
+            publish_changes(changes)
+        return channels
+
+    def _diff_snapshot(self, cache_key, channels):
+        """Diff a fresh all-channels.json against the cached snapshot (None if there is none)"""
+        previous = self._get_cached(cache_key)
+        if not isinstance(previous, list) or not previous:
+            return None
+        start = time.time()
+        changes = diff_channels(previous, channels)
+        log.debug("Channel delta %r in %.0f ms" % (changes, (time.time() - start) * 1000.0), module="Cache")
+        return changes
+
+    def get_countries_metadata(self, force_refresh=False, on_update=None):
+        """Get countries metadata (on_update: see fetch_url on_refresh)"""
         url = get_metadata_url()
-        return self.fetch_url(url, force_refresh)
+        return self.fetch_url(url, force_refresh, on_refresh=on_update, kind='metadata')
+
+    def clear_all(self, persistent=True):
+        """Clear all cache (persistent=False keeps the persistent tier and the images)"""
+        _writer.cancel()
+
+        with _download_lock:
+            _downloads.clear()
 
-    def clear_all(self):
-        """Clear all cache"""
         # Clear disk cache
         for file in listdir(self.cache_dir):
-            if file.endswith('.json.gz'):
+            if file.endswith('.json.gz') or file.endswith('.meta.json') or file.endswith(DOWNLOAD_SUFFIX):
                 remove(join(self.cache_dir, file))
 
+        self.manifest.clear()
+
+        tier = get_persistent_tier() if persistent else None
+        if tier is not None:
+            tier.clear()
+
+        if persistent:
+            get_image_cache().clear()
+
         # Clear memory cache
-        self.cache_data = {}
-        self._save_cache()
+        _memory.clear()
+        self.cache_data.clear()
 
         log.info("Cache cleared (disk + memory)", module="Cache")
         return True
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Cache Codec Module
+On-disk formats for cache entries (gzip/zlib JSON, raw JSON, marshal, pickle)
+dump() streams JSON lists element by element; load() does so for big
+entries only (see json_stream.py)
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import gzip
+import zlib
+import marshal
+from io import BytesIO
+from json import loads, dumps
+
+from .json_stream import load_stream, CountingReader, CHUNK_SIZE
+
+try:
+    import cPickle as pickle  # Python 2
+except ImportError:
+    import pickle
+
+try:
+    text_type = unicode  # Python 2
+except NameError:
+    text_type = str      # Python 3
+
+
+DEFAULT_CODEC = "gzip"
+DEFAULT_LEVEL = 6   # level 9 costs ~4x the encode time for ~9% smaller files
+
+# Entries with less JSON than this are read whole and parsed with one loads():
+# about 2.3x faster than the streaming parser (5k channels, 1 MB: 18 vs 42 ms)
+# for ~20% more peak memory (4.8 vs 3.9 MB). all-channels.json stays streamed.
+STREAM_MIN_SIZE = 2 * 1024 * 1024
+
+
+def _json_bytes(data):
+    json_str = dumps(data, ensure_ascii=False)
+    if isinstance(json_str, text_type):
+        json_str = json_str.encode('utf-8')
+    return json_str
+
+
+def _write_json(data, write):
+    """
+    Write data as UTF-8 JSON through write(bytes); return the JSON size.
+    Lists are encoded one element at a time, never as one big string.
+    """
+    if not isinstance(data, list):
+        raw = _json_bytes(data)
+        write(raw)
+        return len(raw)
+
+    size = 0
+    chunks = [b"["]
+    pending = 1
+    for i, item in enumerate(data):
+        raw = _json_bytes(item)
+        if i:
+            chunks.append(b", ")
+            pending += 2
+        chunks.append(raw)
+        pending += len(raw)
+        if pending >= CHUNK_SIZE:
+            write(b"".join(chunks))
+            size += pending
+            chunks = []
+            pending = 0
+    chunks.append(b"]")
+    write(b"".join(chunks))
+    return size + pending + 1
+
+
+def _read_all(read):
+    chunks = []
+    while True:
+        chunk = read(CHUNK_SIZE)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _load_json(read, raw_size=None):
+    """
+    (data, JSON size) from read(n): one loads() when raw_size (the JSON size
+    recorded in the manifest) is known and small, else streamed.
+    """
+    if raw_size is not None and raw_size < STREAM_MIN_SIZE:
+        raw = _read_all(read)
+        return loads(raw.decode('utf-8')), len(raw)
+    reader = CountingReader(read)
+    return load_stream(reader.read), reader.size
+
+
+class _ZlibReader:
+    """read(n) over a zlib stream"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._inflate = zlib.decompressobj()
+        self._done = False
+
+    def read(self, n):
+        while not self._done:
+            data = self._fileobj.read(CHUNK_SIZE)
+            if not data:
+                self._done = True
+                return self._inflate.flush()
+            data = self._inflate.decompress(data)
+            if data:
+                return data
+        return b""
+
+
+class JsonCodec:
+    """Plain UTF-8 JSON: no compression cost, biggest files"""
+    name = "json"
+
+    def __init__(self, level=None):
+        self.level = level
+
+    def encode(self, data):
+        """Return (payload bytes, JSON size)"""
+        raw = _json_bytes(data)
+        return raw, len(raw)
+
+    def decode(self, payload):
+        """Return (data, JSON size)"""
+        return loads(payload.decode('utf-8')), len(payload)
+
+    def dump(self, data, fileobj):
+        """Write data to an open file; return the JSON size"""
+        return _write_json(data, fileobj.write)
+
+    def load(self, fileobj, raw_size=None):
+        """Read (data, JSON size) from an open file (raw_size: JSON size if known)"""
+        return _load_json(fileobj.read, raw_size)
+
+
+class GzipCodec(JsonCodec):
+    """gzip-compressed JSON (level 1-9)"""
+    name = "gzip"
+
+    def encode(self, data):
+        raw = _json_bytes(data)
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=self.level or DEFAULT_LEVEL) as f:
+            f.write(raw)
+        return buf.getvalue(), len(raw)
+
+    def decode(self, payload):
+        with gzip.GzipFile(fileobj=BytesIO(payload), mode='rb') as f:
+            raw = f.read()
+        return loads(raw.decode('utf-8')), len(raw)
+
+    def dump(self, data, fileobj):
+        with gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=self.level or DEFAULT_LEVEL) as f:
+            return _write_json(data, f.write)
+
+    def load(self, fileobj, raw_size=None):
+        with gzip.GzipFile(fileobj=fileobj, mode='rb') as f:
+            return _load_json(f.read, raw_size)
+
+
+class ZlibCodec(JsonCodec):
+    """zlib-compressed JSON (level 1-9), no gzip header/CRC overhead"""
+    name = "zlib"
+
+    def encode(self, data):
+        raw = _json_bytes(data)
+        return zlib.compress(raw, self.level or DEFAULT_LEVEL), len(raw)
+
+    def decode(self, payload):
+        raw = zlib.decompress(payload)
+        return loads(raw.decode('utf-8')), len(raw)
+
+    def dump(self, data, fileobj):
+        deflate = zlib.compressobj(self.level or DEFAULT_LEVEL)
+
+        def write(raw):
+            fileobj.write(deflate.compress(raw))
+        size = _write_json(data, write)
+        fileobj.write(deflate.flush())
+        return size
+
+    def load(self, fileobj, raw_size=None):
+        return _load_json(_ZlibReader(fileobj).read, raw_size)
+
+
+class MarshalCodec(JsonCodec):
+    """
+    marshal of the parsed objects: fastest load, no JSON parsing.
+    Tied to the Python version; unreadable entries are simply downloaded again.
+    """
+    name = "marshal"
+
+    def encode(self, data):
+        payload = marshal.dumps(data)
+        return payload, len(payload)
+
+    def decode(self, payload):
+        return marshal.loads(payload), len(payload)
+
+    def dump(self, data, fileobj):
+        payload, raw_size = self.encode(data)
+        fileobj.write(payload)
+        return raw_size
+
+    def load(self, fileobj, raw_size=None):
+        return self.decode(fileobj.read())
+
+
+class PickleCodec(JsonCodec):
+    """Pickle of the parsed objects. Only for cache dirs nobody else can write"""
+    name = "pickle"
+
+    def encode(self, data):
+        payload = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        return payload, len(payload)
+
+    def decode(self, payload):
+        return pickle.loads(payload), len(payload)
+
+    def dump(self, data, fileobj):
+        payload, raw_size = self.encode(data)
+        fileobj.write(payload)
+        return raw_size
+
+    def load(self, fileobj, raw_size=None):
+        return self.decode(fileobj.read())
+
+
+CODECS = {
+    "json": JsonCodec,
+    "gzip": GzipCodec,
+    "zlib": ZlibCodec,
+    "marshal": MarshalCodec,
+    "pickle": PickleCodec,
+}
+
+
+def get_codec(name=None, level=None):
+    """Get a codec by name (unknown names fall back to gzip)"""
+    codec_class = CODECS.get(name or DEFAULT_CODEC, GzipCodec)
+    return codec_class(level)
@@ -54,10 +54,33 @@ class PluginConfig:
             # ============ CACHE SETTINGS ============
             "cache_enabled": True,                  # Enable caching
             "cache_ttl": 3600,                      # Cache time-to-live in seconds (1 hour)
+            "cache_ttl_jitter": 10,                 # Up to this % taken off each entry's TTL (spread expirations)
+            "ttl_metadata": 86400,                  # countries_metadata.json (0 = cache_ttl)
+            "ttl_country": 0,                       # Country lists (0 = cache_ttl)
+            "ttl_category": 0,                      # Category lists and all-channels.json (0 = cache_ttl)
+            "ttl_categories": 86400,                # Category listing from the GitHub API
+            "ttl_logo": 604800,                     # Channel logos (7 days)
+            "ttl_flag": 2592000,                    # Country flags (30 days)
             "cache_size": 500,                      # Maximum cache items - INCREASED
+            "memory_cache_max_kb": 8192,            # Budget for parsed lists kept in RAM (JSON size)
+            "disk_cache_max_kb": 10240,             # Max size of /tmp/tvgarden_cache (compressed, tmpfs)
+            "disk_cache_max_entries": 200,          # Max files in /tmp/tvgarden_cache
+            "image_cache_max_kb": 4096,             # Max size of cached logos/flags
+            "image_cache_max_entries": 1000,        # Max cached logo/flag URLs
+            "logo_prefetch_rows": 10,               # Logos prefetched above and below the selection (0 = off)
+            "logo_prefetch_workers": 2,             # Concurrent prefetch downloads
+            "persistent_cache_dir": "",             # Warm tier kept across reboots, e.g. /media/hdd/tvgarden_cache ("" = off)
+            "persistent_write_interval": 21600,     # Min seconds between rewrites of one entry (flash wear)
+            "cache_codec": "gzip",                  # "gzip", "zlib", "json", "marshal", "pickle" (see benchmarks)
+            "cache_codec_level": 6,                 # Compression level 1-9 for gzip/zlib
             "auto_refresh": False,                  # Automatic cache refresh - CHANGED TO FALSE
             "force_refresh_export": False,          # Force refresh when exporting (False = use cache)
             "force_refresh_browsing": False,        # Force refresh when browsing
+            "stale_while_revalidate": True,         # Show expired cache at once, refresh in background
+            "use_channel_index": True,              # Serve countries/categories from all-channels.json
+            "remote_sync": True,                    # Check expired lists against the repository tree (one request)
+            "warmup_on_start": False,               # Prefetch all lists in background at session start
+            "warmup_workers": 4,                    # Parallel downloads for the warm-up job
 
             # ============ EXPORT SETTINGS ============
             "list_position": "bottom",              # "top" or "bottom" - bouquet position in Enigma2
@@ -242,6 +265,50 @@ class PluginConfig:
             except (ValueError, TypeError):
                 validated_config['cache_size'] = 500
 
+        # Ensure memory_cache_max_kb is reasonable
+        if 'memory_cache_max_kb' in validated_config:
+            try:
+                val = int(validated_config['memory_cache_max_kb'])
+                if val < 512:
+                    val = 512
+                elif val > 65536:
+                    val = 65536
+                validated_config['memory_cache_max_kb'] = val
+            except (ValueError, TypeError):
+                validated_config['memory_cache_max_kb'] = 8192
+
+        # Ensure disk cache limits are reasonable
+        disk_limits = (
+            ('disk_cache_max_kb', 1024, 262144, 10240),
+            ('disk_cache_max_entries', 10, 5000, 200),
+            ('image_cache_max_kb', 256, 262144, 4096),
+            ('image_cache_max_entries', 50, 20000, 1000),
+            ('logo_prefetch_rows', 0, 50, 10),
+            ('logo_prefetch_workers', 1, 4, 2),
+            ('persistent_write_interval', 0, 604800, 21600),
+            ('cache_codec_level', 1, 9, 6),
+            ('warmup_workers', 1, 8, 4),
+            ('cache_ttl', 60, 604800, 3600),
+            ('cache_ttl_jitter', 0, 50, 10),
+            ('ttl_metadata', 0, 2592000, 86400),
+            ('ttl_country', 0, 2592000, 0),
+            ('ttl_category', 0, 2592000, 0),
+            ('ttl_categories', 0, 2592000, 86400),
+            ('ttl_logo', 0, 7776000, 604800),
+            ('ttl_flag', 0, 7776000, 2592000),
+        )
+        for key, low, high, default in disk_limits:
+            if key in validated_config:
+                try:
+                    val = int(validated_config[key])
+                    if val < low:
+                        val = low
+                    elif val > high:
+                        val = high
+                    validated_config[key] = val
+                except (ValueError, TypeError):
+                    validated_config[key] = default
+
         # Ensure search_max_results is reasonable
         if 'search_max_results' in validated_config:
             try:
@@ -254,6 +321,11 @@ class PluginConfig:
             except (ValueError, TypeError):
                 validated_config['search_max_results'] = 200
 
+        # Ensure cache_codec is valid
+        if 'cache_codec' in validated_config:
+            if validated_config['cache_codec'] not in ['gzip', 'zlib', 'json', 'marshal', 'pickle']:
+                validated_config['cache_codec'] = 'gzip'
+
         # Ensure list_position is valid
         if 'list_position' in validated_config:
             if validated_config['list_position'] not in ['top', 'bottom']:
@@ -268,6 +340,7 @@ class PluginConfig:
         boolean_keys = [
             'show_flags', 'show_logos', 'cache_enabled',
             'force_refresh_export', 'force_refresh_browsing',
+            'stale_while_revalidate', 'use_channel_index', 'remote_sync', 'warmup_on_start',
             'export_enabled', 'log_to_file',
             'use_hardware_acceleration', 'memory_optimization',
             'debug_mode',
@@ -283,7 +356,7 @@ class PluginConfig:
             'player', 'log_level', 'default_view',
             'bouquet_name_prefix', 'user_agent', 'update_channel',
             'refresh_method', 'last_country', 'last_category', 'last_channel',
-            'last_search', 'list_position'
+            'last_search', 'list_position', 'persistent_cache_dir', 'cache_codec'
         ]
 
         for key in string_keys:
@@ -299,6 +372,12 @@ class PluginConfig:
             'max_channels_for_sub_bouquet', 'connection_timeout',
             'buffer_size', 'search_max_results', 'watch_time',
             'exports_count', 'cache_size', 'config_version',
+            'memory_cache_max_kb', 'disk_cache_max_kb', 'disk_cache_max_entries',
+            'persistent_write_interval', 'cache_codec_level', 'warmup_workers',
+            'cache_ttl', 'cache_ttl_jitter', 'ttl_metadata', 'ttl_country',
+            'ttl_category', 'ttl_categories', 'ttl_logo', 'ttl_flag',
+            'image_cache_max_kb', 'image_cache_max_entries',
+            'logo_prefetch_rows', 'logo_prefetch_workers',
         ]
 
         for key in numeric_keys:
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Channel Delta Module
+Record-level diff of all-channels.json snapshots and the change feed
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import threading
+
+from ..helpers import log
+from .tasks import call_in_main_thread
+
+try:
+    string_types = basestring  # Python 2
+except NameError:
+    string_types = str         # Python 3
+
+
+def primary_url(channel):
+    """Stream URL used for playback and bouquets (first IPTV URL)"""
+    urls = channel.get('iptv_urls')
+    if isinstance(urls, list):
+        for url in urls:
+            if isinstance(url, string_types) and url.strip():
+                return url.strip()
+    return channel.get('url') or None
+
+
+class ChangeSet:
+    """
+    Difference between two channel lists, keyed by nanoid.
+    added/removed: records; url_changed/updated: (old, new) record pairs
+    (updated = any other field changed). full is True when the lists
+    cannot be diffed (records without nanoid): consumers rebuild.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.added = []
+        self.removed = []
+        self.url_changed = []
+        self.updated = []
+        self.full = False
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.url_changed) + len(self.updated)
+
+    def is_empty(self):
+        return not self.full and len(self) == 0
+
+    def get_url_map(self):
+        """Old stream URL -> new stream URL for the URL-changed records"""
+        urls = {}
+        for old, new in self.url_changed:
+            old_url = primary_url(old)
+            new_url = primary_url(new)
+            if old_url and new_url and old_url != new_url:
+                urls[old_url] = new_url
+        return urls
+
+    def get_stats(self):
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'url_changed': len(self.url_changed),
+            'updated': len(self.updated),
+            'full': self.full
+        }
+
+    def __repr__(self):
+        return "<ChangeSet +%d -%d ~url %d ~%d%s>" % (
+            len(self.added), len(self.removed), len(self.url_changed),
+            len(self.updated), " full" if self.full else "")
+
+
+def _by_nanoid(channels):
+    """nanoid -> record, or None if a record has no nanoid"""
+    records = {}
+    for channel in channels:
+        if not isinstance(channel, dict):
+            continue
+        nanoid = channel.get('nanoid')
+        if not nanoid:
+            return None
+        records[nanoid] = channel
+    return records
+
+
+def diff_channels(old, new):
+    """
+    Diff two channel lists by nanoid.
+    Unchanged records of new are replaced by the old objects, so the new
+    snapshot shares them with everything built on the old one.
+    """
+    changes = ChangeSet(old, new)
+    old_records = _by_nanoid(old or [])
+    new_records = _by_nanoid(new or [])
+    if old_records is None or new_records is None:
+        changes.full = True
+        return changes
+
+    for position, channel in enumerate(new):
+        if not isinstance(channel, dict):
+            continue
+        previous = old_records.get(channel['nanoid'])
+        if previous is None:
+            changes.added.append(channel)
+        elif previous == channel:
+            new[position] = previous
+        else:
+            if previous.get('iptv_urls') != channel.get('iptv_urls') or \
+                    primary_url(previous) != primary_url(channel):
+                changes.url_changed.append((previous, channel))
+            else:
+                changes.updated.append((previous, channel))
+
+    for nanoid, channel in old_records.items():
+        if nanoid not in new_records:
+            changes.removed.append(channel)
+    return changes
+
+
+# Change feed: listeners get every non-empty ChangeSet on the main loop
+_listeners_lock = threading.Lock()
+_listeners = []
+
+
+def add_change_listener(callback):
+    """Register callback(changes) for channel database changes"""
+    with _listeners_lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def remove_change_listener(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def _deliver(changes, listeners):
+    for callback in listeners:
+        try:
+            callback(changes)
+        except Exception as e:
+            log.error("Change listener failed: %s" % e, module="Delta")
+
+
+def publish_changes(changes):
+    """Send a ChangeSet to all listeners (main loop)"""
+    if changes.is_empty():
+        return
+    with _listeners_lock:
+        listeners = list(_listeners)
+    log.info("Channel changes: %r" % changes, module="Delta")
+    if listeners:
+        call_in_main_thread(_deliver, changes, listeners)
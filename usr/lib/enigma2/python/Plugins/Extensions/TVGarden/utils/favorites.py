@@ -7,7 +7,7 @@ Based on TV Garden Project
 """
 from __future__ import print_function
 import time
-from os import makedirs, remove, system
+from os import makedirs, remove, rename, system
 from os.path import exists, join
 from json import load, dump
 from hashlib import md5
@@ -16,6 +16,7 @@ from shutil import copy2
 from ..helpers import log, get_all_channels_url
 from ..utils.config import get_config
 from ..utils.cache import CacheManager
+from ..utils.delta import primary_url
 from .. import _
 
 
@@ -401,7 +402,7 @@ class FavoritesManager:
                 force_refresh_export = config.get("force_refresh_export", False)
 
                 if cache_enabled:
-                    all_channels_data = cache.fetch_url(all_channels_url, force_refresh=force_refresh_export)
+                    all_channels_data = cache.fetch_url(all_channels_url, force_refresh=force_refresh_export, kind='category')
                 else:
                     # Cache disabled, always fresh
                     all_channels_data = cache._fetch_url(all_channels_url)
@@ -819,7 +820,7 @@ class FavoritesManager:
                 force_refresh = config.get("force_refresh_export", False)
 
                 if cache_enabled:
-                    all_channels_data = cache.fetch_url(all_channels_url, force_refresh=force_refresh)
+                    all_channels_data = cache.fetch_url(all_channels_url, force_refresh=force_refresh, kind='category')
                 else:
                     all_channels_data = cache._fetch_url(all_channels_url)
 
@@ -1097,6 +1098,85 @@ class FavoritesManager:
             'countries': len(exported_countries)
         }
 
+    def apply_channel_changes(self, changes):
+        """
+        Follow a channel ChangeSet: new stream URLs and names of favorites.
+        Matched by nanoid, or by the old stream URL for favorites without one.
+        """
+        if changes.full:
+            return 0
+
+        by_nanoid = {}
+        for old, new in changes.url_changed + changes.updated:
+            by_nanoid[new.get('nanoid')] = new
+        url_map = changes.get_url_map()
+
+        updated = 0
+        for fav in self.favorites:
+            new = by_nanoid.get(fav.get('nanoid')) if fav.get('nanoid') else None
+            old_url = fav.get('stream_url') or fav.get('url')
+            new_url = primary_url(new) if new is not None else url_map.get(old_url)
+            changed = False
+            if new_url and new_url != old_url:
+                fav['url'] = new_url
+                fav['stream_url'] = new_url
+                fav['id'] = self.generate_id(fav)
+                changed = True
+            if new is not None and new.get('name') and new['name'] != fav.get('name'):
+                fav['name'] = new['name']
+                changed = True
+            if changed:
+                updated += 1
+
+        if updated:
+            self.save_favorites()
+            log.info("Updated %d favorites from channel changes" % updated, module="Favorites")
+        return updated
+
+    def update_exported_bouquets(self, url_map):
+        """
+        Replace changed stream URLs in exported bouquet files.
+        Only files containing one of the old URLs are rewritten.
+        """
+        if not url_map:
+            return 0
+        import glob
+        tag = "tvgarden"
+        encoded = dict((old.replace(":", "%3a"), new.replace(":", "%3a"))
+                       for old, new in url_map.items())
+
+        rewritten = 0
+        for pattern in ("/etc/enigma2/userbouquet.%s_*.tv" % tag,
+                        "/etc/enigma2/subbouquet.%s_*.tv" % tag):
+            for file_path in glob.glob(pattern):
+                try:
+                    with open(file_path, "r") as f:
+                        lines = f.readlines()
+                    changed = False
+                    for i, line in enumerate(lines):
+                        if not line.startswith("#SERVICE 4097:"):
+                            continue
+                        # #SERVICE 4097:0:1:0:0:0:0:0:0:0:<url>:<name>
+                        parts = line.split(":", 11)
+                        if len(parts) == 12 and parts[10] in encoded:
+                            parts[10] = encoded[parts[10]]
+                            lines[i] = ":".join(parts)
+                            changed = True
+                    if not changed:
+                        continue
+                    tmp_path = file_path + ".tmp"
+                    with open(tmp_path, "w") as f:
+                        f.writelines(lines)
+                    rename(tmp_path, file_path)
+                    rewritten += 1
+                except (IOError, OSError) as e:
+                    log.error("Cannot update %s: %s" % (file_path, e), module="Favorites")
+
+        if rewritten:
+            log.info("Updated stream URLs in %d bouquet files" % rewritten, module="Favorites")
+            self._reload_bouquets()
+        return rewritten
+
     def clear_all(self):
         """Clear all favorites"""
         count = len(self.favorites)
@@ -1107,3 +1187,12 @@ class FavoritesManager:
         else:
             log.error("✗ Failed to clear favorites", module="Favorites")
             return False, _("Error clearing favorites")
+
+
+def on_channel_changes(changes):
+    """Change feed listener: keep favorites and exported bouquets in step with the channel list"""
+    if changes.full or not (changes.url_changed or changes.updated):
+        return
+    manager = FavoritesManager()
+    manager.apply_channel_changes(changes)
+    manager.update_exported_bouquets(changes.get_url_map())
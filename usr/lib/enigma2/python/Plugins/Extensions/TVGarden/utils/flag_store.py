@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Flag Store Module
+Country flags installed once per skin resolution and read from disk
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import re
+import time
+import threading
+from os.path import basename, dirname, join, exists, isdir
+from os import makedirs, remove, rename
+from shutil import rmtree
+from zipfile import ZipFile
+
+from ..helpers import log
+from .config import get_config
+from .http_client import open_url, READ_CHUNK
+from .image_cache import HOT_CACHE_DIR
+from .persistent_cache import get_persistent_tier
+from .tasks import call_in_main_thread
+
+
+FLAG_DIR = "flags"
+FLAG_PACK_URL = "https://flagcdn.com/%s.zip"
+
+# flagcdn archive at (or just above) the flag widget height of each skin;
+# the widget scales the PNG down to its exact size
+FLAG_PACKS = {
+    'sd': 'h120',
+    'hd': 'h120',       # 190x120
+    'fhd': 'h240',      # 240x150
+    'wqhd': 'h240',     # 320x200
+}
+
+# After a failed install, flags are fetched one by one for this long
+FLAG_PACK_RETRY = 3600
+
+_FLAG_NAME = re.compile(r"^[a-z0-9-]+\.png$")
+
+
+class FlagStore:
+    """
+    Flag PNGs of one size, unpacked from a single archive the first time
+    they are needed (flags/<pack>/<code>.png on tmpfs). path() is a local
+    lookup. With a persistent tier the pack is copied there once and
+    restored from it after a reboot instead of downloaded again.
+    """
+
+    def __init__(self, base_dir, pack):
+        self.pack = pack
+        self.name = join(FLAG_DIR, pack)
+        self.folder = join(base_dir, pack)
+        self.url = FLAG_PACK_URL % pack
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._failed_at = 0
+
+    def is_installed(self):
+        return isdir(self.folder)
+
+    def is_available(self):
+        """False while a failed install is backing off"""
+        return self.is_installed() or time.time() - self._failed_at >= FLAG_PACK_RETRY
+
+    def path(self, code):
+        """Path of the flag of a country code, None if the pack has none"""
+        path = join(self.folder, "%s.png" % code.lower())
+        return path if exists(path) else None
+
+    def install_async(self, callback):
+        """
+        Install the pack in the background; callback(ok) runs on the main loop,
+        once per install even if it is registered again while it runs.
+        """
+        with self._lock:
+            if callback in self._waiting:
+                return
+            self._waiting.append(callback)
+            if len(self._waiting) > 1:
+                return
+        thread = threading.Thread(target=self._install_and_notify, name="TVGardenFlags")
+        thread.daemon = True
+        thread.start()
+
+    def _install_and_notify(self):
+        ok = self.install()
+        with self._lock:
+            waiting, self._waiting = self._waiting, []
+        for callback in waiting:
+            call_in_main_thread(callback, ok)
+
+    def install(self):
+        """Restore the pack from the persistent tier, or download and unpack it; True on success"""
+        if self.is_installed():
+            return True
+        tmp_zip = self.folder + ".zip.tmp"
+        tmp_dir = self.folder + ".tmp"
+        tier = get_persistent_tier()
+        try:
+            if not isdir(dirname(self.folder)):
+                makedirs(dirname(self.folder))
+            rmtree(tmp_dir, ignore_errors=True)
+            if tier is not None and tier.restore_dir(self.name, tmp_dir):
+                rename(tmp_dir, self.folder)
+                log.info("Restored flags %s from %s" % (self.pack, tier.base_dir), module="Flags")
+                return True
+            log.info("Downloading flags %s" % self.url, module="Flags")
+            response = open_url(self.url, timeout=30)
+            try:
+                with open(tmp_zip, 'wb') as f:
+                    while True:
+                        chunk = response.read(READ_CHUNK)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+            finally:
+                response.close()
+            count = self._unpack(tmp_zip, tmp_dir)
+            rename(tmp_dir, self.folder)
+            log.info("Installed %d flags in %s" % (count, self.folder), module="Flags")
+            if tier is not None:
+                tier.store_dir(self.name, self.folder)
+            return True
+        except Exception as e:
+            log.error("Cannot install flags %s: %s" % (self.pack, e), module="Flags")
+            self._failed_at = time.time()
+            rmtree(tmp_dir, ignore_errors=True)
+            return False
+        finally:
+            if exists(tmp_zip):
+                remove(tmp_zip)
+
+    def _unpack(self, zip_path, folder):
+        """Extract <code>.png members (flat, names checked); returns the count"""
+        rmtree(folder, ignore_errors=True)
+        makedirs(folder)
+        count = 0
+        with ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                name = basename(info.filename).lower()
+                if not _FLAG_NAME.match(name):
+                    continue
+                with open(join(folder, name), 'wb') as f:
+                    f.write(archive.read(info))
+                count += 1
+        if not count:
+            raise ValueError("No flags in archive")
+        return count
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_flag_store():
+    """Get the flag store of the current skin resolution"""
+    pack = FLAG_PACKS.get(get_config().get_skin_resolution(), 'h120')
+    with _stores_lock:
+        store = _stores.get(pack)
+        if store is None:
+            store = FlagStore(join(HOT_CACHE_DIR, FLAG_DIR), pack)
+            _stores[pack] = store
+        return store
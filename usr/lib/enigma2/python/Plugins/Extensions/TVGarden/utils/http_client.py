@@ -0,0 +1,547 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - HTTP Client Module
+Keep-alive connection pool shared by all network call sites
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import time
+import zlib
+import socket
+import threading
+from collections import OrderedDict
+from sys import version_info
+
+if version_info[0] == 3:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib.parse import urlsplit, urljoin
+    from urllib.error import HTTPError
+else:
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+    from urlparse import urlsplit, urljoin
+    from urllib2 import HTTPError
+
+try:
+    from ..helpers import log
+except (ImportError, ValueError):
+    # Loaded outside the plugin (benchmarks)
+    class log(object):
+        @staticmethod
+        def debug(message, module=""):
+            pass
+
+        @staticmethod
+        def info(message, module=""):
+            pass
+
+        @staticmethod
+        def error(message, module=""):
+            print("[ERROR] [%s] %s" % (module, message))
+
+
+DEFAULT_USER_AGENT = "TVGarden-Enigma2/1.0"
+MAX_REDIRECTS = 5
+
+# Content-Encoding accepted by callers that decode bodies with DecodedReader
+ACCEPT_ENCODING = "gzip, deflate"
+READ_CHUNK = 65536
+
+# Failing URLs: retry after 30s, 60s, 120s ... up to 1 hour
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+GIVE_UP_AFTER = 8       # failures after which only the hourly retry is left
+MAX_FAILED_URLS = 500
+
+
+# Hosts: open the circuit after 3 network failures in a row, probe again
+# after 60s, 120s ... up to 10 minutes
+CIRCUIT_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 60
+CIRCUIT_COOLDOWN_MAX = 600
+
+
+class KnownBadURL(IOError):
+    """Raised instead of a request while a URL is in its backoff window"""
+
+
+class CircuitOpen(KnownBadURL):
+    """Raised instead of a request while the circuit of a host is open (offline)"""
+
+
+def get_host(url):
+    """Host name of a URL (lower case) or None"""
+    try:
+        host = urlsplit(url).hostname
+    except (ValueError, AttributeError):
+        return None
+    return host.lower() if host else None
+
+
+class PooledResponse(object):
+    """
+    Minimal urlopen-like response (getcode/info/read/close).
+    The connection goes back to the pool once the body is fully read.
+    """
+
+    def __init__(self, pool, key, conn, response, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._url = url
+        self._done = False
+
+    def getcode(self):
+        return self._response.status
+
+    def info(self):
+        return self._response.msg
+
+    def geturl(self):
+        return self._url
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if amt is None or not data:
+            self._release()
+        return data
+
+    def close(self):
+        if self._response.isclosed():
+            self._release()
+        else:
+            # Body not consumed: the connection cannot be reused
+            self._discard()
+
+    def _release(self):
+        if self._done:
+            return
+        self._done = True
+        if self._response.will_close:
+            self._conn.close()
+        else:
+            self._pool.put(self._key, self._conn)
+
+    def _discard(self):
+        if self._done:
+            return
+        self._done = True
+        self._conn.close()
+
+
+class FailureCache:
+    """
+    Negative cache: URLs that failed recently (HTTP errors, timeouts,
+    refused connections) with an exponential backoff window.
+    Requests to a URL in its window fail at once with KnownBadURL.
+    """
+
+    def __init__(self, base=BACKOFF_BASE, max_window=BACKOFF_MAX, give_up_after=GIVE_UP_AFTER):
+        self.base = base
+        self.max_window = max_window
+        self.give_up_after = give_up_after
+        self._lock = threading.Lock()
+        self._failed = OrderedDict()    # url -> {'failures', 'until', 'error'}
+        self.stats = {'failures': 0, 'short_circuits': 0, 'retries': 0, 'recovered': 0, 'give_ups': 0}
+
+    def check(self, url):
+        """Raise KnownBadURL while url is in its backoff window"""
+        with self._lock:
+            entry = self._failed.get(url)
+            if entry is None:
+                return
+            wait = entry['until'] - time.time()
+            if wait <= 0:
+                self.stats['retries'] += 1
+                return
+            self.stats['short_circuits'] += 1
+        raise KnownBadURL("Skipping %s: failed %d times (%s), retry in %ds" % (
+            url, entry['failures'], entry['error'], wait))
+
+    def failure(self, url, error):
+        """Record a failure and open (or double) the backoff window"""
+        with self._lock:
+            entry = self._failed.pop(url, None) or {'failures': 0}
+            entry['failures'] += 1
+            entry['error'] = str(error)[:80]
+            window = min(self.base * (2 ** (entry['failures'] - 1)), self.max_window)
+            entry['until'] = time.time() + window
+            # Re-inserted last: the dict is trimmed oldest first
+            self._failed[url] = entry
+            self.stats['failures'] += 1
+            if entry['failures'] == self.give_up_after:
+                self.stats['give_ups'] += 1
+            while len(self._failed) > MAX_FAILED_URLS:
+                self._failed.popitem(last=False)
+        log.debug("URL failed %d times, backing off %ds: %s" % (entry['failures'], window, url), module="HTTP")
+
+    def success(self, url):
+        with self._lock:
+            if self._failed.pop(url, None) is not None:
+                self.stats['recovered'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._failed = OrderedDict()
+
+    def get_stats(self):
+        now = time.time()
+        with self._lock:
+            stats = dict(self.stats)
+            stats['known_bad'] = len([e for e in self._failed.values() if e['until'] > now])
+            stats['given_up'] = len([e for e in self._failed.values() if e['failures'] >= self.give_up_after])
+        return stats
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker for network-level failures (no route, DNS,
+    refused, timeout). HTTP errors mean the host answered and do not count.
+    closed -> open after CIRCUIT_THRESHOLD failures in a row; while open,
+    requests fail at once with CircuitOpen. After the cooldown one request
+    is let through as a probe: success closes the circuit, failure reopens
+    it with a doubled cooldown.
+    """
+
+    def __init__(self, threshold=CIRCUIT_THRESHOLD, cooldown=CIRCUIT_COOLDOWN,
+                 cooldown_max=CIRCUIT_COOLDOWN_MAX):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self._lock = threading.Lock()
+        self._hosts = {}    # host -> {'failures', 'opened', 'cooldown', 'probing'}
+        self.stats = {'opened': 0, 'closed': 0, 'rejected': 0, 'probes': 0}
+
+    def is_open(self, host):
+        """True while the circuit of host is open and not yet due for a probe"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state['opened']:
+                return False
+            return time.time() - state['opened'] < state['cooldown'] or state['probing']
+
+    def check(self, host):
+        """Raise CircuitOpen unless a request to host may go out"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state['opened']:
+                return
+            waited = time.time() - state['opened']
+            if waited >= state['cooldown'] and (not state['probing'] or waited >= 2 * state['cooldown']):
+                state['probing'] = True
+                self.stats['probes'] += 1
+                return
+            self.stats['rejected'] += 1
+            retry = max(0, int(state['cooldown'] - waited))
+        raise CircuitOpen("Host %s unreachable, offline mode (probe in %ds)" % (host, retry))
+
+    def failure(self, host):
+        with self._lock:
+            state = self._hosts.setdefault(
+                host, {'failures': 0, 'opened': 0, 'cooldown': self.cooldown, 'probing': False})
+            state['failures'] += 1
+            if state['opened']:
+                # Failed probe: stay open, wait longer
+                state['cooldown'] = min(state['cooldown'] * 2, self.cooldown_max)
+                state['opened'] = time.time()
+                state['probing'] = False
+                return
+            if state['failures'] < self.threshold:
+                return
+            state['opened'] = time.time()
+            state['probing'] = False
+            self.stats['opened'] += 1
+        log.info("Circuit open for %s after %d failures: offline mode" % (host, state['failures']), module="HTTP")
+
+    def success(self, host):
+        with self._lock:
+            state = self._hosts.pop(host, None)
+            if state is None or not state['opened']:
+                return
+            self.stats['closed'] += 1
+        log.info("Circuit closed for %s: back online" % host, module="HTTP")
+
+    def get_open_hosts(self):
+        with self._lock:
+            return [host for host, state in self._hosts.items() if state['opened']]
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['open_hosts'] = self.get_open_hosts()
+        return stats
+
+
+def get_content_encoding(response):
+    """Content-Encoding of a response, lower case ('' when identity)"""
+    try:
+        encoding = response.info().get('Content-Encoding') or ''
+    except AttributeError:
+        return ''
+    encoding = encoding.strip().lower()
+    return '' if encoding == 'identity' else encoding
+
+
+class DecodedReader:
+    """
+    read(n) over a body, undoing gzip/deflate Content-Encoding chunk by chunk.
+    The compressed bytes are also written to tee (an open file) when set.
+    """
+
+    def __init__(self, read, encoding='', tee=None):
+        self._read = read
+        self.encoding = encoding
+        self.tee = tee
+        self.compressed_size = 0
+        self.raw_deflate = False
+        self._done = False
+        if encoding in ('gzip', 'x-gzip'):
+            self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._inflate = zlib.decompressobj()
+        elif encoding:
+            raise IOError("Unsupported Content-Encoding: %s" % encoding)
+        else:
+            self._inflate = None
+
+    def _decompress(self, data):
+        try:
+            return self._inflate.decompress(data)
+        except zlib.error:
+            # Some servers send deflate without the zlib header
+            if self.encoding != 'deflate' or self.compressed_size != len(data):
+                raise
+            self.raw_deflate = True
+            self._inflate = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._inflate.decompress(data)
+
+    def read(self, n=READ_CHUNK):
+        if self._inflate is None:
+            return self._read(n)
+        while not self._done:
+            data = self._read(n)
+            if not data:
+                self._done = True
+                return self._inflate.flush()
+            self.compressed_size += len(data)
+            if self.tee is not None:
+                self.tee.write(data)
+            data = self._decompress(data)
+            if data:
+                return data
+        return b""
+
+
+def read_body(response):
+    """Whole response body with its Content-Encoding undone"""
+    reader = DecodedReader(response.read, get_content_encoding(response))
+    chunks = []
+    while True:
+        data = reader.read(READ_CHUNK)
+        if not data:
+            return b"".join(chunks)
+        chunks.append(data)
+
+
+class ConnectionPool:
+    """Per-host pool of keep-alive HTTP(S) connections with bounded size"""
+
+    def __init__(self, max_per_host=4, max_hosts=16, idle_timeout=30, ssl_context=None):
+        self.max_per_host = max_per_host
+        self.max_hosts = max_hosts
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self._lock = threading.Lock()
+        self._idle = {}         # (scheme, host, port) -> [(conn, released_at)]
+        self._last_used = {}    # (scheme, host, port) -> timestamp
+        self.stats = {'requests': 0, 'connections': 0, 'reused': 0, 'retries': 0}
+
+    def _new_connection(self, key, timeout):
+        scheme, host, port = key
+        with self._lock:
+            self.stats['connections'] += 1
+        if scheme == 'https':
+            if self.ssl_context is not None:
+                return HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+            return HTTPSConnection(host, port, timeout=timeout)
+        return HTTPConnection(host, port, timeout=timeout)
+
+    def get(self, key, timeout):
+        """Get an idle connection for key or open a new one. Returns (conn, reused)"""
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, released_at = idle.pop()
+                if now - released_at < self.idle_timeout:
+                    self._last_used[key] = now
+                    self.stats['reused'] += 1
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+            self._last_used[key] = now
+        return self._new_connection(key, timeout), False
+
+    def put(self, key, conn):
+        """Return a connection to the pool (closed if the pool is full)"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.max_per_host:
+                conn.close()
+                return
+            idle.append((conn, time.time()))
+            self._last_used[key] = time.time()
+            self._trim_hosts()
+
+    def _trim_hosts(self):
+        """Close idle connections of the least recently used hosts"""
+        if len(self._idle) <= self.max_hosts:
+            return
+        hosts = sorted(self._idle.keys(), key=lambda k: self._last_used.get(k, 0))
+        for key in hosts[:len(self._idle) - self.max_hosts]:
+            for conn, released_at in self._idle.pop(key):
+                conn.close()
+            self._last_used.pop(key, None)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            for key in list(self._idle.keys()):
+                for conn, released_at in self._idle.pop(key):
+                    conn.close()
+            self._last_used = {}
+
+    def request(self, url, headers=None, timeout=15):
+        """
+        GET url through the pool, following redirects.
+        Raises HTTPError for status >= 400, returns PooledResponse otherwise.
+        """
+        req_headers = {'User-Agent': DEFAULT_USER_AGENT}
+        if headers:
+            req_headers.update(headers)
+
+        for redirect in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ('http', 'https'):
+                raise ValueError("Unsupported URL scheme: %s" % url)
+            port = parts.port or (443 if scheme == 'https' else 80)
+            key = (scheme, parts.hostname, port)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            with self._lock:
+                self.stats['requests'] += 1
+
+            response, conn = self._send(key, path, req_headers, timeout)
+
+            if response.status in (301, 302, 303, 307, 308) and redirect < MAX_REDIRECTS:
+                location = response.getheader('Location')
+                response.read()
+                if response.will_close:
+                    conn.close()
+                else:
+                    self.put(key, conn)
+                if not location:
+                    break
+                url = urljoin(url, location)
+                log.debug("Redirect to: %s" % url, module="HTTP")
+                continue
+
+            if response.status >= 400:
+                response.read()
+                conn.close()
+                raise HTTPError(url, response.status, response.reason, response.msg, None)
+
+            return PooledResponse(self, key, conn, response, url)
+
+        raise HTTPError(url, response.status, "Too many redirects", response.msg, None)
+
+    def _send(self, key, path, headers, timeout):
+        """Send the request, retrying once on a stale keep-alive connection"""
+        conn, reused = self.get(key, timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn.getresponse(), conn
+        except socket.timeout:
+            conn.close()
+            raise
+        except (HTTPException, IOError, OSError) as e:
+            conn.close()
+            if not reused:
+                raise
+            log.debug("Stale keep-alive connection to %s (%s), reconnecting" % (key[1], e), module="HTTP")
+            with self._lock:
+                self.stats['retries'] += 1
+            conn = self._new_connection(key, timeout)
+            try:
+                conn.request('GET', path, headers=headers)
+                return conn.getresponse(), conn
+            except Exception:
+                conn.close()
+                raise
+
+    def get_stats(self):
+        """Get pool statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['idle'] = sum(len(idle) for idle in self._idle.values())
+            stats['hosts'] = len(self._idle)
+        return stats
+
+
+# Shared pool, negative cache and circuit breaker for the whole plugin
+_pool = ConnectionPool()
+_failures = FailureCache()
+_breaker = CircuitBreaker()
+
+
+def open_url(url, headers=None, timeout=15):
+    """
+    urlopen replacement using the shared keep-alive pool.
+    Raises KnownBadURL without a request while url is backing off after
+    failures, CircuitOpen while its host is unreachable.
+    """
+    host = get_host(url)
+    _failures.check(url)
+    _breaker.check(host)
+    try:
+        response = _pool.request(url, headers=headers, timeout=timeout)
+    except HTTPError as e:
+        # The host answered: only this URL is bad
+        _breaker.success(host)
+        _failures.failure(url, e)
+        raise
+    except (HTTPException, IOError, OSError, socket.timeout) as e:
+        _breaker.failure(host)
+        _failures.failure(url, e)
+        raise
+    _breaker.success(host)
+    _failures.success(url)
+    return response
+
+
+def is_offline(url):
+    """True while the host of url is known to be unreachable (serve cached data)"""
+    return _breaker.is_open(get_host(url))
+
+
+def get_breaker():
+    """Get the shared circuit breaker"""
+    return _breaker
+
+
+def get_failures():
+    """Get the shared negative cache"""
+    return _failures
+
+
+def get_pool():
+    """Get the shared connection pool"""
+    return _pool
@@ -0,0 +1,633 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Image Cache Module
+Content-addressed on-disk cache of channel logos and flags
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import time
+import hashlib
+import threading
+from os.path import join, exists, isdir
+from io import BytesIO
+from os import listdir, makedirs, remove, rename
+from sys import version_info
+
+from ..helpers import log
+from .config import get_config
+from .http_client import open_url, KnownBadURL
+from .journal import get_journal
+from .persistent_cache import get_persistent_tier
+from .ttl import get_ttl
+from .tasks import call_in_main_thread
+
+if version_info[0] == 3:
+    from urllib.error import HTTPError
+else:
+    from urllib2 import HTTPError
+
+try:
+    from PIL import Image
+    RESAMPLE = getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', None))
+except ImportError:
+    Image = None
+
+
+IMAGE_DIR = "images"
+INDEX_FILE = "index.journal"
+HOT_CACHE_DIR = "/tmp/tvgarden_cache"
+
+# Access times are kept in memory and written to the index (from a worker
+# thread) at most this often (seconds)
+ACCESS_FLUSH_INTERVAL = 60
+
+# Downloads one screen may have running; abandoned ones still count until they end
+LOADER_WORKERS = 2
+
+# Prefetch downloads wait this long between checks while a foreground load runs
+PREFETCH_YIELD_WAIT = 0.2
+
+# Widget size of each image kind per skin resolution (skins/<res>/*.xml):
+# with PIL, cached images are kept pre-scaled to it
+THUMB_SIZES = {
+    'logo': {'hd': (80, 50), 'fhd': (120, 90), 'wqhd': (160, 120)},
+}
+
+
+def _image_suffix(data):
+    """File suffix from the image signature (ePicLoad sniffs the content anyway)"""
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    return ".png"
+
+
+def get_thumb_size(kind):
+    """(width, height) images of kind are shown at with the current skin, or None"""
+    sizes = THUMB_SIZES.get(kind)
+    if not sizes:
+        return None
+    return sizes.get(get_config().get_skin_resolution(), sizes['hd'])
+
+
+def _scale_image(path, size):
+    """
+    PNG bytes of the image at path fitted into size (aspect ratio kept);
+    None if it already fits or cannot be decoded.
+    """
+    try:
+        image = Image.open(path)
+        if image.size[0] <= size[0] and image.size[1] <= size[1]:
+            return None
+        image = image.convert('RGBA')
+        image.thumbnail(size, RESAMPLE)
+        out = BytesIO()
+        image.save(out, 'PNG', optimize=True)
+        return out.getvalue()
+    except Exception as e:
+        log.debug("Cannot scale %s: %s" % (path, e), module="Images")
+        return None
+
+
+class ImageCache:
+    """
+    Images stored once per content (file name = sha1 of the bytes), with an
+    index url -> {'file', 'size', 'fetched', 'accessed', 'etag', 'last_modified'}
+    kept in a journal. Expired images are revalidated with If-None-Match /
+    If-Modified-Since; the least recently used ones are evicted beyond
+    image_cache_max_kb / image_cache_max_entries.
+    With PIL, a kind listed in THUMB_SIZES is scaled once per widget size;
+    the renditions are kept next to the source ('renditions' in the index:
+    {"120x90": {'file', 'size'}}), so a skin change scales from the source.
+    The cache lives on tmpfs; with a persistent tier it is mirrored there
+    (throttled) and restored from the mirror after a reboot.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        if not isdir(base_dir):
+            makedirs(base_dir)
+        self._lock = threading.RLock()
+        self.index = get_journal(join(base_dir, INDEX_FILE))
+        self._accessed = {}
+        self._access_flushed = time.time()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'downloads': 0,
+                      'stale': 0, 'evictions': 0, 'scaled': 0}
+
+    def _key(self, url):
+        return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+    def _path(self, entry):
+        return join(self.base_dir, entry['file'])
+
+    def _get_entry(self, url):
+        """Index entry of url whose file exists, or None"""
+        entry = self.index.get(self._key(url))
+        if entry is None or not exists(self._path(entry)):
+            return None
+        return entry
+
+    def _is_fresh(self, url, entry, kind):
+        return time.time() - entry.get('fetched', 0) < get_ttl(kind, self._key(url))
+
+    def _shown_path(self, entry, kind):
+        """Path of the file shown for kind (rendition at the current skin size), None until scaled"""
+        size = get_thumb_size(kind)
+        if Image is None or size is None:
+            return self._path(entry)
+        rendition = entry.get('renditions', {}).get("%dx%d" % size)
+        if rendition is None:
+            return None
+        path = join(self.base_dir, rendition['file'])
+        return path if exists(path) else None
+
+    def _needs_scaling(self, entry, kind):
+        return self._shown_path(entry, kind) is None
+
+    def _files(self, entry):
+        """(name, size) of the source and rendition files of an entry"""
+        files = [(entry.get('file'), entry.get('size', 0))]
+        for rendition in entry.get('renditions', {}).values():
+            files.append((rendition.get('file'), rendition.get('size', 0)))
+        return files
+
+    def _touch(self, key, entry):
+        """Record an access in memory only (lookup() runs on the main loop)"""
+        self._accessed[key] = time.time()
+
+    def flush_access(self, force=True):
+        """Write access times newer than the index with one append (worker thread or exit)"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._access_flushed < ACCESS_FLUSH_INTERVAL:
+                return 0
+            self._access_flushed = now
+            changed = {}
+            for key, accessed in self._accessed.items():
+                entry = self.index.get(key)
+                if entry is not None and accessed > entry.get('accessed', 0):
+                    entry = dict(entry)
+                    entry['accessed'] = accessed
+                    changed[key] = entry
+            if changed:
+                self.index.update(changed)
+            return len(changed)
+
+    def is_fresh(self, url, kind='logo'):
+        """True if a fresh copy ready to show is cached (no access recorded)"""
+        with self._lock:
+            entry = self._get_entry(url)
+            return entry is not None and self._is_fresh(url, entry, kind) and \
+                not self._needs_scaling(entry, kind)
+
+    def lookup(self, url, kind='logo'):
+        """Path of a fresh cached image ready to show, without network; None otherwise"""
+        with self._lock:
+            entry = self._get_entry(url)
+            if entry is None or not self._is_fresh(url, entry, kind):
+                return None
+            path = self._shown_path(entry, kind)
+            if path is None:
+                return None
+            self._touch(self._key(url), entry)
+            self.stats['hits'] += 1
+            return path
+
+    def get(self, url, kind='logo', timeout=5):
+        """
+        Path of the image of url: from the cache while fresh, revalidated
+        when expired, downloaded on a miss. Network errors are raised unless
+        an expired copy can be served instead.
+        """
+        path = self.lookup(url, kind)
+        if path:
+            return path
+        path = self._get(url, kind, timeout)
+        self.flush_access(force=False)
+        self._mirror()
+        return path
+
+    def _get(self, url, kind, timeout):
+        with self._lock:
+            entry = self._get_entry(url)
+            fresh = entry is not None and self._is_fresh(url, entry, kind)
+            if fresh:
+                self._touch(self._key(url), entry)
+                self.stats['hits'] += 1
+        if fresh:
+            # Cached but not scaled yet
+            return self.fit(url, kind)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if entry is None:
+            with self._lock:
+                self.stats['misses'] += 1
+
+        data = None
+        validators = {}
+        try:
+            response = None
+            try:
+                response = open_url(url, headers=headers, timeout=timeout)
+                code = response.getcode()
+                if code != 304:
+                    data = response.read()
+                    info = response.info()
+                    if info.get('ETag'):
+                        validators['etag'] = info.get('ETag')
+                    if info.get('Last-Modified'):
+                        validators['last_modified'] = info.get('Last-Modified')
+            except HTTPError as e:
+                if e.code != 304:
+                    raise
+                code = 304
+            finally:
+                if response:
+                    response.close()
+        except Exception:
+            if entry is None:
+                raise
+            with self._lock:
+                self.stats['stale'] += 1
+            return self.fit(url, kind)
+
+        if code == 304 and entry is not None:
+            with self._lock:
+                entry = dict(entry)
+                entry['fetched'] = entry['accessed'] = time.time()
+                self.index[self._key(url)] = entry
+                self.stats['revalidated'] += 1
+            return self.fit(url, kind)
+        if not data:
+            return None
+        if not self.store(url, data, validators):
+            return None
+        return self.fit(url, kind)
+
+    def _mirror(self):
+        """Copy the cache to the persistent tier (throttled there, off the main loop)"""
+        tier = get_persistent_tier()
+        if tier is not None:
+            tier.store_dir(IMAGE_DIR, self.base_dir, skip=(INDEX_FILE,),
+                           write_extra=lambda folder: self.index.snapshot(join(folder, INDEX_FILE)))
+
+    def _write_file(self, data):
+        """Write image bytes under their content name; returns the name or None"""
+        name = hashlib.sha1(data).hexdigest() + _image_suffix(data)
+        path = join(self.base_dir, name)
+        if not exists(path):
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                rename(tmp_path, path)
+            except (IOError, OSError) as e:
+                log.error("Cannot store image %s: %s" % (name, e), module="Images")
+                return None
+        return name
+
+    def store(self, url, data, validators=None):
+        """Store the image of url; returns its path"""
+        with self._lock:
+            name = self._write_file(data)
+            if name is None:
+                return None
+
+            now = time.time()
+            key = self._key(url)
+            entry = {'url': url, 'file': name, 'size': len(data), 'fetched': now, 'accessed': now}
+            if validators:
+                entry.update(validators)
+            previous = self.index.get(key)
+            self.index[key] = entry
+            self._accessed[key] = now
+            self.stats['downloads'] += 1
+            if previous:
+                self._remove_unreferenced([f for f, size in self._files(previous) if f != name])
+            self._enforce_limits(keep_key=key)
+            return self._path(entry)
+
+    def fit(self, url, kind='logo'):
+        """
+        Path of the cached image of url at the widget size of kind: scaled
+        from the source once per size (off the main loop, the source is
+        decoded in full) and kept as a rendition next to it.
+        """
+        with self._lock:
+            entry = self._get_entry(url)
+            if entry is None:
+                return None
+            path = self._shown_path(entry, kind)
+            if path is not None:
+                return path
+            source = entry['file']
+        size = get_thumb_size(kind)
+        data = _scale_image(join(self.base_dir, source), size)
+
+        with self._lock:
+            # The source itself is shown when it already fits (or cannot be decoded)
+            rendition = {'file': source, 'size': 0}
+            if data is not None:
+                name = self._write_file(data)
+                if name is not None:
+                    rendition = {'file': name, 'size': len(data)}
+                    self.stats['scaled'] += 1
+            entry = self._get_entry(url)
+            if entry is None or entry['file'] != source:
+                # Replaced or evicted while scaling
+                self._remove_unreferenced([rendition['file']])
+                return self._path(entry) if entry is not None else None
+            entry = dict(entry)
+            entry.pop('scaled', None)
+            entry['renditions'] = dict(entry.get('renditions', {}))
+            entry['renditions']["%dx%d" % size] = rendition
+            self.index[self._key(url)] = entry
+            return join(self.base_dir, rendition['file'])
+
+    def _remove_unreferenced(self, names):
+        """Delete image files no index entry points to any more"""
+        names = set(names)
+        for key, entry in self.index.items():
+            for name, size in self._files(entry):
+                names.discard(name)
+        for name in names:
+            try:
+                remove(join(self.base_dir, name))
+            except OSError:
+                pass
+
+    def _totals(self):
+        """(entries, bytes of distinct files)"""
+        files = {}
+        items = self.index.items()
+        for key, entry in items:
+            for name, size in self._files(entry):
+                files[name] = max(size, files.get(name, 0))
+        return len(items), sum(files.values())
+
+    def _enforce_limits(self, keep_key=None):
+        """Evict least recently used images beyond the configured limits"""
+        config = get_config()
+        max_bytes = config.get("image_cache_max_kb", 4096) * 1024
+        max_entries = config.get("image_cache_max_entries", 1000)
+        count, total = self._totals()
+        if total <= max_bytes and count <= max_entries:
+            return 0
+
+        def accessed(item):
+            return self._accessed.get(item[0], item[1].get('accessed', 0))
+
+        evicted = []
+        for key, entry in sorted(self.index.items(), key=accessed):
+            if total <= max_bytes and count <= max_entries:
+                break
+            if key == keep_key:
+                continue
+            evicted.append((key, entry))
+            count -= 1
+            total -= sum(size for name, size in self._files(entry))
+        self.index.remove([key for key, entry in evicted])
+        for key, entry in evicted:
+            self._accessed.pop(key, None)
+        self._remove_unreferenced([name for key, entry in evicted for name, size in self._files(entry)])
+        self.stats['evictions'] += len(evicted)
+        log.debug("Evicted %d images" % len(evicted), module="Images")
+        return len(evicted)
+
+    def clear(self):
+        """Remove every image (and the persistent mirror)"""
+        tier = get_persistent_tier()
+        if tier is not None:
+            tier.remove_dir(IMAGE_DIR)
+        with self._lock:
+            self.index.clear()
+            self._accessed = {}
+            for name in listdir(self.base_dir):
+                if name != INDEX_FILE:
+                    try:
+                        remove(join(self.base_dir, name))
+                    except OSError:
+                        pass
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'], size = self._totals()
+        stats['size_kb'] = size / 1024.0
+        stats['dir'] = self.base_dir
+        return stats
+
+
+class ImageLoader:
+    """
+    Background image fetching for one screen, latest request wins.
+    A new request or cancel() drops the result of every older one (a running
+    download cannot be interrupted, it is just ignored when it ends) and
+    replaces a request still waiting for a worker.
+    """
+
+    def __init__(self, name="TVGardenImages", max_workers=LOADER_WORKERS):
+        self.name = name
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending = None    # (generation, url, kind, callback)
+        self._running = 0
+        self.stats = {'requests': 0, 'dropped': 0, 'delivered': 0}
+
+    def request(self, url, kind, callback):
+        """Fetch url in the background; callback(path or None) on the main loop if still current"""
+        with self._lock:
+            self._generation += 1
+            if self._pending is not None:
+                self.stats['dropped'] += 1
+            self._pending = (self._generation, url, kind, callback)
+            self.stats['requests'] += 1
+            if self._running >= self.max_workers:
+                return
+            self._running += 1
+        thread = threading.Thread(target=self._run, name=self.name)
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        """Drop every request made so far"""
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                job = self._pending
+                self._pending = None
+                if job is None:
+                    self._running -= 1
+                    return
+            generation, url, kind, callback = job
+            prefetcher = get_prefetcher()
+            prefetcher.foreground_started()
+            try:
+                path = get_image_cache().get(url, kind)
+            except KnownBadURL as e:
+                log.debug(str(e), module="Images")
+                path = None
+            except Exception as e:
+                log.error("Error loading image %s: %s" % (url, e), module="Images")
+                path = None
+            finally:
+                prefetcher.foreground_done()
+            call_in_main_thread(self._deliver, generation, callback, path)
+
+    def _deliver(self, generation, callback, path):
+        """Main loop: hand over the result unless a newer request came in"""
+        with self._lock:
+            current = generation == self._generation
+            self.stats['delivered' if current else 'dropped'] += 1
+        if current:
+            callback(path)
+
+
+class Prefetcher:
+    """
+    Low-priority download of images likely to be shown next.
+    schedule() replaces the queue (only the newest neighbourhood matters)
+    and touches neither the cache nor the disk: it runs on the main loop at
+    each selection. cancel(owner) drops the queue only if that screen
+    scheduled it. Workers skip the images already cached; at most
+    logo_prefetch_workers downloads run, and none starts while a foreground
+    load (ImageLoader) is in progress.
+    """
+
+    def __init__(self, name="TVGardenPrefetch"):
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue = []        # [(url, kind)], nearest row first
+        self._owner = None      # token of the screen that queued them
+        self._inflight = set()
+        self._running = 0
+        self._foreground = 0
+        self.stats = {'scheduled': 0, 'cached': 0, 'fetched': 0, 'failed': 0, 'yields': 0}
+
+    def schedule(self, items, owner=None):
+        """Queue (url, kind) pairs in priority order, replacing what is still queued"""
+        queue = []
+        seen = set()
+        for url, kind in items:
+            if url and url not in seen:
+                seen.add(url)
+                queue.append((url, kind))
+
+        max_workers = get_config().get("logo_prefetch_workers", 2)
+        with self._cond:
+            self._queue = queue
+            self._owner = owner
+            self.stats['scheduled'] += len(queue)
+            start = max(0, min(max_workers, len(queue)) - self._running)
+            self._running += start
+            self._cond.notify_all()
+        for n in range(start):
+            thread = threading.Thread(target=self._run, name=self.name)
+            thread.daemon = True
+            thread.start()
+
+    def cancel(self, owner=None):
+        """Drop the queued images of owner, or all of them (running downloads finish)"""
+        with self._cond:
+            if owner is None or owner is self._owner:
+                self._queue = []
+                self._owner = None
+
+    def foreground_started(self):
+        with self._cond:
+            self._foreground += 1
+
+    def foreground_done(self):
+        with self._cond:
+            self._foreground -= 1
+            self._cond.notify_all()
+
+    def _take(self):
+        with self._cond:
+            while self._queue and self._foreground > 0:
+                self.stats['yields'] += 1
+                self._cond.wait(PREFETCH_YIELD_WAIT)
+            while self._queue:
+                item = self._queue.pop(0)
+                # Another worker may be downloading it already
+                if item[0] not in self._inflight:
+                    self._inflight.add(item[0])
+                    return item
+            self._running -= 1
+            return None
+
+    def _run(self):
+        cache = get_image_cache()
+        while True:
+            item = self._take()
+            if item is None:
+                return
+            url, kind = item
+            if cache.is_fresh(url, kind):
+                result = 'cached'
+            else:
+                try:
+                    cache.get(url, kind)
+                    result = 'fetched'
+                except Exception as e:
+                    log.debug("Prefetch of %s failed: %s" % (url, e), module="Images")
+                    result = 'failed'
+            with self._cond:
+                self._inflight.discard(url)
+                self.stats[result] += 1
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats['queued'] = len(self._queue)
+            stats['running'] = self._running
+        return stats
+
+
+_prefetcher = Prefetcher()
+
+
+def get_prefetcher():
+    """Get the shared image prefetcher"""
+    return _prefetcher
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def flush_image_cache():
+    """Save pending access times (if the image cache was used)"""
+    with _cache_lock:
+        cache = _cache
+    if cache is not None:
+        cache.flush_access()
+
+
+def get_image_cache():
+    """
+    Get the shared image cache (tmpfs). With a persistent tier, logos
+    survive reboots: the first use after one restores the tier's mirror.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            base_dir = join(HOT_CACHE_DIR, IMAGE_DIR)
+            tier = get_persistent_tier()
+            if tier is not None and not exists(join(base_dir, INDEX_FILE)):
+                tier.restore_dir(IMAGE_DIR, base_dir)
+            _cache = ImageCache(base_dir)
+            log.info("Image cache at %s" % _cache.base_dir, module="Images")
+        return _cache
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Channel Index Module
+Lookups by country, category, language, nanoid and text over all-channels.json
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import threading
+
+try:
+    string_types = basestring  # Python 2
+except NameError:
+    string_types = str         # Python 3
+
+
+def normalize_key(value):
+    """Normalise a country code, language or category name for lookups"""
+    if not isinstance(value, string_types):
+        return None
+    value = value.strip().lower()
+    if not value:
+        return None
+    return value.replace(' ', '-').replace('_', '-')
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return value
+    if value:
+        return [value]
+    return []
+
+
+def _search_text(channel):
+    """Lower-case text matched by the search screen (name, description, group)"""
+    parts = []
+    for field in ('name', 'description', 'group'):
+        value = channel.get(field)
+        if isinstance(value, string_types) and value:
+            parts.append(value.lower())
+    return "\n".join(parts)
+
+
+class ChannelIndex:
+    """
+    Normalised channel index built in one pass over all-channels.json.
+    Lists are shared with the cache: callers must not modify them.
+    apply() moves the index to a new snapshot from a delta ChangeSet;
+    buckets are replaced, never modified in place.
+    """
+
+    COUNTRY_FIELDS = ('country', 'countries')
+    CATEGORY_FIELDS = ('categories', 'category')
+    LANGUAGE_FIELDS = ('languages', 'language')
+
+    def __init__(self, channels):
+        self._reset(channels)
+        self._build(channels)
+
+    def _reset(self, channels):
+        self.source = channels
+        self.by_nanoid = {}
+        self.by_country = {}
+        self.by_category = {}
+        self.by_language = {}
+        # id(channel) -> search text, built on first search
+        self.search_text = None
+
+    def _tables(self):
+        return (
+            (self.by_country, self.COUNTRY_FIELDS),
+            (self.by_category, self.CATEGORY_FIELDS),
+            (self.by_language, self.LANGUAGE_FIELDS),
+        )
+
+    def _keys(self, channel, fields):
+        for field in fields:
+            if field in channel:
+                keys = [normalize_key(value) for value in _as_list(channel[field])]
+                return [key for key in keys if key]
+        return []
+
+    def _build(self, channels):
+        for channel in channels:
+            if not isinstance(channel, dict):
+                continue
+            nanoid = channel.get('nanoid')
+            if nanoid:
+                self.by_nanoid[nanoid] = channel
+            for table, fields in self._tables():
+                for key in self._keys(channel, fields):
+                    table.setdefault(key, []).append(channel)
+
+    def apply(self, changes):
+        """
+        Update the index from a ChangeSet. Only buckets touched by the change
+        are rebuilt, in the order of the new list (as a full rebuild would)
+        """
+        if changes.full:
+            self._reset(changes.new)
+            self._build(changes.new)
+            return
+
+        old_records = list(changes.removed)
+        new_records = list(changes.added)
+        for old, new in changes.url_changed + changes.updated:
+            old_records.append(old)
+            new_records.append(new)
+        dropped = set(id(channel) for channel in old_records)
+        position = {}
+        end = len(changes.new)
+        if new_records:
+            position = dict((id(channel), n) for n, channel in enumerate(changes.new))
+
+        for table, fields in self._tables():
+            additions = {}
+            touched = set()
+            for channel in old_records:
+                touched.update(self._keys(channel, fields))
+            for channel in new_records:
+                for key in self._keys(channel, fields):
+                    additions.setdefault(key, []).append(channel)
+                    touched.add(key)
+
+            for key in touched:
+                bucket = [channel for channel in table.get(key, ()) if id(channel) not in dropped]
+                extra = additions.get(key)
+                if extra:
+                    # Same order as a full rebuild: the order of the new list
+                    bucket.extend(extra)
+                    bucket.sort(key=lambda channel: position.get(id(channel), end))
+                if bucket:
+                    table[key] = bucket
+                else:
+                    table.pop(key, None)
+
+        for channel in old_records:
+            nanoid = channel.get('nanoid')
+            if self.by_nanoid.get(nanoid) is channel:
+                del self.by_nanoid[nanoid]
+            if self.search_text is not None:
+                self.search_text.pop(id(channel), None)
+        for channel in new_records:
+            self.by_nanoid[channel.get('nanoid')] = channel
+            if self.search_text is not None:
+                self.search_text[id(channel)] = _search_text(channel)
+        self.source = changes.new
+
+    @property
+    def has_countries(self):
+        return bool(self.by_country)
+
+    @property
+    def has_categories(self):
+        return bool(self.by_category)
+
+    def get_country(self, code):
+        """Channels of a country ([] if none, None if the index has no country data)"""
+        if not self.has_countries:
+            return None
+        return self.by_country.get(normalize_key(code), [])
+
+    def get_category(self, category_id):
+        """Channels of a category ([] if none, None if the index has no category data)"""
+        if not self.has_categories:
+            return None
+        return self.by_category.get(normalize_key(category_id), [])
+
+    def get_language(self, language):
+        """Channels of a language"""
+        return self.by_language.get(normalize_key(language), [])
+
+    def get_channel(self, nanoid):
+        """Channel by nanoid or None"""
+        return self.by_nanoid.get(nanoid)
+
+    def search(self, query):
+        """Channels whose name, description or group contains query, in list order"""
+        if self.search_text is None:
+            self.search_text = dict((id(channel), _search_text(channel))
+                                    for channel in self.source if isinstance(channel, dict))
+        query = query.lower()
+        texts = self.search_text
+        return [channel for channel in self.source if query in texts.get(id(channel), '')]
+
+    def get_stats(self):
+        return {
+            'channels': len(self.source),
+            'countries': len(self.by_country),
+            'categories': len(self.by_category),
+            'languages': len(self.by_language)
+        }
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_index(channels):
+    """Index of a channel list, rebuilt only when the list object changes"""
+    global _current
+    with _lock:
+        if _current is None or _current.source is not channels:
+            _current = ChannelIndex(channels)
+        return _current
+
+
+def apply_changes(changes):
+    """Move the current index to the new snapshot of a ChangeSet (if it indexes the old one)"""
+    with _lock:
+        if _current is not None and _current.source is changes.old:
+            _current.apply(changes)
+            return True
+    return False
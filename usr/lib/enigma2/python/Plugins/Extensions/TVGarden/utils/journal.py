@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Journal Store Module
+Append-only key/value store with periodic compaction
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import threading
+from os.path import exists, getsize
+from os import remove, rename
+from json import load, loads, dumps
+
+from ..helpers import log
+
+
+# Compact when the file holds this many records and most of them are dead
+COMPACT_MIN_RECORDS = 64
+COMPACT_RATIO = 2
+
+
+class JournalStore:
+    """
+    Dict-like store kept as one JSON record per line: [key, value] sets a
+    key, [key] deletes it. A change appends its records (O(1) I/O); the file
+    is rewritten with the live entries only once dead records dominate.
+    A torn last line (power loss while writing) is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data = {}
+        self._records = 0
+        self.stats = {'appends': 0, 'compactions': 0}
+        self._load()
+
+    def _load(self):
+        """Replay the journal"""
+        if not exists(self.path):
+            return
+        bad = 0
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = loads(line)
+                    except ValueError:
+                        bad += 1
+                        continue
+                    self._records += 1
+                    if len(record) == 2:
+                        self._data[record[0]] = record[1]
+                    else:
+                        self._data.pop(record[0], None)
+        except Exception as e:
+            log.error("Error reading journal %s: %s" % (self.path, e), module="Journal")
+        log.debug("Journal %s: %d entries, %d records" % (
+            self.path, len(self._data), self._records), module="Journal")
+        if bad or self._needs_compaction():
+            self.compact()
+
+    def _needs_compaction(self):
+        return self._records >= COMPACT_MIN_RECORDS and \
+            self._records > COMPACT_RATIO * max(len(self._data), 1)
+
+    def _append(self, records):
+        """Append records (list of [key, value] / [key]) to the file"""
+        try:
+            with open(self.path, 'a') as f:
+                f.write("".join(dumps(record) + "\n" for record in records))
+        except Exception as e:
+            log.error("Error writing journal %s: %s" % (self.path, e), module="Journal")
+            return False
+        self._records += len(records)
+        self.stats['appends'] += 1
+        if self._needs_compaction():
+            self.compact()
+        return True
+
+    def _write(self, path, items):
+        """Write entries to path (temp file + rename)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for key, value in items:
+                f.write(dumps([key, value]) + "\n")
+        rename(tmp_path, path)
+
+    def compact(self):
+        """Rewrite the file with the live entries (temp file + rename)"""
+        with self._lock:
+            try:
+                self._write(self.path, self._data.items())
+            except Exception as e:
+                log.error("Error compacting journal %s: %s" % (self.path, e), module="Journal")
+                return False
+            self._records = len(self._data)
+            self.stats['compactions'] += 1
+            return True
+
+    def snapshot(self, path):
+        """Write a compacted copy of the journal to path (backups on other media)"""
+        # Written outside the lock: slow media must not hold up appends
+        items = self.items()
+        try:
+            self._write(path, items)
+        except Exception as e:
+            log.error("Error writing snapshot %s: %s" % (path, e), module="Journal")
+            return False
+        return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        """Set several keys with one append"""
+        with self._lock:
+            self._data.update(values)
+            return self._append([[key, value] for key, value in values.items()])
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self._append([[key]])
+            return value
+
+    def remove(self, keys):
+        """Delete several keys with one append"""
+        with self._lock:
+            keys = [key for key in keys if key in self._data]
+            for key in keys:
+                del self._data[key]
+            if not keys:
+                return True
+            return self._append([[key] for key in keys])
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """Drop every entry (the file is truncated)"""
+        with self._lock:
+            self._data = {}
+            return self.compact()
+
+    def import_json(self, path):
+        """Take over the entries of an old full-rewrite JSON file and remove it"""
+        try:
+            with open(path, 'r') as f:
+                values = load(f)
+            if isinstance(values, dict) and values:
+                with self._lock:
+                    self._data.update(values)
+                    self.compact()
+            remove(path)
+            log.info("Imported %d entries from %s" % (len(values), path), module="Journal")
+        except Exception as e:
+            log.error("Cannot import %s: %s" % (path, e), module="Journal")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._data)
+            stats['records'] = self._records
+        try:
+            stats['size_kb'] = getsize(self.path) / 1024.0
+        except OSError:
+            stats['size_kb'] = 0.0
+        return stats
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path, legacy_path=None):
+    """
+    Get the shared store of a journal file (loaded once per process).
+    legacy_path: old JSON file imported (then removed) the first time.
+    """
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = JournalStore(path)
+            if legacy_path and exists(legacy_path):
+                journal.import_json(legacy_path)
+            _journals[path] = journal
+        return journal
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Streaming JSON Module
+Incremental parsing of top-level JSON arrays from sockets and gzip files
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import codecs
+from json import JSONDecoder, loads
+
+CHUNK_SIZE = 65536
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+_decoder = JSONDecoder()
+
+
+def _skip(buf, pos, chars=_WHITESPACE):
+    length = len(buf)
+    while pos < length and buf[pos] in chars:
+        pos += 1
+    return pos
+
+
+class JSONStream:
+    """
+    Parse JSON from read(n) -> bytes without holding the whole text.
+    Top-level arrays are yielded element by element (peak memory: one
+    chunk plus the elements kept by the consumer); any other document is
+    read completely and parsed at once.
+    """
+
+    def __init__(self, read, chunk_size=CHUNK_SIZE):
+        self._read = read
+        self.chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = u""
+        self._eof = False
+        self._keys = {}
+        self._end = 0
+        self.is_array = None
+
+    def _fill(self):
+        """Append the next chunk to the buffer; False at end of input"""
+        if self._eof:
+            return False
+        data = self._read(self.chunk_size)
+        if not data:
+            self._eof = True
+            self._buf += self._utf8.decode(b"", True)
+            return False
+        self._buf += self._utf8.decode(data)
+        return True
+
+    def _peek(self, pos):
+        """Position of the next non-blank character (reading more if needed)"""
+        while True:
+            pos = _skip(self._buf, pos)
+            if pos < len(self._buf) or not self._fill():
+                return pos
+
+    def _start(self):
+        pos = self._peek(0)
+        if pos < len(self._buf) and self._buf[pos] == u"\ufeff":
+            pos = self._peek(pos + 1)
+        self.is_array = pos < len(self._buf) and self._buf[pos] == u"["
+        return pos
+
+    def __iter__(self):
+        """Yield the elements of a top-level array"""
+        pos = self._start()
+        if not self.is_array:
+            raise ValueError("Not a JSON array")
+        pos = self._peek(pos + 1)
+        if pos < len(self._buf) and self._buf[pos] == u"]":
+            self._end = pos + 1
+            return
+
+        while True:
+            pos = self._peek(pos)
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(self._buf, pos)
+                    # A number cut at the chunk end ("2" of "2.5") may still look complete
+                    if self._eof or (end < len(self._buf) and self._buf[end] in _DELIMITERS):
+                        break
+                except ValueError:
+                    if self._eof:
+                        raise
+                if not self._fill():
+                    value, end = _decoder.raw_decode(self._buf, pos)
+                    break
+            if isinstance(value, dict):
+                # The decoder shares key strings only within one call: share them across records
+                keys = self._keys
+                value = dict(zip(map(keys.setdefault, value, value), value.values()))
+            yield value
+
+            pos = self._peek(end)
+            if pos >= len(self._buf):
+                raise ValueError("Unterminated JSON array")
+            char = self._buf[pos]
+            if char == u"]":
+                self._end = pos + 1
+                return
+            if char != u",":
+                raise ValueError("Expected ',' or ']' at %d" % pos)
+            pos += 1
+            # Drop the consumed text
+            if pos > self.chunk_size:
+                self._buf = self._buf[pos:]
+                pos = 0
+
+    def load(self):
+        """Parse the whole document: arrays are built element by element"""
+        pos = self._start()
+        if self.is_array:
+            self._buf = self._buf[pos:]
+            items = list(self)
+            # Read to the end (sockets, gzip trailers): only blanks may follow
+            pos = self._end
+            while True:
+                if _skip(self._buf, pos) < len(self._buf):
+                    raise ValueError("Extra data after JSON array")
+                self._buf = u""
+                pos = 0
+                if not self._fill():
+                    return items
+        while self._fill():
+            pass
+        return loads(self._buf[pos:])
+
+
+class CountingReader:
+    """
+    read(n) wrapper counting the bytes read and feeding an optional hash.
+    peek() looks at the first chunk without consuming it.
+    """
+
+    def __init__(self, read, digest=None):
+        self._read = read
+        self.digest = digest
+        self.size = 0
+        self._pending = b""
+
+    def _next(self, n):
+        data = self._read(n)
+        if data:
+            self.size += len(data)
+            if self.digest is not None:
+                self.digest.update(data)
+        return data or b""
+
+    def peek(self, n=CHUNK_SIZE):
+        if not self._pending:
+            self._pending = self._next(n)
+        return self._pending
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            # Everything left, the peeked chunk included
+            chunks = [self._pending]
+            self._pending = b""
+            while True:
+                data = self._next(CHUNK_SIZE)
+                if not data:
+                    return b"".join(chunks)
+                chunks.append(data)
+        if self._pending:
+            data, self._pending = self._pending, b""
+            return data
+        return self._next(n)
+
+
+def load_stream(read, chunk_size=CHUNK_SIZE):
+    """Parse JSON from a read(n) function (see JSONStream)"""
+    return JSONStream(read, chunk_size).load()
+
+
+def iter_array(read, chunk_size=CHUNK_SIZE):
+    """Iterate over the elements of a top-level JSON array"""
+    return iter(JSONStream(read, chunk_size))
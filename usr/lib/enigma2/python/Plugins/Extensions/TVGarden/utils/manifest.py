@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Cache Manifest Module
+Index of cache entries (size, fetch/access time, validators)
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import time
+import threading
+from os.path import join, exists
+from os import listdir, remove, rename, stat
+from json import load, dump
+
+from ..helpers import log
+
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+ENTRY_SUFFIX = ".json.gz"
+LEGACY_META_SUFFIX = ".meta.json"
+
+# Access times alone are saved at most this often (seconds)
+ACCESS_FLUSH_INTERVAL = 60
+
+# HTTP validators plus the git blob sha of the downloaded file
+VALIDATOR_FIELDS = ('etag', 'last_modified', 'sha')
+
+
+class CacheManifest:
+    """
+    Small JSON index of a cache directory, updated incrementally.
+    Entry: {'url', 'size', 'raw_size', 'fetched', 'accessed', 'codec', 'etag', 'last_modified', 'sha'}
+    (raw_size: JSON size of the entry, picks the codec's load strategy)
+    Answers info, eviction and freshness queries without walking the directory.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = join(cache_dir, MANIFEST_FILE)
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._dirty = False
+        self._last_save = 0
+        if not self._load():
+            self.rebuild()
+
+    def _load(self):
+        """Load manifest from disk"""
+        if not exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                return False
+            self._entries = data.get('entries', {})
+            self._last_save = time.time()
+            log.debug("Manifest loaded: %d entries" % len(self._entries), module="Manifest")
+            return True
+        except Exception as e:
+            log.error("Error loading manifest: %s" % e, module="Manifest")
+            return False
+
+    def rebuild(self):
+        """Rebuild the manifest from the files on disk (first run or damaged manifest)"""
+        with self._lock:
+            self._entries = {}
+            try:
+                files = listdir(self.cache_dir)
+            except Exception as e:
+                log.error("Cannot list cache dir: %s" % e, module="Manifest")
+                return False
+
+            for f in files:
+                if not f.endswith(ENTRY_SUFFIX):
+                    continue
+                key = f[:-len(ENTRY_SUFFIX)]
+                try:
+                    st = stat(join(self.cache_dir, f))
+                except OSError:
+                    continue
+                self._entries[key] = {
+                    'url': None,
+                    'size': st.st_size,
+                    'fetched': st.st_mtime,
+                    'accessed': st.st_atime
+                }
+
+            # Import validators from the old per-entry sidecars
+            for f in files:
+                if not f.endswith(LEGACY_META_SUFFIX):
+                    continue
+                key = f[:-len(LEGACY_META_SUFFIX)]
+                meta_path = join(self.cache_dir, f)
+                try:
+                    if key in self._entries:
+                        with open(meta_path, 'r') as mf:
+                            self._entries[key].update(load(mf))
+                    remove(meta_path)
+                except Exception as e:
+                    log.debug("Cannot import %s: %s" % (f, e), module="Manifest")
+
+            log.info("Manifest rebuilt: %d entries" % len(self._entries), module="Manifest")
+            return self.save()
+
+    def save(self):
+        """Write manifest (temp file + rename)"""
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    dump({'version': MANIFEST_VERSION, 'entries': self._entries}, f)
+                rename(tmp_path, self.path)
+                self._dirty = False
+                self._last_save = time.time()
+                return True
+            except Exception as e:
+                log.error("Error saving manifest: %s" % e, module="Manifest")
+                return False
+
+    def flush(self):
+        """Save pending changes (access times, unsaved updates)"""
+        with self._lock:
+            if self._dirty:
+                return self.save()
+        return True
+
+    def get(self, key):
+        """Get a copy of an entry or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry is not None else None
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def record(self, key, size, url=None, validators=None, fetched=None, save=True, codec=None, raw_size=None):
+        """Record a freshly written entry (fetched: original fetch time if copied)"""
+        now = time.time()
+        with self._lock:
+            entry = {
+                'url': url,
+                'size': size,
+                'fetched': fetched or now,
+                'accessed': now
+            }
+            if codec:
+                entry['codec'] = codec
+            if raw_size is not None:
+                entry['raw_size'] = raw_size
+            if validators:
+                entry.update(validators)
+            self._entries[key] = entry
+            self._changed(save)
+
+    def _changed(self, save):
+        """Save now, or mark dirty for the next flush()"""
+        if save:
+            self.save()
+        else:
+            self._dirty = True
+
+    def set_size(self, key, size, codec=None, save=True, raw_size=None):
+        """Set the on-disk size (and codec, JSON size) of an entry once it has been written"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry['size'] = size
+            if codec:
+                entry['codec'] = codec
+            if raw_size is not None:
+                entry['raw_size'] = raw_size
+            self._changed(save)
+            return True
+
+    def set_raw_size(self, key, raw_size):
+        """Remember the JSON size of an entry written before it was recorded (saved lazily)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['raw_size'] = raw_size
+                self._dirty = True
+
+    def touch_fetched(self, key, save=True):
+        """Mark an entry as fresh again (revalidated with 304)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry['fetched'] = now
+            entry['accessed'] = now
+            self._changed(save)
+            return True
+
+    def touch_access(self, key):
+        """Record a read (saved lazily)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['accessed'] = now
+            self._dirty = True
+            if now - self._last_save > ACCESS_FLUSH_INTERVAL:
+                self.save()
+
+    def get_validators(self, key):
+        """Get ETag/Last-Modified/sha of an entry or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            validators = {}
+            for name in VALIDATOR_FIELDS:
+                if entry.get(name):
+                    validators[name] = entry[name]
+            return validators or None
+
+    def touch_fetched_many(self, keys, save=True):
+        """Mark several entries as fresh again with one save (remote sync)"""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry['fetched'] = now
+            self._changed(save)
+
+    def expire(self, keys, save=True):
+        """Mark entries as stale so the next access fetches them again"""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry['fetched'] = 0
+            self._changed(save)
+
+    def get_urls(self):
+        """Return {key: (url, sha)} for entries with a known URL"""
+        with self._lock:
+            return dict((key, (entry['url'], entry.get('sha')))
+                        for key, entry in self._entries.items() if entry.get('url'))
+
+    def get_age(self, key):
+        """Seconds since the entry was fetched/revalidated (None if unknown)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return time.time() - entry.get('fetched', 0)
+
+    def remove(self, key, save=True):
+        """Forget an entry"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None and save:
+                self.save()
+
+    def clear(self):
+        """Forget all entries"""
+        with self._lock:
+            self._entries = {}
+            self.save()
+
+    def keys_by_access(self):
+        """Entry keys, least recently used first"""
+        with self._lock:
+            return sorted(self._entries, key=lambda k: self._entries[k].get('accessed', 0))
+
+    def get_totals(self):
+        """Return (entries, total size in bytes)"""
+        with self._lock:
+            return len(self._entries), sum(e.get('size', 0) for e in self._entries.values())
+
+    def get_files(self, limit=10):
+        """File names of the most recently used entries"""
+        with self._lock:
+            keys = sorted(self._entries, key=lambda k: self._entries[k].get('accessed', 0), reverse=True)
+            return ["%s%s" % (k, ENTRY_SUFFIX) for k in keys[:limit]]
+
+
+# One manifest per cache directory, shared by all CacheManager instances
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(cache_dir):
+    """Get the manifest of a cache directory"""
+    with _manifests_lock:
+        manifest = _manifests.get(cache_dir)
+        if manifest is None:
+            manifest = CacheManifest(cache_dir)
+            _manifests[cache_dir] = manifest
+        return manifest
+
+
+def flush_manifests():
+    """Save pending changes of every manifest"""
+    with _manifests_lock:
+        manifests = list(_manifests.values())
+    for manifest in manifests:
+        manifest.flush()
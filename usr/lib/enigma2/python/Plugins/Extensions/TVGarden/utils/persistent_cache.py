@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Persistent Cache Module
+Warm cache tier on HDD/USB/flash that survives reboots
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import time
+import shutil
+import threading
+from os.path import join, exists, isdir, ismount, dirname, abspath, getsize, getmtime
+from os import makedirs, remove, rename, listdir, access, utime, W_OK
+
+from ..helpers import log
+from .config import get_config
+from .manifest import get_manifest, ENTRY_SUFFIX, VALIDATOR_FIELDS
+
+
+# Marks the last copy of a mirrored folder (its mtime is the copy time)
+MIRROR_STAMP = ".mirrored"
+
+
+def _is_on_mounted_media(path):
+    """True if path lives on a mounted device other than the root filesystem"""
+    path = abspath(path)
+    while path and path != '/':
+        if ismount(path):
+            return True
+        path = dirname(path)
+    return False
+
+
+class PersistentTier:
+    """
+    Warm tier below /tmp/tvgarden_cache (tmpfs).
+    Holds copies of cache entries across reboots, plus mirrors of the
+    image cache and flag pack folders (the stores themselves live on tmpfs).
+    Entries are promoted to tmpfs on access and folders restored from their
+    mirror; writes are throttled per entry and per folder
+    (persistent_write_interval) to spare flash media.
+    """
+
+    def __init__(self, base_dir, write_interval=21600):
+        self.base_dir = base_dir
+        self.write_interval = write_interval
+        self.manifest = get_manifest(base_dir)
+        self._lock = threading.Lock()
+        self._mirrored = {}     # folder name -> time of its last copy
+        self.stats = {'promotions': 0, 'writes': 0, 'throttled': 0, 'restored': 0}
+
+    def _path(self, key):
+        return join(self.base_dir, "%s%s" % (key, ENTRY_SUFFIX))
+
+    def has(self, key):
+        return key in self.manifest
+
+    def promote(self, key, hot_path, hot_manifest):
+        """
+        Copy an entry into the hot tier, keeping its fetch time and validators.
+        Returns True if the entry is now in the hot tier.
+        """
+        entry = self.manifest.get(key)
+        if entry is None:
+            return False
+        path = self._path(key)
+        try:
+            tmp_path = hot_path + ".tmp"
+            shutil.copyfile(path, tmp_path)
+            rename(tmp_path, hot_path)
+        except (IOError, OSError) as e:
+            log.debug("Cannot promote %s: %s" % (key, e), module="Persistent")
+            self.manifest.remove(key)
+            return False
+
+        validators = {}
+        for name in VALIDATOR_FIELDS:
+            if entry.get(name):
+                validators[name] = entry[name]
+        hot_manifest.record(key, entry.get('size', 0), entry.get('url'), validators,
+                            fetched=entry.get('fetched'), codec=entry.get('codec'),
+                            raw_size=entry.get('raw_size'))
+        with self._lock:
+            self.stats['promotions'] += 1
+        log.debug("Promoted %s from %s" % (key, self.base_dir), module="Persistent")
+        return True
+
+    def store(self, key, hot_path, url=None, validators=None, codec=None, raw_size=None):
+        """Copy a hot entry to the persistent tier (throttled per entry)"""
+        entry = self.manifest.get(key)
+        if entry is not None and time.time() - entry.get('fetched', 0) < self.write_interval:
+            with self._lock:
+                self.stats['throttled'] += 1
+            return False
+
+        path = self._path(key)
+        try:
+            tmp_path = path + ".tmp"
+            shutil.copyfile(hot_path, tmp_path)
+            rename(tmp_path, path)
+        except (IOError, OSError) as e:
+            log.error("Cannot write %s to %s: %s" % (key, self.base_dir, e), module="Persistent")
+            return False
+
+        self.manifest.record(key, getsize(path), url, validators, codec=codec, raw_size=raw_size)
+        with self._lock:
+            self.stats['writes'] += 1
+        return True
+
+    def _mirror_time(self, name):
+        with self._lock:
+            if name not in self._mirrored:
+                try:
+                    self._mirrored[name] = getmtime(join(self.base_dir, name, MIRROR_STAMP))
+                except OSError:
+                    self._mirrored[name] = 0
+            return self._mirrored[name]
+
+    def store_dir(self, name, hot_dir, skip=(), write_extra=None):
+        """
+        Mirror a hot folder of files whose names identify their content
+        (images, flags) into <tier>/<name>, at most once per write_interval:
+        new files are copied, files gone from hot_dir are removed.
+        skip: names not copied; write_extra(folder) writes what they stand for.
+        """
+        if time.time() - self._mirror_time(name) < self.write_interval:
+            with self._lock:
+                self.stats['throttled'] += 1
+            return False
+        with self._lock:
+            self._mirrored[name] = time.time()
+
+        folder = join(self.base_dir, name)
+        copied = 0
+        try:
+            if not isdir(folder):
+                makedirs(folder)
+            wanted = set(f for f in listdir(hot_dir) if not f.endswith('.tmp') and f not in skip)
+            present = set(listdir(folder))
+            for f in wanted - present:
+                tmp_path = join(folder, f + ".tmp")
+                shutil.copyfile(join(hot_dir, f), tmp_path)
+                rename(tmp_path, join(folder, f))
+                copied += 1
+            for f in present - wanted - set(skip) - set([MIRROR_STAMP]):
+                remove(join(folder, f))
+            if write_extra is not None:
+                write_extra(folder)
+            stamp = join(folder, MIRROR_STAMP)
+            if not exists(stamp):
+                open(stamp, 'w').close()
+            utime(stamp, None)
+        except (IOError, OSError) as e:
+            log.error("Cannot mirror %s to %s: %s" % (hot_dir, folder, e), module="Persistent")
+            return False
+        with self._lock:
+            self.stats['writes'] += 1
+        log.debug("Mirrored %s: %d new files" % (name, copied), module="Persistent")
+        return True
+
+    def restore_dir(self, name, hot_dir):
+        """
+        Copy the mirror of a folder into hot_dir (files already there are kept).
+        Returns the number of files copied, 0 if the copy failed part way.
+        """
+        folder = join(self.base_dir, name)
+        if not isdir(folder):
+            return 0
+        count = 0
+        try:
+            if not isdir(hot_dir):
+                makedirs(hot_dir)
+            present = set(listdir(hot_dir))
+            for f in listdir(folder):
+                if f in present or f == MIRROR_STAMP or f.endswith('.tmp'):
+                    continue
+                tmp_path = join(hot_dir, f + ".tmp")
+                shutil.copyfile(join(folder, f), tmp_path)
+                rename(tmp_path, join(hot_dir, f))
+                count += 1
+        except (IOError, OSError) as e:
+            log.error("Cannot restore %s from %s: %s" % (hot_dir, folder, e), module="Persistent")
+            return 0
+        with self._lock:
+            self.stats['restored'] += count
+        log.debug("Restored %d files of %s" % (count, name), module="Persistent")
+        return count
+
+    def remove_dir(self, name):
+        """Drop the mirror of a folder"""
+        shutil.rmtree(join(self.base_dir, name), ignore_errors=True)
+        with self._lock:
+            self._mirrored.pop(name, None)
+
+    def clear(self):
+        """Remove all cache entries (folder mirrors are dropped by their stores)"""
+        for key in self.manifest.keys_by_access():
+            try:
+                remove(self._path(key))
+            except OSError:
+                pass
+        self.manifest.clear()
+        for f in listdir(self.base_dir):
+            if f.endswith(ENTRY_SUFFIX) or f.endswith('.tmp'):
+                try:
+                    remove(join(self.base_dir, f))
+                except OSError:
+                    pass
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['entries'], size = self.manifest.get_totals()
+        stats['size_kb'] = size / 1024.0
+        stats['dir'] = self.base_dir
+        return stats
+
+
+_tier = None
+_tier_dir = None
+_tier_lock = threading.Lock()
+
+
+def get_persistent_tier():
+    """Get the persistent tier from config, or None when disabled or the media is missing"""
+    global _tier, _tier_dir
+    config = get_config()
+    base_dir = config.get("persistent_cache_dir", "")
+    if not base_dir:
+        return None
+
+    with _tier_lock:
+        if _tier is not None and _tier_dir == base_dir:
+            return _tier
+
+        # Never fall back to the root filesystem when the device is not mounted
+        if not _is_on_mounted_media(base_dir):
+            log.debug("Persistent cache media not mounted: %s" % base_dir, module="Persistent")
+            return None
+        try:
+            if not isdir(base_dir):
+                makedirs(base_dir)
+            if not access(base_dir, W_OK):
+                log.error("Persistent cache dir not writable: %s" % base_dir, module="Persistent")
+                return None
+        except OSError as e:
+            log.error("Cannot create persistent cache dir %s: %s" % (base_dir, e), module="Persistent")
+            return None
+
+        _tier = PersistentTier(base_dir, config.get("persistent_write_interval", 21600))
+        _tier_dir = base_dir
+        log.info("Persistent cache tier at %s" % base_dir, module="Persistent")
+        return _tier
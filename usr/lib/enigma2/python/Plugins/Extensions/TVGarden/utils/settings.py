@@ -436,6 +436,22 @@ class TVGardenSettings(ConfigListScreen, Screen):
             limits=(10, 5000)
         )
 
+        cache_ttl = self.config.get("cache_ttl", 3600)
+        ttl_choices = [
+            (900, _("15 minutes")),
+            (1800, _("30 minutes")),
+            (3600, _("1 hour")),
+            (10800, _("3 hours")),
+            (21600, _("6 hours")),
+            (86400, _("24 hours"))
+        ]
+        if cache_ttl not in [choice[0] for choice in ttl_choices]:
+            ttl_choices.append((cache_ttl, _("%d seconds") % cache_ttl))
+        self.cfg_cache_ttl = ConfigSelection(
+            default=cache_ttl,
+            choices=ttl_choices
+        )
+
         self.cfg_force_refresh_export = ConfigYesNo(
             default=self.config.get("force_refresh_export", False)
         )
@@ -444,6 +460,24 @@ class TVGardenSettings(ConfigListScreen, Screen):
             default=self.config.get("force_refresh_browsing", False)
         )
 
+        persistent_dir = self.config.get("persistent_cache_dir", "")
+        persistent_choices = [
+            ("", _("Off")),
+            ("/media/hdd/tvgarden_cache", "/media/hdd"),
+            ("/media/usb/tvgarden_cache", "/media/usb"),
+            ("/media/mmc/tvgarden_cache", "/media/mmc")
+        ]
+        if persistent_dir not in [choice[0] for choice in persistent_choices]:
+            persistent_choices.append((persistent_dir, persistent_dir))
+        self.cfg_persistent_cache_dir = ConfigSelection(
+            default=persistent_dir,
+            choices=persistent_choices
+        )
+
+        self.cfg_warmup_on_start = ConfigYesNo(
+            default=self.config.get("warmup_on_start", False)
+        )
+
         self.cfg_refresh_method = ConfigSelection(
             default=self.config.get("refresh_method", "clear_cache"),
             choices=[
@@ -531,6 +565,9 @@ class TVGardenSettings(ConfigListScreen, Screen):
 
         if self.cfg_cache_enabled.value:
             self.list.append(getConfigListEntry(_("Cache Size"), self.cfg_cache_size))
+            self.list.append(getConfigListEntry(_("Channel Lists Expire After"), self.cfg_cache_ttl))
+            self.list.append(getConfigListEntry(_("Keep Cache Across Reboots"), self.cfg_persistent_cache_dir))
+            self.list.append(getConfigListEntry(_("Download All Lists at Startup"), self.cfg_warmup_on_start))
             self.list.append(getConfigListEntry(_("Refresh Method"), self.cfg_refresh_method))
             self.list.append(getConfigListEntry(_("Force Refresh on Browsing"), self.cfg_force_refresh_browsing))
             self.list.append(getConfigListEntry(_("Force Refresh on Export"), self.cfg_force_refresh_export))
@@ -599,6 +636,12 @@ class TVGardenSettings(ConfigListScreen, Screen):
             config_data["cache_enabled"] = self.cfg_cache_enabled.value
         if hasattr(self, 'cfg_cache_size'):
             config_data["cache_size"] = self.cfg_cache_size.value
+        if hasattr(self, 'cfg_cache_ttl'):
+            config_data["cache_ttl"] = self.cfg_cache_ttl.value
+        if hasattr(self, 'cfg_persistent_cache_dir'):
+            config_data["persistent_cache_dir"] = self.cfg_persistent_cache_dir.value
+        if hasattr(self, 'cfg_warmup_on_start'):
+            config_data["warmup_on_start"] = self.cfg_warmup_on_start.value
         if hasattr(self, 'cfg_force_refresh_export'):
             config_data["force_refresh_export"] = self.cfg_force_refresh_export.value
         if hasattr(self, 'cfg_force_refresh_browsing'):
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Background Tasks Module
+Run blocking work off the enigma2 main loop
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import time
+import threading
+from collections import OrderedDict
+
+try:
+    from twisted.internet import reactor
+except ImportError:
+    reactor = None
+
+from ..helpers import log
+
+
+def call_in_main_thread(func, *args, **kwargs):
+    """Schedule func on the enigma2 main loop (direct call if no reactor runs)"""
+    if reactor is not None and reactor.running:
+        reactor.callFromThread(func, *args, **kwargs)
+    else:
+        func(*args, **kwargs)
+
+
+def run_in_background(func, args=(), callback=None, errback=None, name="TVGardenTask"):
+    """
+    Run func(*args) in a daemon thread.
+    callback(result) / errback(error) are delivered on the main loop.
+    """
+    def runner():
+        try:
+            result = func(*args)
+        except Exception as e:
+            log.error("Background task %s failed: %s" % (name, e), module="Tasks")
+            if errback:
+                call_in_main_thread(errback, e)
+            return
+        if callback:
+            call_in_main_thread(callback, result)
+
+    thread = threading.Thread(target=runner, name=name)
+    thread.daemon = True
+    thread.start()
+    log.debug("Started background task: %s" % name, module="Tasks")
+    return thread
+
+
+class WriteBehindQueue:
+    """
+    Keyed jobs run in order by one background worker.
+    A newer job for a pending key replaces the older one (latest write wins).
+    """
+
+    def __init__(self, name="TVGardenWriter"):
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()   # key -> (value, func)
+        self._busy = None               # (key, value) being written
+        self._thread = None
+        self.stats = {'queued': 0, 'coalesced': 0, 'done': 0, 'failed': 0}
+
+    def submit(self, key, value, func):
+        """Queue func(value) for key"""
+        with self._cond:
+            if key in self._pending:
+                del self._pending[key]
+                self.stats['coalesced'] += 1
+            self._pending[key] = (value, func)
+            self.stats['queued'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def get_pending(self, key):
+        """Value queued or being written for key, or None"""
+        with self._cond:
+            job = self._pending.get(key)
+            if job is not None:
+                return job[0]
+            if self._busy is not None and self._busy[0] == key:
+                return self._busy[1]
+        return None
+
+    def cancel(self, key=None, wait=True):
+        """
+        Drop the queued job for key (all jobs if key is None) and wait for the running one.
+        With wait=False nothing is dropped and False is returned if the worker is busy with key.
+        """
+        with self._cond:
+            busy = self._busy is not None and (key is None or self._busy[0] == key)
+            if busy and not wait:
+                return False
+            if key is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(key, None)
+            while self._busy is not None and (key is None or self._busy[0] == key):
+                self._cond.wait(1.0)
+        return True
+
+    def flush(self, timeout=10.0):
+        """Wait until every queued job is done. Returns False on timeout"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._pending or self._busy is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    log.error("Write-behind flush timed out (%d pending)" % len(self._pending), module="Tasks")
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key, (value, func) = self._pending.popitem(last=False)
+                self._busy = (key, value)
+            try:
+                func(value)
+                self.stats['done'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                log.error("Write-behind job %s failed: %s" % (key, e), module="Tasks")
+            finally:
+                with self._cond:
+                    self._busy = None
+                    self._cond.notify_all()
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending) + (1 if self._busy is not None else 0)
+        return stats
+
+
+class BoundedPool:
+    """
+    Run func(item) for every item on at most max_workers daemon threads.
+    on_progress(done, total, item, error) and on_done(done, failed, cancelled)
+    are delivered on the main loop.
+    """
+
+    def __init__(self, func, items, max_workers=4, on_progress=None, on_done=None, name="TVGardenPool"):
+        self.func = func
+        self.items = list(items)
+        self.max_workers = max(1, min(max_workers, len(self.items) or 1))
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.name = name
+        self.done = 0
+        self.failed = 0
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._next = 0
+        self._running = 0
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    def start(self):
+        if not self.items:
+            if self.on_done:
+                call_in_main_thread(self.on_done, 0, 0, False)
+            return self
+        self._running = self.max_workers
+        for n in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name="%s-%d" % (self.name, n))
+            thread.daemon = True
+            thread.start()
+        log.debug("Started %s: %d items, %d workers" % (self.name, self.total, self.max_workers), module="Tasks")
+        return self
+
+    def cancel(self):
+        """Stop handing out items (running ones finish)"""
+        with self._lock:
+            self.cancelled = True
+
+    def _take(self):
+        with self._lock:
+            if self.cancelled or self._next >= len(self.items):
+                return None, False
+            item = self.items[self._next]
+            self._next += 1
+            return item, True
+
+    def _worker(self):
+        while True:
+            item, ok = self._take()
+            if not ok:
+                break
+            error = None
+            try:
+                self.func(item)
+            except Exception as e:
+                error = e
+                log.debug("%s: %s failed: %s" % (self.name, item, e), module="Tasks")
+            with self._lock:
+                self.done += 1
+                if error is not None:
+                    self.failed += 1
+                done = self.done
+            if self.on_progress:
+                call_in_main_thread(self.on_progress, done, self.total, item, error)
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            log.debug("%s finished: %d done, %d failed" % (self.name, self.done, self.failed), module="Tasks")
+            if self.on_done:
+                call_in_main_thread(self.on_done, self.done, self.failed, self.cancelled)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - TTL Policy Module
+Time-to-live of every cached resource kind, with per-entry jitter
+Based on TV Garden Project
+"""
+from __future__ import print_function
+import hashlib
+
+from .config import get_config
+
+
+# Resource kind -> config key (0 in config = use cache_ttl)
+TTL_KEYS = {
+    'metadata': 'ttl_metadata',        # countries_metadata.json
+    'country': 'ttl_country',          # countries/<code>.json
+    'category': 'ttl_category',        # categories/<id>.json, all-channels.json
+    'categories': 'ttl_categories',    # category listing (GitHub API)
+    'logo': 'ttl_logo',                # channel logos
+    'flag': 'ttl_flag',                # country flags
+}
+
+DEFAULT_TTL = 3600
+
+
+def _jitter_fraction(key):
+    """Stable value in [0, 1) per entry, so an entry never flips between valid and expired"""
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) / float(0x100000000)
+
+
+def get_ttl(kind=None, key=None):
+    """
+    TTL in seconds for a resource kind.
+    With a key, up to cache_ttl_jitter percent is taken off, different for
+    each entry, so entries fetched together do not all expire together.
+    """
+    config = get_config()
+    ttl = config.get("cache_ttl", DEFAULT_TTL)
+    config_key = TTL_KEYS.get(kind)
+    if config_key:
+        ttl = config.get(config_key, 0) or ttl
+
+    jitter = config.get("cache_ttl_jitter", 10)
+    if key and jitter > 0:
+        ttl -= int(ttl * jitter / 100.0 * _jitter_fraction(key))
+    return ttl
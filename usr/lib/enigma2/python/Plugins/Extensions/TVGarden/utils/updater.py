@@ -11,17 +11,10 @@ import subprocess
 from re import sub, search
 from os import makedirs
 from os.path import join, exists
-from sys import version_info
 
 from ..helpers import log
 from .. import _, PLUGIN_VERSION, PLUGIN_PATH, USER_AGENT
-
-if version_info[0] == 3:
-    from urllib.request import urlopen, Request
-else:
-    from urllib2 import urlopen, Request
-
-
+from .http_client import open_url, read_body, ACCEPT_ENCODING
 
 
 class PluginUpdater:
@@ -55,13 +48,13 @@ class PluginUpdater:
 
             log.debug("Checking version from: %s" % installer_url, module="Updater")
 
-            headers = {'User-Agent': self.user_agent}
-            req = Request(installer_url, headers=headers)
+            headers = {'User-Agent': self.user_agent, 'Accept-Encoding': ACCEPT_ENCODING}
 
             response = None
             try:
-                response = urlopen(req, timeout=10)
-                content = response.read().decode('utf-8')
+                # Shared pool: fails at once while offline (circuit breaker)
+                response = open_url(installer_url, headers=headers, timeout=10)
+                content = read_body(response).decode('utf-8')
             finally:
                 if response:
                     response.close()
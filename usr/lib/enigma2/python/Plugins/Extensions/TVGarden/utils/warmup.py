@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TV Garden Plugin - Cache Warm-up Module
+Prefetch every list in the background so browsing starts from a warm cache
+Based on TV Garden Project
+"""
+from __future__ import print_function
+
+from ..helpers import log
+from .config import get_config
+from .cache import CacheManager
+from .tasks import run_in_background, BoundedPool
+
+
+class CacheWarmup:
+    """
+    Warm-up job: countries metadata, category listing and all-channels.json
+    first, then every country and category list the channel index cannot
+    answer, on a bounded worker pool.
+    on_progress(done, total) and on_done(done, failed, cancelled) run on the main loop.
+    """
+
+    def __init__(self, on_progress=None, on_done=None, max_workers=None):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        if max_workers is None:
+            max_workers = get_config().get("warmup_workers", 4)
+        self.max_workers = max_workers
+        self.cache = None
+        self.pool = None
+        self.running = False
+        self.cancelled = False
+
+    def start(self):
+        self.running = True
+        run_in_background(self._plan, callback=self._start_pool, errback=self._failed,
+                          name="TVGardenWarmupPlan")
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+        if self.pool is not None:
+            self.pool.cancel()
+
+    def get_progress(self):
+        """Return (done, total); total is 0 while the job list is being built"""
+        if self.pool is None:
+            return 0, 0
+        return self.pool.done, self.pool.total
+
+    def _plan(self):
+        """Fetch the top-level lists and build the job list (worker thread)"""
+        self.cache = CacheManager()
+        metadata = self.cache.get_countries_metadata() or {}
+        categories = self.cache.get_available_categories() or []
+        index = self.cache.get_channel_index()
+
+        jobs = []
+        if isinstance(metadata, dict):
+            for code, info in metadata.items():
+                if not isinstance(info, dict) or not info.get('hasChannels', False):
+                    continue
+                if index is not None and index.get_country(code):
+                    continue
+                jobs.append(('country', code))
+
+        for category in categories:
+            category_id = category.get('id')
+            if not category_id or category_id == 'all-channels':
+                continue
+            if index is not None and index.get_category(category_id):
+                continue
+            jobs.append(('category', category_id))
+
+        log.info("Warm-up: %d lists to fetch (%d countries, %d categories)" % (
+            len(jobs), len(metadata) if isinstance(metadata, dict) else 0, len(categories)), module="Warmup")
+        return jobs
+
+    def _start_pool(self, jobs):
+        if self.cancelled:
+            self._finished(0, 0, True)
+            return
+        self.pool = BoundedPool(
+            self._fetch, jobs, self.max_workers,
+            on_progress=self._progress, on_done=self._finished, name="TVGardenWarmup"
+        ).start()
+
+    def _fetch(self, job):
+        """Fetch one list; download errors propagate so the pool counts them as failed"""
+        kind, key = job
+        if kind == 'country':
+            self.cache.get_country_channels(key, strict=True)
+        else:
+            self.cache.get_category_channels(key, strict=True)
+
+    def _progress(self, done, total, job, error):
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    def _failed(self, error):
+        log.error("Warm-up failed: %s" % error, module="Warmup")
+        self._finished(0, 1, False)
+
+    def _finished(self, done, failed, cancelled):
+        global _current
+        self.running = False
+        if _current is self:
+            _current = None
+        log.info("Warm-up finished: %d fetched, %d failed%s" % (
+            done, failed, " (cancelled)" if cancelled else ""), module="Warmup")
+        if self.on_done:
+            self.on_done(done, failed, cancelled)
+
+
+_current = None
+
+
+def start_warmup(on_progress=None, on_done=None):
+    """Start the warm-up job, or attach the callbacks to the one already running"""
+    global _current
+    if _current is not None and _current.running:
+        _current.on_progress = on_progress
+        _current.on_done = on_done
+        return _current
+    _current = CacheWarmup(on_progress, on_done).start()
+    return _current
+
+
+def get_warmup():
+    """Running warm-up job or None"""
+    return _current